@@ -1,33 +1,50 @@
 import sys
 import os
+from module import startup_timing #启动耗时统计（最先导入，记录启动起点）
+import re
+import json
 from datetime import datetime
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
-from PyQt5.QtCore import Qt, QTimer, QSettings, pyqtSignal
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QKeyEvent, QCursor, QPalette
-from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QAction, QDialog, QFileDialog, QPushButton, QVBoxLayout, QLineEdit, QGridLayout
-from PyQt5.QtMultimedia import QCamera, QCameraInfo
+from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QAction, QDialog, QFileDialog, QPushButton, QVBoxLayout, QLineEdit, QGridLayout, QLabel, QInputDialog
 from PyQt5.QtMultimediaWidgets import QCameraViewfinder
 import logging
+from Device_Setup import Ui_Dialog #预编译的设备设置界面
 from module.video_module import VideoHandler
-from module.keyboard_module import KeyboardHandler #导入键盘模块
-from module.mouse_module import MouseHandler #导入鼠标模块
+from module.keyboard_module import KeyboardHandler, REPEAT_TARGET, REPEAT_HOST #导入键盘模块
+from module.mouse_module import MouseHandler, near_edge, relative_center #导入鼠标模块
+from module.input_worker import InputWorker, key_tuple, mouse_tuple, wheel_tuple, touch_tuples, MOUSE_PRESS, MOUSE_RELEASE, MOUSE_MOVE, RECENTER #输入处理线程
+from module.consumer_module import ConsumerHandler #媒体键/电源键
+from module.touch_module import TouchHandler, TOUCH_EVENTS #多点触控
+from module.media_key_mappings import MENU_KEYS, canonical_name
+from module.device_capabilities import DeviceCapabilityCache #设备能力缓存
+from module.hotplug_monitor import HotplugMonitor #热插拔监视
+from module.hid_writer import open_hid_device #无缓冲HID写入
+from module.usb_gadget import load_endpoint_map, available_udc #gadget端点映射
+from module.cursor_overlay import CursorOverlay #本地预测光标
+from module.coordinate_mapping import CoordinateMapper #绝对坐标映射
+from module.adaptive_capture import AdaptiveCaptureController #自适应采集
+from module.config_store import ConfigStore #持久化配置
+from module.keyboard_leds import KeyboardLedReader, LED_NUM_LOCK, LED_CAPS_LOCK, LED_SCROLL_LOCK #被控机键盘LED
+from module import process_supervisor #多进程模式（--multiprocess）
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 #快捷键
 shortcuts = ["Meta","Ctrl+Alt+Del", "Alt+Tab", "Ctrl+Shift+Esc", "Alt+F4","Meta+E","Meta+Tab", "Meta+R", "Meta+PrtSc", "Meta+Break","Shift+F10", "Alt+Space"]
 keyboard_handler = None #初始化键盘处理
+consumer_handler = None #初始化媒体键处理
 mouse_handler = None #初始化鼠标处理
 camera_started = False#摄像头是否启动
-
-from custom_shortcut_dialog import CustomShortcutDialog
+startup_timing.mark("模块导入")
 
 
 # 设备设置对话框类
-class DeviceSetupDialog(QDialog):
+class DeviceSetupDialog(QDialog, Ui_Dialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        uic.loadUi('Device_Setup.ui', self)  # 加载UI文件
+        self.setupUi(self)  # 使用预编译的界面类，不在运行时解析.ui文件
         self.setWindowTitle("分辨率设置")
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)  # 移除帮助按钮
 
@@ -51,8 +68,8 @@ class Ui_MainWindow(object):
         self.menu_video_menu = QtWidgets.QMenu(self.menubar)
         self.menu_video_menu.setTitle("输入设备")
         self.menubar.addMenu(self.menu_video_menu)
-         # 连接 aboutToShow 信号到 refresh_input_devices 方法
-        self.menu_video_menu.aboutToShow.connect(self.refresh_input_devices)
+        # 设备菜单由热插拔监视器增量刷新，不再在每次打开菜单时重建
+        self.camera_actions = {}  # 设备路径 -> 菜单动作
         # 创建"鼠标模式"菜单
         self.menu_mouse_mode = QtWidgets.QMenu(self.menubar)
         self.menu_mouse_mode.setTitle("鼠标模式")
@@ -68,6 +85,17 @@ class Ui_MainWindow(object):
         self.action_mouse_relative.setIcon(QIcon("./Icon/mouse.png"))
         self.action_mouse_relative.setCheckable(True)
         self.menu_mouse_mode.addAction(self.action_mouse_relative)
+        # 创建"本地光标预测"动作（绝对模式下掩盖采集延迟）
+        self.menu_mouse_mode.addSeparator()
+        self.action_cursor_overlay = QAction("本地光标预测", self.menu_mouse_mode)
+        self.action_cursor_overlay.setIcon(QIcon("./Icon/mouse.png"))
+        self.action_cursor_overlay.setCheckable(True)
+        self.action_cursor_overlay.setChecked(True)
+        self.menu_mouse_mode.addAction(self.action_cursor_overlay)
+        # 创建"多显示器目标区域"动作（被采集显示器在被控机虚拟桌面中的位置）
+        self.action_target_region = QAction("多显示器目标区域...", self.menu_mouse_mode)
+        self.action_target_region.setIcon(QIcon("./Icon/mouse.png"))
+        self.menu_mouse_mode.addAction(self.action_target_region)
         # 将动作添加到动作组中，确保只有一个模式被选中
         self.mouse_mode_group = QtWidgets.QActionGroup(self.menu_mouse_mode)#创建动作组 
         self.mouse_mode_group.addAction(self.action_mouse_absolute)
@@ -94,6 +122,12 @@ class Ui_MainWindow(object):
         self.keyboard_support_group.addAction(self.action_keyboard_US)
         self.keyboard_support_group.addAction(self.action_keyboard_UK)
         self.keyboard_support_group.setExclusive(True)#设置为互斥，确保只有一种键盘支持被选中
+        # 创建"主机端按键重复"动作（被控机不自动重复按键时使用，默认由被控机重复）
+        self.menu_keyboard_support.addSeparator()
+        self.action_host_repeat = QAction("主机端按键重复", self.menu_keyboard_support)
+        self.action_host_repeat.setIcon(QIcon("./Icon/shortcutkey.png"))
+        self.action_host_repeat.setCheckable(True)
+        self.menu_keyboard_support.addAction(self.action_host_repeat)
 
         # 创建"快捷键"菜单
         self.menu_shortcut_key = QtWidgets.QMenu(self.menubar)
@@ -109,6 +143,19 @@ class Ui_MainWindow(object):
             action.setIcon(QIcon("./Icon/shortcutkey.png"))
             action.triggered.connect(lambda checked, s=shortcut: self.send_shortcut(s))#绑定快捷键的操作
             self.menu_shortcut_key.addAction(action)
+        # 创建"媒体/电源"菜单（consumer端点）
+        self.menu_media_keys = QtWidgets.QMenu(self.menubar)
+        self.menu_media_keys.setTitle("媒体/电源")
+        self.menubar.addMenu(self.menu_media_keys)
+        for entry in MENU_KEYS:
+            if entry is None:
+                self.menu_media_keys.addSeparator()
+                continue
+            name, label = entry
+            action = QAction(label, self.menu_media_keys)
+            action.setIcon(QIcon("./Icon/shortcutkey.png"))
+            action.setData(name)
+            self.menu_media_keys.addAction(action)
         # 创建"文本"菜单
         self.menu_text_input = QtWidgets.QMenu(self.menubar)
         self.menu_text_input.setTitle("文本")
@@ -131,6 +178,65 @@ class Ui_MainWindow(object):
         self.action_save_path.setIcon(QIcon("./Icon/folder.png"))
         self.action_save_path.triggered.connect(self.set_save_path)
         self.menu_settings.addAction(self.action_save_path)
+        # 创建"查找当前画面的截屏"动作（当前画面最早什么时候出现过）
+        self.action_find_screenshot = QAction("查找当前画面的截屏", self.menu_settings)
+        self.action_find_screenshot.setIcon(QIcon("./Icon/screenshot.png"))
+        self.menu_settings.addAction(self.action_find_screenshot)
+        # 创建"帧时序统计"动作
+        self.action_frame_timing = QAction("帧时序统计", self.menu_settings)
+        self.action_frame_timing.setIcon(QIcon("./Icon/resolution.png"))
+        self.action_frame_timing.triggered.connect(self.show_frame_timing)
+        self.menu_settings.addAction(self.action_frame_timing)
+        # 创建"延迟自检"动作
+        self.action_latency_test = QAction("延迟自检", self.menu_settings)
+        self.action_latency_test.setIcon(QIcon("./Icon/mouse.png"))
+        self.menu_settings.addAction(self.action_latency_test)
+        # 创建"录制输入"/"回放录制"动作（HID报告录制与回放）
+        self.action_record_input = QAction("录制输入", self.menu_settings)
+        self.action_record_input.setIcon(QIcon("./Icon/shortcutkey.png"))
+        self.action_record_input.setCheckable(True)
+        self.menu_settings.addAction(self.action_record_input)
+        self.action_replay_input = QAction("回放录制...", self.menu_settings)
+        self.action_replay_input.setIcon(QIcon("./Icon/shortcutkey.png"))
+        self.menu_settings.addAction(self.action_replay_input)
+        # 创建"虚拟存储"子菜单（向被控机挂载ISO/IMG镜像）
+        self.menu_mass_storage = QtWidgets.QMenu("虚拟存储", self.menu_settings)
+        self.menu_mass_storage.setIcon(QIcon("./Icon/folder.png"))
+        self.menu_settings.addMenu(self.menu_mass_storage)
+        self.action_attach_image = QAction("挂载镜像...", self.menu_mass_storage)
+        self.menu_mass_storage.addAction(self.action_attach_image)
+        self.action_detach_image = QAction("弹出镜像", self.menu_mass_storage)
+        self.action_detach_image.setEnabled(False)
+        self.menu_mass_storage.addAction(self.action_detach_image)
+        self.action_image_stats = QAction("读取统计", self.menu_mass_storage)
+        self.menu_mass_storage.addAction(self.action_image_stats)
+        # 创建"屏幕文本"子菜单（BIOS/文本控制台画面识别为文本）
+        self.menu_screen_text = QtWidgets.QMenu("屏幕文本", self.menu_settings)
+        self.menu_screen_text.setIcon(QIcon("./Icon/paste.png"))
+        self.menu_settings.addMenu(self.menu_screen_text)
+        self.action_monitor_text = QAction("记录文本变化", self.menu_screen_text)
+        self.action_monitor_text.setCheckable(True)
+        self.menu_screen_text.addAction(self.action_monitor_text)
+        self.action_copy_screen_text = QAction("复制屏幕文本", self.menu_screen_text)
+        self.menu_screen_text.addAction(self.action_copy_screen_text)
+        self.action_learn_glyphs = QAction("校正并学习字形...", self.menu_screen_text)
+        self.menu_screen_text.addAction(self.action_learn_glyphs)
+        # 创建"自适应采集"动作（画面静止或CPU饱和时降低采集帧率）
+        self.action_adaptive_capture = QAction("自适应采集", self.menu_settings)
+        self.action_adaptive_capture.setIcon(QIcon("./Icon/resolution.png"))
+        self.action_adaptive_capture.setCheckable(True)
+        self.action_adaptive_capture.setChecked(True)
+        self.menu_settings.addAction(self.action_adaptive_capture)
+        self.action_adaptive_resolution = QAction("负载高时降低分辨率", self.menu_settings)
+        self.action_adaptive_resolution.setCheckable(True)
+        self.menu_settings.addAction(self.action_adaptive_resolution)
+        # 创建"被控机配置"子菜单（每台被控机的布局、鼠标模式、分辨率、设备）
+        self.menu_profiles = QtWidgets.QMenu("被控机配置", self.menu_settings)
+        self.menu_profiles.setIcon(QIcon("./Icon/devices.png"))
+        self.menu_settings.addMenu(self.menu_profiles)
+        self.profile_group = QtWidgets.QActionGroup(self.menu_profiles)
+        self.profile_group.setExclusive(True)
+        self.action_new_profile = QAction("新建配置...", self.menu_settings)  # 不属于子菜单，刷新时不会被删除
          # 创建"退出"动作
         self.action_exit = QAction("退出", self.menu_settings)
         self.action_exit.setIcon(QIcon("./Icon/exit.png"))
@@ -155,28 +261,46 @@ class Ui_MainWindow(object):
             }
         """)
         MainWindow.setStatusBar(self.statusbar)
+        # 被控机锁定键状态（常驻状态栏右侧）
+        self.led_label = QLabel(self.statusbar)
+        self.statusbar.addPermanentWidget(self.led_label)
+        # 持久化配置（启动时读取一次，修改后延迟写回）
+        self.config_store = ConfigStore(parent=MainWindow)
         # 初始化视频处理模块 *********************************************
-        self.video_handler = VideoHandler(MainWindow, self.centralwidget)
-        # 创建设备设置对话框
-        self.device_setup_dialog = DeviceSetupDialog(MainWindow)
+        self.video_handler = VideoHandler(MainWindow, self.centralwidget, self.config_store)
+        # 设备能力缓存，后台探测，避免在对话框中打开摄像头
+        self.capability_cache = DeviceCapabilityCache()
+        self.capability_cache.capabilities_updated.connect(self._on_capabilities_updated)
+        # 后台探测推迟到首帧之后（MainWindow._start_deferred_tasks），不与摄像头启动争用设备
+        self.known_device_names = None
+        # 设备设置对话框在首次打开时创建
+        self.device_setup_dialog = None
         # 重新翻译UI
         self.retranslateUi(MainWindow)
         # 连接槽函数
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
         # 初始刷新输入设备列表
         self.refresh_input_devices()
-        # 加载保存路径设置
-        self.settings = QSettings("YourCompany", "YourApp")
-        self.save_path = self.settings.value("save_path", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Screenshots"))
+        # 按配置恢复菜单勾选状态（被控机配置由MainWindow在处理器创建后应用）
+        config = self.config_store.config
+        self.action_cursor_overlay.setChecked(config.cursor_overlay)
+        self.action_adaptive_capture.setChecked(config.adaptive_capture)
+        self.action_adaptive_resolution.setChecked(config.adaptive_resolution)
+        self.refresh_profile_menu()
 
-            # 加载上次保存的键盘布局设置，如果没有保存过则默认使用'US'
-        saved_layout = self.settings.value("keyboard_layout", "US")
-        
-        # 根据保存的设置设置相应的布局
-        if saved_layout == "UK":
-            self.action_keyboard_UK.trigger()
-        else:
-            self.action_keyboard_US.trigger()
+    # 刷新被控机配置菜单
+    def refresh_profile_menu(self):
+        self.menu_profiles.clear()
+        for action in self.profile_group.actions():
+            self.profile_group.removeAction(action)
+        for name in self.config_store.profile_names():
+            action = QAction(name, self.menu_profiles)
+            action.setCheckable(True)
+            action.setChecked(name == self.config_store.config.active_profile)
+            self.profile_group.addAction(action)
+            self.menu_profiles.addAction(action)
+        self.menu_profiles.addSeparator()
+        self.menu_profiles.addAction(self.action_new_profile)
 
     # 退出程序
     def exit_program(self):
@@ -202,21 +326,48 @@ class Ui_MainWindow(object):
     def get_viewfinder_size(self):
         return self.centralwidget.width(), self.centralwidget.height()
 
-    # 刷新输入设备列表
+    # 刷新输入设备列表（增量更新菜单）
     def refresh_input_devices(self):
         self.online_webcams = self.video_handler.refresh_input_devices()
-        # 清空菜单项
-        self.menu_video_menu.clear()
-        # 为每个摄像头创建菜单项
-        for i, camera in enumerate(self.online_webcams):
-            camera_action = QAction(f"摄像头 {i + 1}: {camera.description()}", self.menu_video_menu)
+        # 设备列表变化（热插拔）时重新探测能力
+        device_names = {camera.deviceName() for camera in self.online_webcams}
+        if self.known_device_names is not None and device_names != self.known_device_names:
+            for removed in self.known_device_names - device_names:
+                self.capability_cache.forget_path(removed)
+            self.capability_cache.probe_async(sorted(device_names - self.known_device_names))
+        self.known_device_names = device_names
+        # 移除已拔出的设备
+        for device_name in list(self.camera_actions):
+            if device_name not in device_names:
+                self.menu_video_menu.removeAction(self.camera_actions.pop(device_name))
+        # 只为新设备创建菜单项
+        for camera in self.online_webcams:
+            device_name = camera.deviceName()
+            if device_name in self.camera_actions:
+                continue
+            camera_action = QAction(f"摄像头: {camera.description()} ({device_name})", self.menu_video_menu)
             camera_action.setIcon(QIcon("./Icon/devices.png"))
-            camera_action.triggered.connect(lambda checked, index=i: self.select_camera(index))
+            camera_action.triggered.connect(lambda checked, name=device_name: self.select_camera_by_name(name))
             self.menu_video_menu.addAction(camera_action)
+            self.camera_actions[device_name] = camera_action
+        return device_names
+
+    # 按设备路径选择摄像头（设备列表可能因热插拔而重新排序）
+    def select_camera_by_name(self, device_name):
+        for index, camera in enumerate(self.online_webcams):
+            if camera.deviceName() == device_name:
+                return self.select_camera(index)
+        QMessageBox.critical(self.centralwidget, "错误", "摄像头已断开", QMessageBox.Ok)
 
     # 选择摄像头
     def select_camera(self, index):
         if self.video_handler.select_camera(index):
+            device_name = self.video_handler.camera_config['device_name']
+            self.config_store.update_profile(
+                device_path=device_name,
+                device_identity=self.capability_cache.identity_for(device_name) or '',
+                resolution=[self.video_handler.camera_config['resolution_X'],
+                            self.video_handler.camera_config['resolution_Y']])
             # self.resize_window_func()
             self.update_status_bar(self.video_handler.get_camera_info())
             global camera_started
@@ -227,19 +378,42 @@ class Ui_MainWindow(object):
 
     # 设备配置对话框
     def device_config(self):
+        if self.device_setup_dialog is None:
+            self.device_setup_dialog = DeviceSetupDialog(self.MainWindow)
+        self._fill_resolution_list()
+        if self.device_setup_dialog.exec() == QDialog.Accepted:          # 显示对话框
+            resolution = self.device_setup_dialog.comboBox.currentText().split('x')
+            new_resolution_x = int(resolution[0])
+            new_resolution_y = int(resolution[1])
+            self.video_handler.update_resolution(new_resolution_x, new_resolution_y)
+            self.config_store.update_profile(resolution=[new_resolution_x, new_resolution_y])
+            self.update_status_bar(self.video_handler.get_camera_info())
+            self.MainWindow.adjust_viewfinder_size(self.MainWindow.width(), self.MainWindow.height()) # 添加以下行来触发窗口调整
+
+    # 后台探测完成：对话框打开时刷新分辨率列表（通用列表换成设备实际支持的分辨率）
+    def _on_capabilities_updated(self, identity):
+        if self.device_setup_dialog is None or not self.device_setup_dialog.isVisible():
+            return
+        try:
+            camera = self.video_handler.online_webcams[self.video_handler.camera_config['device_No']]
+        except IndexError:
+            return
+        if self.capability_cache.identity_for(camera.deviceName()) == identity:
+            self._fill_resolution_list()
+
+    # 填充分辨率列表并选中当前分辨率
+    def _fill_resolution_list(self):
         self.device_setup_dialog.comboBox.clear()
         common_resolutions = ["640x480", "800x600", "1024x768", "1280x720", "1920x1080"]  # 通用分辨率列表
         supported_resolutions = []   # 支持的分辨率列表
-        try:    # 尝试获取设备支持的分辨率
-            camera_info = QCamera(self.video_handler.online_webcams[self.video_handler.camera_config['device_No']])
-            camera_info.load()
-            resolutions = camera_info.supportedViewfinderResolutions()
-            camera_info.unload()
-            for resolution in resolutions:
-                supported_resolutions.append(f"{resolution.width()}x{resolution.height()}")
+        try:    # 从能力缓存读取设备支持的分辨率，不再临时打开摄像头
+            camera = self.video_handler.online_webcams[self.video_handler.camera_config['device_No']]
+            supported_resolutions = self.capability_cache.get_resolutions(camera.deviceName())
+            if not supported_resolutions:
+                self.capability_cache.probe_async([camera.deviceName()])  # 后台补探测，下次打开即可使用
         except Exception as e:
             print(f"无法获取设备支持的分辨率: {e}")
-        if not supported_resolutions:    # 如果无法获取支持的分辨率，使用通用列表
+        if not supported_resolutions:    # 如果缓存中没有，使用通用列表
             print("使用通用分辨率列表")
             supported_resolutions = common_resolutions
         for res in supported_resolutions: # 添加分辨率到comboBox
@@ -250,13 +424,6 @@ class Ui_MainWindow(object):
             self.device_setup_dialog.comboBox.setCurrentIndex(index)
         elif self.device_setup_dialog.comboBox.count() > 0:
             self.device_setup_dialog.comboBox.setCurrentIndex(0)
-        if self.device_setup_dialog.exec() == QDialog.Accepted:          # 显示对话框
-            resolution = self.device_setup_dialog.comboBox.currentText().split('x')
-            new_resolution_x = int(resolution[0])
-            new_resolution_y = int(resolution[1])
-            self.video_handler.update_resolution(new_resolution_x, new_resolution_y)
-            self.update_status_bar(self.video_handler.get_camera_info())
-            self.MainWindow.adjust_viewfinder_size(self.MainWindow.width(), self.MainWindow.height()) # 添加以下行来触发窗口调整
 
 
     # 设置保存路径
@@ -265,6 +432,12 @@ class Ui_MainWindow(object):
         if result:
           self.statusbar.showMessage(result, 5000)
 
+    # 显示并导出帧时序统计
+    def show_frame_timing(self):
+        if not self.video_handler.is_camera_started():
+            return self.statusbar.showMessage("请先选择输入设备", 3000)
+        self.statusbar.showMessage(self.video_handler.export_frame_timing(), 10000)
+
     def set_save_path(self):
         result = self.video_handler.set_save_path()
         if result:
@@ -287,15 +460,45 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)    
+        startup_timing.mark("界面创建")
         # 初始化状态变量
         self.mouse_mode = "absolute"
         self.mouse_locked = False
         self.camera_started = False
+        self.hid_recorder = None
+        self.hid_replayer = None
+        self.mass_storage = None  # 首次使用时创建
         self._init_window()  #初始化窗口    
         self._init_hid_devices() #初始化HID设备
         self._init_handlers() #初始化处理器
         self._init_connections() #初始化信号连接
-        self._switch_to_absolute_mode()
+        self._init_hotplug() #初始化热插拔监视
+        startup_timing.mark("HID与处理器")
+        self._apply_profile() #恢复被控机配置（布局、鼠标模式、采集设备）
+        startup_timing.mark("恢复配置与启动采集")
+        # 非关键任务推迟到首帧之后；没有采集设备时在事件循环开始后执行
+        self._deferred_started = False
+        self.ui.video_handler.frame_monitor.frame_probed.connect(self._on_first_frame)
+        QTimer.singleShot(0 if not self.ui.video_handler.is_camera_started() else 5000,
+                          self._start_deferred_tasks)
+
+    # 首帧到达：输出启动耗时并开始后台任务
+    def _on_first_frame(self, frame):
+        self.ui.video_handler.frame_monitor.frame_probed.disconnect(self._on_first_frame)
+        startup_timing.mark("首帧")
+        startup_timing.log_report()
+        self._start_deferred_tasks()
+
+    # 推迟执行的启动任务（只执行一次）
+    def _start_deferred_tasks(self):
+        if self._deferred_started:
+            return
+        self._deferred_started = True
+        if not self.ui.video_handler.is_camera_started():
+            startup_timing.mark("事件循环开始（无采集）")
+            startup_timing.log_report()
+        self.ui.capability_cache.probe_async()  # 后台探测采集卡能力（已缓存的设备跳过）
+        self.ui.video_handler.get_screenshot_store()  # 在后台打开截图库、加载哈希索引
         
     def _init_window(self):
         # 居中窗口
@@ -303,28 +506,41 @@ class MainWindow(QMainWindow):
         cp = QApplication.desktop().availableGeometry().center()
         qr.moveCenter(cp)
         self.move(qr.topLeft())
-        self.ui.refresh_input_devices()   # 刷新设备列表
 
     # 初始化HID设备
     def _init_hid_devices(self):
         self.hid_devices = {
             'keyboard': None,
             'mouse_relative': None,
-            'mouse_absolute': None
+            'mouse_absolute': None,
+            'consumer': None,
+            'touch': None
         }
+        # 设备路径来自 usb_gadget.py 发布的端点映射（gadget重新配置后可能变化）
+        self.endpoint_map = load_endpoint_map()
+        # 多进程模式下键盘、鼠标由输入进程打开
+        input_devices = () if process_supervisor.enabled else ('keyboard', 'mouse_relative', 'mouse_absolute')
         try:
-            self.hid_devices['keyboard'] = open('/dev/hidg0', 'rb+')
-            self.hid_devices['mouse_relative'] = open('/dev/hidg1', 'rb+')
-            self.hid_devices['mouse_absolute'] = open('/dev/hidg2', 'rb+')
+            for name in input_devices:
+                self.hid_devices[name] = open_hid_device(self.endpoint_map['devices'][name])
         except Exception as e:
             self.ui.statusbar.showMessage(f"HID设备初始化失败: {e}", 5000)
             logging.error(f"HID设备初始化失败: {e}")
+        # 媒体/电源键、触控屏端点是可选的（旧版或未启用时gadget配置中没有）
+        for name in ('consumer', 'touch'):
+            path = self.endpoint_map['devices'].get(name)
+            if path:
+                try:
+                    self.hid_devices[name] = open_hid_device(path)
+                except Exception as e:
+                    logging.warning(f"HID设备 {name} 打开失败: {e}")
 
     # 初始化鼠标键盘事件处理
     def _init_handlers(self):
-        global keyboard_handler, mouse_handler
+        global keyboard_handler, mouse_handler, consumer_handler
         keyboard_handler = KeyboardHandler(self.hid_devices['keyboard'])
-        keyboard_handler.key_event.connect(keyboard_handler.handle_key_event)
+        consumer_handler = ConsumerHandler(self.hid_devices['consumer'],
+                                           self.endpoint_map.get('udc') or available_udc())
         mouse_handler = MouseHandler(
             self,
             self.hid_devices['mouse_absolute'],
@@ -332,6 +548,65 @@ class MainWindow(QMainWindow):
             self.ui.centralwidget.width(),
             self.ui.centralwidget.height()
         )
+        # 取景器几何的GUI线程副本：鼠标处理器的视口属于输入线程，相对模式的边缘检测和回中使用这份
+        self.viewport = (self.ui.centralwidget.width(), self.ui.centralwidget.height(), 0, 0)
+        # 多点触控与媒体键一样：单进程模式下在输入线程中运行，坐标映射直接使用鼠标处理器的映射
+        self.touch_handler = TouchHandler(self.hid_devices['touch'], mouse_handler.mapper)
+        self.setAttribute(Qt.WA_AcceptTouchEvents, True)
+        if 'wheel_resolution_multiplier' in self.endpoint_map:  # 与描述符中的高分辨率滚轮倍数一致
+            mouse_handler.scroll_engine.resolution_multiplier = max(1, self.endpoint_map['wheel_resolution_multiplier'])
+        # 本地预测光标
+        self.cursor_overlay = CursorOverlay(self)
+        mouse_handler.absolute_sent.connect(self.cursor_overlay.on_absolute_sent)
+        self.ui.video_handler.frame_monitor.frame_probed.connect(self.cursor_overlay.on_video_frame)
+        # 自适应采集（画面静止/CPU饱和时降低采集帧率）
+        self.adaptive_capture = AdaptiveCaptureController(
+            self.ui.video_handler, self.ui.capability_cache, self,
+            reduce_resolution=self.ui.action_adaptive_resolution.isChecked())
+        self.ui.video_handler.frame_monitor.frame_probed.connect(self.adaptive_capture.on_video_frame)
+        self.adaptive_capture.set_enabled(self.ui.action_adaptive_capture.isChecked())
+        # 文本模式屏幕识别（默认关闭，首次使用时创建，见 _get_text_monitor）
+        self.text_monitor = None
+        # 读取被控机键盘LED状态
+        self.led_reader = KeyboardLedReader(self)
+        self.led_reader.leds_changed.connect(self._update_led_status)
+        self.led_reader.attach(self.hid_devices['keyboard'])
+        # 键盘、鼠标处理器移到输入线程，之后对它们的修改都经过 input_worker.call
+        keyboard_handler.key_status_changed.connect(self._on_key_status_changed)
+        keyboard_handler.text_sent.connect(lambda sent: self._show_status_message(f"文本已发送: {sent} 个字符", 3000))
+        mouse_handler.status_message.connect(self._show_status_message)
+        if process_supervisor.enabled:
+            self._init_child_processes()
+        else:
+            self.input_worker = InputWorker(keyboard_handler, mouse_handler, consumer_handler, self.touch_handler)
+            self.input_worker.start()
+        self._update_led_status(0)
+
+    # 多进程模式：采集、输入在子进程中运行，本进程的键盘、鼠标处理器只保存状态并转发信号
+    def _init_child_processes(self):
+        from module.input_process import RemoteInputWorker
+        from module.capture_process import RemoteCapture
+        self.supervisor = process_supervisor.ProcessSupervisor(self)
+        self.input_worker = RemoteInputWorker(keyboard_handler, mouse_handler, self)
+        self.input_worker.leds_changed.connect(self._update_led_status)
+        remote_capture = RemoteCapture(self.ui.centralwidget, self)
+        self.ui.video_handler.set_remote_capture(remote_capture)
+        self.supervisor.add(self.input_worker)
+        self.supervisor.add(remote_capture)
+        self.supervisor.crashed.connect(
+            lambda name, code: self._show_status_message(f"{name} 进程意外退出（退出码 {code}），正在重启", 5000))
+        self.supervisor.gave_up.connect(
+            lambda name: self._show_status_message(f"{name} 进程反复崩溃，已停止重启", 0))
+        # 录制、回放和延迟自检需要直接访问HID设备，只在单进程模式下可用
+        for action in (self.ui.action_record_input, self.ui.action_replay_input, self.ui.action_latency_test):
+            action.setEnabled(False)
+        self.supervisor.start()
+
+    # 键盘、鼠标HID设备是否可用（多进程模式下由输入进程报告）
+    def _hid_ready(self, name):
+        if process_supervisor.enabled and name in self.input_worker.devices:
+            return self.input_worker.device_ready(name)
+        return bool(self.hid_devices[name])
 
     # 初始化信号连接
     def _init_connections(self):
@@ -340,32 +615,485 @@ class MainWindow(QMainWindow):
 
         self.ui.action_keyboard_US.triggered.connect(lambda: self._switch_keyboard_layout('US')) #键盘布局切换
         self.ui.action_keyboard_UK.triggered.connect(lambda: self._switch_keyboard_layout('UK'))
+        self.ui.action_host_repeat.triggered.connect(self._switch_key_repeat)          # 按键重复策略
 
         def connect_shortcut(action):        # 快捷键菜单
             shortcut_text = action.text()
             action.triggered.connect(lambda: self.handle_shortcut(shortcut_text))
         for action in self.ui.menu_shortcut_key.actions():         # 为每个动作创建连接
             connect_shortcut(action)
+        self.ui.menu_media_keys.triggered.connect(lambda action: self.handle_shortcut(action.data()))  # 媒体/电源键
         self.ui.action_paste.triggered.connect(self.paste_to_controlled_machine)      # 粘贴动作
+        self.ui.action_latency_test.triggered.connect(self.run_latency_selftest)      # 延迟自检
+        self.ui.action_record_input.toggled.connect(self.toggle_input_recording)      # HID录制
+        self.ui.action_replay_input.triggered.connect(self.replay_input_recording)   # HID回放
+        self.ui.action_attach_image.triggered.connect(self.attach_disk_image)        # 虚拟存储
+        self.ui.action_detach_image.triggered.connect(self.detach_disk_image)
+        self.ui.action_image_stats.triggered.connect(
+            lambda: self._show_status_message(self._get_mass_storage().stats_text(), 5000))
+        self.ui.action_monitor_text.toggled.connect(self.toggle_text_monitor)    # 屏幕文本
+        self.ui.action_copy_screen_text.triggered.connect(self.copy_screen_text)
+        self.ui.action_learn_glyphs.triggered.connect(self.learn_screen_glyphs)
+        self.ui.action_find_screenshot.triggered.connect(self.find_current_screenshot)  # 截图库
+        self.ui.video_handler.on_screenshot_store_created = self._connect_screenshot_store
+        self.ui.action_cursor_overlay.toggled.connect(self._update_cursor_overlay)    # 本地预测光标
+        self.ui.action_cursor_overlay.toggled.connect(
+            lambda checked: self.ui.config_store.update(cursor_overlay=checked))
+        self.ui.action_adaptive_capture.toggled.connect(self.adaptive_capture.set_enabled)  # 自适应采集
+        self.ui.action_adaptive_capture.toggled.connect(
+            lambda checked: self.ui.config_store.update(adaptive_capture=checked))
+        self.ui.action_adaptive_resolution.toggled.connect(self.adaptive_capture.set_reduce_resolution)
+        self.ui.action_adaptive_resolution.toggled.connect(
+            lambda checked: self.ui.config_store.update(adaptive_resolution=checked))
+        self.ui.action_target_region.triggered.connect(self.edit_target_region)      # 多显示器目标区域
+        self.ui.profile_group.triggered.connect(lambda action: self.switch_profile(action.text()))  # 被控机配置
+        self.ui.action_new_profile.triggered.connect(self.create_profile)
 
 
-        #自定义快捷键
-        self.custom_shortcut_dialog = CustomShortcutDialog(self)
-        self.ui.custom_shortcut.triggered.connect(self.custom_shortcut_dialog.show)
-        self.custom_shortcut_dialog.shortcut_created.connect(self.handle_shortcut)
+        #自定义快捷键（对话框在首次使用时创建）
+        self.custom_shortcut_dialog = None
+        self.ui.custom_shortcut.triggered.connect(self.show_custom_shortcut_dialog)
 
 
   
 
 
+    # 初始化热插拔监视（采集卡插拔、USB gadget连接状态）
+    def _init_hotplug(self):
+        self.hotplug_monitor = HotplugMonitor(self)
+        self.hotplug_monitor.video_devices_changed.connect(self._on_video_devices_changed)
+        self.hotplug_monitor.udc_state_changed.connect(self._on_udc_state_changed)
+        # 写入失败（主机断开）时立即复查UDC状态，不等待下一次通知
+        keyboard_handler.transport_lost.connect(self.hotplug_monitor.poll)
+        mouse_handler.transport_lost.connect(self.hotplug_monitor.poll)
+        consumer_handler.transport_lost.connect(self.hotplug_monitor.poll)
+        self.touch_handler.transport_lost.connect(self.hotplug_monitor.poll)
+        self.hotplug_monitor.start()
+
+    # 采集设备插拔
+    def _on_video_devices_changed(self, added, removed):
+        self.ui.refresh_input_devices()
+        if self.ui.video_handler.is_camera_started() and not self.ui.video_handler.is_current_device_present():
+            self.ui.video_handler.set_webcam(False)
+            self._show_status_message("当前采集设备已断开", 5000)
+        elif added:
+            self._show_status_message(f"检测到新的采集设备: {', '.join(added)}", 3000)
+
+    # USB gadget 连接状态变化
+    def _on_udc_state_changed(self, udc, state):
+        if state == 'configured':
+            self._reopen_hid_devices()
+            self._show_status_message("被控机已连接，HID设备已恢复", 3000)
+        else:
+            self._show_status_message(f"被控机连接状态: {state}", 3000)
+
+    # 重新打开HID设备并发送空报告，避免被控机残留按键
+    def _reopen_hid_devices(self):
+        # 先让输入线程停止使用旧设备，避免写入已关闭（或被复用）的描述符
+        if not process_supervisor.enabled:
+            self.input_worker.call(self._attach_consumer_device, None, consumer_handler.udc)
+            self.input_worker.call(self._attach_touch_device, self.touch_handler, None)
+            self.input_worker.call(self._attach_input_devices, None, None, None, wait=True)
+        self._close_hid_devices()
+        self._init_hid_devices()
+        if process_supervisor.enabled:
+            self.input_worker.reopen()
+        else:
+            self.input_worker.call(self._attach_input_devices, self.hid_devices['keyboard'],
+                                   self.hid_devices['mouse_absolute'], self.hid_devices['mouse_relative'])
+        self._aux_call(self._attach_consumer_device, self.hid_devices['consumer'],
+                            self.endpoint_map.get('udc') or consumer_handler.udc)
+        self._aux_call(self._attach_touch_device, self.touch_handler, self.hid_devices['touch'])
+        self.led_reader.attach(self.hid_devices['keyboard'])
+        if self.hid_recorder:
+            self.hid_recorder.attach(self.hid_devices)
+        logging.info("HID设备已重新打开")
+
+    # 在输入线程中替换键盘、鼠标设备并发送空报告
+    @staticmethod
+    def _attach_input_devices(keyboard, mouse_absolute, mouse_relative):
+        keyboard_handler.hid_keyboard = keyboard
+        mouse_handler.hid_mouse_absolute = mouse_absolute
+        mouse_handler.hid_mouse_relative = mouse_relative
+        if keyboard:
+            keyboard_handler._reset_keyboard_state()
+        if mouse_absolute or mouse_relative:
+            mouse_handler._reset_hid_devices()
+
+    # 媒体键、触控处理器单进程模式下在输入线程中运行；多进程模式下留在本进程（设备由本进程打开）
+    def _aux_call(self, function, *args):
+        if process_supervisor.enabled:
+            function(*args)
+        else:
+            self.input_worker.call(function, *args)
+
+    @staticmethod
+    def _attach_touch_device(touch_handler, touch):
+        touch_handler.hid_touch = touch
+        touch_handler.reset()  # 丢弃旧设备上的触点
+
+    @staticmethod
+    def _attach_consumer_device(consumer, udc):
+        consumer_handler.hid_consumer = consumer
+        consumer_handler.udc = udc
+        consumer_handler.release_all()
+
+    # 更新被控机锁定键状态显示
+    def _update_led_status(self, leds):
+        if not process_supervisor.enabled:  # 多进程模式下输入进程自行更新
+            self.input_worker.call(keyboard_handler.set_caps_lock, bool(leds & LED_CAPS_LOCK))
+        indicators = [("NUM", LED_NUM_LOCK), ("CAPS", LED_CAPS_LOCK), ("SCRL", LED_SCROLL_LOCK)]
+        self.ui.led_label.setText("  ".join(
+            f"<b>{name}</b>" if leds & bit else f"<span style='color:#A0A0A0'>{name}</span>"
+            for name, bit in indicators))
+
+    # 开始/停止录制发往被控机的HID报告
+    def toggle_input_recording(self, checked):
+        from module.hid_recorder import HidRecorder, FILE_SUFFIX
+        if not checked:
+            if self.hid_recorder:
+                path, records = self.hid_recorder.path, self.hid_recorder.records
+                self.hid_recorder.close()
+                self.hid_recorder = None
+                self._show_status_message(f"录制已保存: {path}（{records} 个报告）", 5000)
+            return
+        save_path = self.ui.video_handler.save_path
+        path = os.path.join(save_path, f"input_{datetime.now().strftime('%Y%m%d_%H%M%S')}{FILE_SUFFIX}")
+        try:
+            os.makedirs(save_path, exist_ok=True)
+            self.hid_recorder = HidRecorder(path)
+        except OSError as e:
+            logging.error(f"无法创建录制文件: {e}")
+            self.ui.action_record_input.setChecked(False)
+            return self._show_status_message(f"无法创建录制文件: {e}", 5000)
+        self.hid_recorder.attach(self.hid_devices)
+        self._show_status_message(f"正在录制输入: {path}", 3000)
+
+    # 回放录制文件（回放中再次选择则中止）
+    def replay_input_recording(self):
+        from module.hid_recorder import HidReplayer, FILE_SUFFIX
+        if self.hid_replayer and self.hid_replayer.is_running():
+            self.hid_replayer.stop()
+            return
+        if not any(self.hid_devices.values()):
+            return self._show_status_message("HID设备未就绪，无法回放", 3000)
+        path, _ = QFileDialog.getOpenFileName(self, "选择录制文件", self.ui.video_handler.save_path,
+                                              f"HID录制 (*{FILE_SUFFIX})")
+        if not path:
+            return
+        speed, ok = QInputDialog.getDouble(self, "回放录制", "回放倍速（0 表示尽快发送）:", 1.0, 0.0, 100.0, 1)
+        if not ok:
+            return
+        try:
+            self.hid_replayer = HidReplayer.from_file(path, self.hid_devices, speed, parent=self)
+        except (OSError, ValueError) as e:
+            return self._show_status_message(f"无法读取录制文件: {e}", 5000)
+        self.hid_replayer.progress.connect(
+            lambda done, total: self._show_status_message(f"回放中: {done}/{total}（再次选择\"回放录制\"中止）"))
+        self.hid_replayer.finished.connect(
+            lambda sent, aborted: self._show_status_message(f"回放{'已中止' if aborted else '完成'}: {sent} 个报告", 5000))
+        # 回放期间不转发本地输入；先丢弃排队的粘贴、松开按住的键，回放线程开始写入时输入线程已不再写键盘
+        self.input_worker.call(keyboard_handler._reset_keyboard_state, wait=True)
+        self.hid_replayer.start()
+        self._show_status_message(f"开始回放: {len(self.hid_replayer.records)} 个报告，"
+                                  f"时长 {self.hid_replayer.duration:.1f}s", 3000)
+
+    # 回放直接写HID设备，与输入线程的实时报告交错会互相覆盖按键、按钮状态
+    def _replaying(self):
+        return self.hid_replayer is not None and self.hid_replayer.is_running()
+
+    def _get_mass_storage(self):
+        if self.mass_storage is None:
+            from module.mass_storage import MassStorageController
+            function_dir = self.endpoint_map.get('mass_storage')
+            self.mass_storage = (MassStorageController(function_dir, parent=self) if function_dir
+                                 else MassStorageController(parent=self))
+            self.mass_storage.attached.connect(lambda path: self.ui.action_detach_image.setEnabled(True))
+            self.mass_storage.detached.connect(lambda: self.ui.action_detach_image.setEnabled(False))
+        return self.mass_storage
+
+    # 向被控机挂载磁盘镜像（ISO按光驱挂载，其它按U盘挂载）
+    def attach_disk_image(self):
+        from module.mass_storage import IMAGE_FILTER
+        controller = self._get_mass_storage()
+        if not controller.is_available():
+            return self._show_status_message("未找到大容量存储功能，请用新版 usb_gadget.sh 重新配置", 5000)
+        path, _ = QFileDialog.getOpenFileName(self, "选择磁盘镜像", self.ui.video_handler.save_path, IMAGE_FILTER)
+        if not path:
+            return
+        try:
+            controller.attach(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"挂载镜像失败: {e}")
+            return self._show_status_message(f"挂载镜像失败: {e}", 5000)
+        self._show_status_message(f"已挂载镜像: {os.path.basename(path)}", 3000)
+
+    def detach_disk_image(self):
+        try:
+            self._get_mass_storage().detach()
+        except OSError as e:
+            logging.error(f"弹出镜像失败: {e}")
+            return self._show_status_message(f"弹出镜像失败: {e}", 5000)
+        self._show_status_message("镜像已弹出", 3000)
+
+    # 文本识别导入numpy，只在开启记录或复制/学习/查找时创建并接入视频帧
+    def _get_text_monitor(self):
+        if self.text_monitor is None:
+            from module.text_screen_reader import TextScreenMonitor
+            self.text_monitor = TextScreenMonitor(parent=self)
+            self.text_monitor.lines_changed.connect(
+                lambda lines: [logging.info(f"屏幕文本 第{row + 1}行: {text}") for row, text in lines])
+            self.ui.video_handler.frame_monitor.frame_probed.connect(self.text_monitor.on_video_frame)
+        return self.text_monitor
+
+    def toggle_text_monitor(self, checked):
+        if checked or self.text_monitor is not None:
+            self._get_text_monitor().set_enabled(checked)
+
+    # 复制屏幕文本（下一帧解码后放入剪贴板）
+    def copy_screen_text(self):
+        if not self.ui.video_handler.is_camera_started():
+            self._show_status_message("摄像头未启动，无法识别屏幕文本", 3000)
+            return
+
+        def on_snapshot(gray, lines):
+            if lines is None:
+                self._show_status_message("当前画面不像文本屏幕（未检测到字符网格）", 5000)
+                return
+            reader = self.text_monitor.reader
+            QApplication.clipboard().setText(reader.text())
+            unknown = reader.unknown_cells()
+            hint = f"，{unknown} 个字符未识别（可用\"校正并学习字形\"）" if unknown else ""
+            self._show_status_message(f"屏幕文本已复制（{reader.grid}）{hint}", 5000)
+        self._get_text_monitor().snapshot(on_snapshot)
+
+    def _connect_screenshot_store(self, store):
+        store.stored.connect(self._on_screenshot_stored)
+        store.failed.connect(lambda path, error: self._show_status_message(f"截图入库失败: {error}", 5000))
+        store.open_failed.connect(lambda path, error: self._show_status_message(f"打开截图库失败: {error}", 5000))
+
+    # 截图入库完成（后台线程）
+    def _on_screenshot_stored(self, shot, is_new):
+        if is_new:
+            self._show_status_message(f"截图已保存: {shot.path}", 5000)
+        else:
+            self._show_status_message(f"与已有截图 {shot} 相同，已记录本次出现", 5000)
+
+    # 在截图库中查找当前画面（最早出现时间）
+    def find_current_screenshot(self):
+        from module.screenshot_store import format_time
+        store = self.ui.video_handler.get_screenshot_store()
+        if not self.ui.video_handler.is_camera_started():
+            self._show_status_message("摄像头未启动，无法获取当前画面", 3000)
+            return
+        if store.is_opening():
+            self._show_status_message("截图库正在加载，请稍后再试", 3000)
+            return
+        if not store.is_open():
+            self._show_status_message("截图库未打开，请检查文件保存路径", 3000)
+            return
+
+        def on_snapshot(gray, lines):
+            target = self.ui.config_store.config.active_profile
+            shot = store.find_same_gray(gray, target)
+            if shot is not None:
+                sightings = store.sightings(shot.id)
+                logging.info(f"当前画面 {shot} 的出现时间: {', '.join(format_time(t) for t in sightings)}")
+                self._show_status_message(
+                    f"当前画面最早出现于 {format_time(shot.first_seen)}，最近一次 {format_time(shot.last_seen)}，"
+                    f"共 {shot.seen} 次（{shot.path}）", 10000)
+                return
+            similar = store.find_similar_gray(gray, target=target)
+            for candidate, distance in similar:
+                logging.info(f"相似截图 {candidate}（距离 {distance}）: {candidate.path}")
+            hint = f"，有 {len(similar)} 张相似截图（见日志）" if similar else ""
+            self._show_status_message(f"截图库中没有当前画面{hint}", 5000)
+        self._get_text_monitor().snapshot(on_snapshot)
+
+    # 校正识别结果并学习字形
+    def learn_screen_glyphs(self):
+        if not self.ui.video_handler.is_camera_started():
+            self._show_status_message("摄像头未启动，无法识别屏幕文本", 3000)
+            return
+
+        def on_snapshot(gray, lines):
+            reader = self.text_monitor.reader
+            if lines is None:
+                reader.reset()  # 下一帧重新检测网格
+                self._show_status_message("当前画面不像文本屏幕（未检测到字符网格）", 5000)
+                return
+            # 在帧处理槽函数中只记录画面，对话框在事件循环的下一轮打开
+            grid, text = reader.grid, reader.text()
+            QTimer.singleShot(0, lambda: self._show_learn_glyphs_dialog(gray, grid, text))
+        self._get_text_monitor().snapshot(on_snapshot)
+
+    def _show_learn_glyphs_dialog(self, gray, grid, text):
+        reader = self.text_monitor.reader
+        text, ok = QInputDialog.getMultiLineText(
+            self, "校正并学习字形", "请把下面的文本改成与画面完全一致（行列对齐）：", text)
+        if not ok:
+            return
+        if reader.grid != grid:
+            self._show_status_message("字符网格已变化，请重新校正", 5000)
+            return
+        added = reader.learn(gray, text.split('\n'))
+        try:
+            reader.glyphs.save()
+        except OSError as e:
+            logging.error(f"字形缓存保存失败: {e}")
+            self._show_status_message(f"已学习 {added} 个新字形，但保存失败: {e}", 5000)
+            return
+        self._show_status_message(f"已学习 {added} 个新字形，共 {len(reader.glyphs) - 1} 个", 5000)
+
+    # 回环延迟自检：移动绝对鼠标到角落，在采集画面中检测光标出现
+    def run_latency_selftest(self):
+        from module.latency_probe import LatencyProbe, CornerCursorStimulus
+        if not self.ui.video_handler.is_camera_started() or not self.hid_devices['mouse_absolute']:
+            return self._show_status_message("摄像头或HID设备未就绪，无法进行延迟自检", 3000)
+        if self.mouse_mode != "absolute":
+            return self._show_status_message("请先切换到绝对模式再进行延迟自检", 3000)
+        # 报告由输入线程写出，与其他鼠标报告共用同一个写入者
+        stimulus = CornerCursorStimulus(
+            lambda report: self.input_worker.call(mouse_handler.send_hid_report, report, True),
+            target_region=self.ui.config_store.profile.target_region)
+        self.latency_probe = LatencyProbe(stimulus, parent=self)
+        self.latency_probe.progress.connect(
+            lambda done, total: self._show_status_message(f"延迟自检中: {done}/{total}"))
+        self.latency_probe.finished.connect(self._on_latency_selftest_finished)
+        self.ui.video_handler.frame_monitor.frame_probed.connect(self.latency_probe.on_video_frame)
+        self.input_worker.call(mouse_handler.set_capture, False)  # 自检期间不转发本地鼠标
+        self.ui.action_latency_test.setEnabled(False)
+        self.latency_probe.start()
+
+    def _on_latency_selftest_finished(self, result):
+        self.ui.video_handler.frame_monitor.frame_probed.disconnect(self.latency_probe.on_video_frame)
+        self.input_worker.call(mouse_handler.set_capture, True)
+        self.ui.action_latency_test.setEnabled(True)
+        result['present_ms_p50'] = self.ui.video_handler.frame_monitor.get_summary()['present_ms_p50']
+        result['camera'] = self.ui.video_handler.get_camera_info()
+        logging.info(f"延迟自检结果: {result}")
+        if not result['count']:
+            return self._show_status_message("延迟自检失败：未检测到画面变化", 5000)
+        path = os.path.join(self.ui.video_handler.save_path,
+                            f"latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(self.ui.video_handler.save_path, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            logging.error(f"保存延迟自检结果失败: {e}")
+        self._show_status_message(
+            f"回环延迟 p50/p95/max: {result['p50_ms']:.0f}/{result['p95_ms']:.0f}/{result['max_ms']:.0f} ms "
+            f"({result['count']} 次, 超时 {result['timeouts']})", 15000)
+
+    # 显示自定义快捷键对话框
+    def show_custom_shortcut_dialog(self):
+        if self.custom_shortcut_dialog is None:
+            from custom_shortcut_dialog import CustomShortcutDialog
+            self.custom_shortcut_dialog = CustomShortcutDialog(self)
+            self.custom_shortcut_dialog.shortcut_created.connect(self.handle_shortcut)
+        self.custom_shortcut_dialog.show()
+
+    # 切换按键重复策略（被控机重复 / 主机端重复）
+    def _switch_key_repeat(self, checked):
+        profile = self.ui.config_store.profile
+        mode = REPEAT_HOST if checked else REPEAT_TARGET
+        self.input_worker.call(keyboard_handler.set_repeat_policy, mode, profile.repeat_delay_ms, profile.repeat_rate_hz)
+        self.ui.config_store.update_profile(key_repeat=mode)
+
     # 切换键盘布局
     def _switch_keyboard_layout(self, layout):
         if keyboard_handler:
-            keyboard_handler.set_keyboard_layout(layout)
+            self.input_worker.call(keyboard_handler.set_keyboard_layout, layout)
             self.ui.statusbar.showMessage(f"键盘布局已切换为: {layout}", 3000)
-            # 可以在这里添加保存布局设置的代码
-            if hasattr(self, 'settings'):
-                self.settings.setValue("keyboard_layout", layout)
+            self.ui.config_store.update_profile(keyboard_layout=layout)
+
+    # 应用当前被控机配置
+    def _apply_profile(self):
+        profile = self.ui.config_store.profile
+        layout_action = self.ui.action_keyboard_UK if profile.keyboard_layout == 'UK' else self.ui.action_keyboard_US
+        layout_action.setChecked(True)
+        self.input_worker.call(keyboard_handler.set_keyboard_layout, profile.keyboard_layout)
+        self.input_worker.call(keyboard_handler.set_paste_interval, profile.paste_interval)
+        self.input_worker.call(keyboard_handler.set_repeat_policy,
+                               profile.key_repeat, profile.repeat_delay_ms, profile.repeat_rate_hz)
+        self.ui.action_host_repeat.setChecked(profile.key_repeat == REPEAT_HOST)
+        self.input_worker.call(mouse_handler.set_target_region, profile.target_region)  # 触控共用该映射
+        if profile.mouse_mode == "relative":
+            # 恢复为未锁定的相对模式，点击取景器后才捕获鼠标
+            self.ui.action_mouse_relative.setChecked(True)
+            self.releaseMouse()
+            self.unsetCursor()
+            self.mouse_mode = "relative"
+            self.mouse_locked = False
+            self.input_worker.call(mouse_handler.set_mode, self.mouse_mode)
+            self._update_cursor_overlay()
+        else:
+            self.ui.action_mouse_absolute.setChecked(True)
+            self._switch_to_absolute_mode()
+        # 按采集卡标识恢复设备和分辨率（只做QUERYCAP，不重新探测格式）
+        device_name = self._find_profile_device(profile)
+        if not device_name:
+            return
+        camera_config = self.ui.video_handler.camera_config
+        wanted = (device_name, profile.resolution[0], profile.resolution[1])
+        current = (camera_config['device_name'], camera_config['resolution_X'], camera_config['resolution_Y'])
+        if wanted != current or not self.ui.video_handler.is_camera_started():
+            camera_config['resolution_X'], camera_config['resolution_Y'] = profile.resolution
+            self.ui.select_camera_by_name(device_name)
+
+    # 设置被采集显示器在被控机虚拟桌面中的位置（多显示器）
+    def edit_target_region(self):
+        text, ok = QInputDialog.getText(
+            self, "多显示器目标区域",
+            "被控机虚拟桌面尺寸、被采集显示器的位置和尺寸（像素）:\n"
+            "格式: 桌面宽x高 显示器X,Y 显示器宽x高，例如 3840x1080 1920,0 1920x1080\n"
+            "留空表示采集的是整个桌面")
+        if not ok:
+            return
+        match = re.fullmatch(r'\s*(\d+)x(\d+)\s+(\d+),(\d+)\s+(\d+)x(\d+)\s*', text)
+        try:
+            # 先在临时映射上校验，再交给输入线程
+            mapper = CoordinateMapper()
+            if not text.strip():
+                mapper.set_target_region([0.0, 0.0, 1.0, 1.0])
+            elif match:
+                mapper.set_target_monitor(*(int(v) for v in match.groups()))
+            else:
+                raise ValueError(text)
+        except (ValueError, ZeroDivisionError):
+            return self._show_status_message("目标区域格式无效", 5000)
+        region = list(mapper.target_region)
+        self.input_worker.call(mouse_handler.set_target_region, region)
+        self.ui.config_store.update_profile(target_region=region)
+        self._show_status_message(f"目标区域: {', '.join(f'{v:.3f}' for v in region)}", 5000)
+
+    # 查找配置中记录的采集设备
+    def _find_profile_device(self, profile):
+        device_names = [camera.deviceName() for camera in self.ui.online_webcams]
+        if profile.device_identity:
+            for device_name in device_names:
+                if self.ui.capability_cache.identity_for(device_name) == profile.device_identity:
+                    return device_name
+        return profile.device_path if profile.device_path in device_names else None
+
+    # 切换被控机配置
+    def switch_profile(self, name):
+        if name == self.ui.config_store.config.active_profile:
+            return
+        self.ui.config_store.switch_profile(name)
+        self._apply_profile()
+        self._show_status_message(f"已切换到被控机配置: {name}", 3000)
+
+    # 新建被控机配置（复制当前配置）
+    def create_profile(self):
+        name, ok = QInputDialog.getText(self, "新建配置", "被控机名称:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        self.ui.config_store.switch_profile(name, copy_from=self.ui.config_store.config.active_profile)
+        self.ui.refresh_profile_menu()
+        self._show_status_message(f"已创建被控机配置: {name}", 3000)
 
     # 鼠标模式相关方法
     def switch_mouse_mode(self):
@@ -373,29 +1101,43 @@ class MainWindow(QMainWindow):
             self._switch_to_absolute_mode()
         else:
             self._switch_to_relative_mode()
-        keyboard_handler._reset_keyboard_state()
+        self.ui.config_store.update_profile(mouse_mode=self.mouse_mode)
+        self.input_worker.call(keyboard_handler._reset_keyboard_state)
 
     # 切换到绝对模式
     def _switch_to_absolute_mode(self):
         self.mouse_mode = "absolute"
-        mouse_handler.set_mode(self.mouse_mode)
+        self.input_worker.call(mouse_handler.set_mode, self.mouse_mode)
         self.mouse_locked = False
         self.setMouseTracking(True)     # 鼠标追踪
         self.ui.centralwidget.setMouseTracking(True)
         self.releaseMouse()#释放鼠标
         self.unsetCursor()#释放光标
+        self._update_cursor_overlay()
         self._show_status_message("鼠标模式：绝对模式", 3000)
 
     # 切换到相对模式
     def _switch_to_relative_mode(self):
         self.mouse_mode = "relative"
-        mouse_handler.set_mode(self.mouse_mode)
+        self.input_worker.call(mouse_handler.set_mode, self.mouse_mode)
+        self.setCursor(Qt.BlankCursor)  # 隐藏全局光标
         self.setMouseTracking(True)     # 鼠标追踪
         self.ui.centralwidget.setMouseTracking(True)
         self.mouse_locked = True
+        self._update_cursor_overlay()
         self.centerMouse()
         self._show_status_message("鼠标模式：相对模式已启用。按 Ctrl+Alt+F2 退出相对模式。", 10000)
 
+    # 本地预测光标只在绝对模式下启用
+    def _update_cursor_overlay(self):
+        enabled = self.mouse_mode == "absolute" and self.ui.action_cursor_overlay.isChecked()
+        self.cursor_overlay.set_enabled(enabled)
+        # 预测光标代替系统光标，取景器上只显示一个本地光标
+        if enabled:
+            self.ui.centralwidget.setCursor(Qt.BlankCursor)
+        else:
+            self.ui.centralwidget.unsetCursor()
+
     # 将鼠标居中
     def centerMouse(self):
         center = self.ui.centralwidget.rect().center()
@@ -405,9 +1147,10 @@ class MainWindow(QMainWindow):
     # 统一处理所有鼠标输入事件的方法
     def _handle_input_event(self, event_type, event):
         self.camera_started = self.ui.video_handler.is_camera_started()
-        if not self.camera_started:
+        if not self.camera_started or self._replaying():
             return
-            
+        self.adaptive_capture.notify_activity()
+
         # 在相对模式下，如果鼠标未锁定且点击了取景器，重新进入相对模式
         if (event_type == 'press' and 
             self.mouse_mode == "relative" and 
@@ -416,16 +1159,37 @@ class MainWindow(QMainWindow):
             self._switch_to_relative_mode()
             return
             
-        #使用字典来存储事件类型和对应的处理方法
-        event_handlers = {
-            'press': mouse_handler.mousePressEvent,
-            'release': mouse_handler.mouseReleaseEvent,
-            'wheel': mouse_handler.wheelEvent,
-            'move': mouse_handler.mouseMoveEvent
-        }
-        
-        if event_type in event_handlers:
-            event_handlers[event_type](event)
+        # 只取出按钮、坐标和滚动量投递到输入线程
+        if event_type == 'wheel':
+            return self.input_worker.post(wheel_tuple(event))
+        kind = {'press': MOUSE_PRESS, 'release': MOUSE_RELEASE, 'move': MOUSE_MOVE}.get(event_type)
+        if kind is None:
+            return
+        x, y = event.pos().x(), event.pos().y()
+        if self.mouse_mode == "relative" and near_edge(self.viewport[0], self.viewport[1], x, y):
+            # 光标接近边缘：先发送这次位移，再移回中心；回中之后的事件都从中心计算位移
+            self.input_worker.post((MOUSE_MOVE, x, y, True) if kind == MOUSE_MOVE else mouse_tuple(kind, event))
+            center_x, center_y = relative_center(self.viewport[0], self.viewport[1])
+            self.cursor().setPos(self.mapToGlobal(QtCore.QPoint(center_x, center_y)))
+            self.input_worker.post((RECENTER, center_x, center_y))
+        else:
+            self.input_worker.post(mouse_tuple(kind, event))
+    # 触摸事件：有触控端点时转发为多点触控报告，否则由Qt合成鼠标事件
+    def event(self, event):
+        if event.type() in TOUCH_EVENTS and self.hid_devices['touch'] and self.ui.video_handler.is_camera_started():
+            if self._replaying():
+                event.accept()
+                return True
+            for touch in touch_tuples(event):
+                if process_supervisor.enabled:
+                    self.touch_handler.handle_event(touch)
+                else:
+                    self.input_worker.post(touch)
+            self.adaptive_capture.notify_activity()
+            event.accept()
+            return True
+        return super().event(event)
+
     # 鼠标事件
     def mousePressEvent(self, event): self._handle_input_event('press', event)
     def mouseReleaseEvent(self, event): self._handle_input_event('release', event)
@@ -434,7 +1198,7 @@ class MainWindow(QMainWindow):
 
     # 键盘事件
     def keyPressEvent(self, event):
-        if not self.ui.video_handler.is_camera_started():
+        if not self.ui.video_handler.is_camera_started() or self._replaying():
             return super().keyPressEvent(event)
             
         if self.mouse_locked or self.ui.centralwidget.underMouse():
@@ -445,19 +1209,22 @@ class MainWindow(QMainWindow):
                 self.unsetCursor()#释放光标
                 self.setMouseTracking(False)
                 self.ui.centralwidget.setMouseTracking(False)
+            elif consumer_handler.handles(event.key()):
+                self._aux_call(consumer_handler.handle_key, event.key(), True, event.isAutoRepeat())
             else:
-                keyboard_handler.handle_key_event(event, True)
-                self.update_key_status()
+                self.adaptive_capture.notify_activity()
+                self.input_worker.post(key_tuple(event, True))
         else:
             super().keyPressEvent(event)
 
     # 键盘释放事件
     def keyReleaseEvent(self, event):
-        if not self.ui.video_handler.is_camera_started():
+        if not self.ui.video_handler.is_camera_started() or self._replaying():
             return super().keyReleaseEvent(event)
-        if self.ui.centralwidget.underMouse():
-            keyboard_handler.handle_key_event(event, False)
-            self.update_key_status()
+        if consumer_handler.handles(event.key()):
+            self._aux_call(consumer_handler.handle_key, event.key(), False, event.isAutoRepeat())
+        elif self.ui.centralwidget.underMouse():
+            self.input_worker.post(key_tuple(event, False))
         else:
             super().keyReleaseEvent(event)
 
@@ -471,18 +1238,26 @@ class MainWindow(QMainWindow):
         if not self.ui.video_handler.is_camera_started():
             self._show_status_message("摄像头未启动，无法发送快捷键", 3000)
             return
-        if self.hid_devices['keyboard']:
-            keyboard_handler.send_shortcut(shortcut)
+        if self._replaying():
+            return self._show_status_message("正在回放录制，无法发送快捷键", 3000)
+        if canonical_name(shortcut):  # 媒体/电源键（菜单或自定义快捷键中的按键名称）
+            if not self.hid_devices['consumer']:
+                self._show_status_message("媒体键HID设备未就绪（请用新版 usb_gadget.sh 重新配置）", 3000)
+            else:
+                self._aux_call(consumer_handler.press, shortcut)
+                self._show_status_message(f"已发送: {canonical_name(shortcut)}", 3000)
+            return
+        if self._hid_ready('keyboard'):
+            self.input_worker.call(keyboard_handler.send_shortcut, shortcut)
             self._show_status_message(f"已发送快捷键: {shortcut}", 3000)
         else:
             self._show_status_message("HID设备未就绪，无法发送快捷键", 3000)
 
-    # 状态更新方法
-    def update_key_status(self):
+    # 状态更新方法（按键状态由输入线程处理完事件后发来）
+    def _on_key_status_changed(self, key_status):
         if not self.ui.video_handler.is_camera_started():
             return self.ui.statusbar.clearMessage()
         if self.ui.centralwidget.underMouse():
-            key_status = keyboard_handler.get_key_status()
             self._show_status_message(key_status if key_status else None)
         else:
             self.ui.statusbar.clearMessage()
@@ -506,12 +1281,14 @@ class MainWindow(QMainWindow):
     # 发送文本到设备
     def send_text_to_device(self, text):
         if not (self.ui.video_handler.is_camera_started() and 
-                self.hid_devices['keyboard']):
+                self._hid_ready('keyboard')):
             return self._show_status_message("HID设备未就绪，无法发送文本", 3000)
+        if self._replaying():
+            return self._show_status_message("正在回放录制，无法发送文本", 3000)
             
-        for char in text:
-            keyboard_handler.send_character(char)
-        self._show_status_message("文本已发送", 3000)
+        # 在输入线程中按节拍发送，完成后由 text_sent 信号更新状态栏
+        self.input_worker.call(keyboard_handler.send_text, text)
+        self._show_status_message(f"正在发送文本: {len(text)} 个字符")
 
        # 窗口调整相关方法
     def resizeEvent(self, event):
@@ -521,6 +1298,11 @@ class MainWindow(QMainWindow):
 
     # 窗口状态改变事件
     def changeEvent(self, event):
+        if event.type() == QtCore.QEvent.ActivationChange and not self.isActiveWindow():
+            # 失去焦点后收不到松开事件，按键会在被控机上一直重复
+            # 按键状态属于输入线程（或输入进程），由它检查并释放
+            if keyboard_handler:
+                self.input_worker.call(keyboard_handler.release_held_keys)
         if event.type() == QtCore.QEvent.WindowStateChange:
             # 添加短暂延迟以确保窗口状态已完全改变
             QtCore.QTimer.singleShot(10, lambda: self.adjust_viewfinder_size(self.width(), self.height()))
@@ -547,7 +1329,9 @@ class MainWindow(QMainWindow):
         width, height, x_offset, y_offset = new_size
         y_offset += menu_height
         self._apply_viewfinder_size(width, height, x_offset, y_offset)
-        mouse_handler.update_viewport(width, height, x_offset, y_offset)
+        self.viewport = (width, height, x_offset, y_offset)
+        self.input_worker.call(mouse_handler.update_viewport, width, height, x_offset, y_offset)
+        self.cursor_overlay.update_viewport(width, height, x_offset, y_offset)
         self.update()
 
     # 检查是否可以调整取景器
@@ -581,12 +1365,32 @@ class MainWindow(QMainWindow):
 
     # 清理方法
     def closeEvent(self, event):
+        self.hotplug_monitor.stop()
+        if process_supervisor.enabled:
+            self.supervisor.stop()  # 子进程读到管道关闭后释放摄像头和HID设备
+            self.input_worker.close()
+            self.ui.video_handler.remote_capture.close()
+        else:
+            self.input_worker.stop()
+        if self.hid_replayer:
+            self.hid_replayer.stop()
+        if self.hid_recorder:
+            self.hid_recorder.close()
+        if self.mass_storage:
+            try:
+                self.mass_storage.detach()
+            except OSError as e:
+                logger.warning(f"退出时弹出镜像失败: {e}")
         self.ui.video_handler.set_webcam(False)
+        if self.ui.video_handler.screenshot_store is not None:
+            self.ui.video_handler.screenshot_store.close()
         self._close_hid_devices()
+        self.ui.config_store.flush()
         super().closeEvent(event)
 
     #关闭hid设备
     def _close_hid_devices(self):
+        self.led_reader.detach()  # 先停止监听，再关闭描述符
         for device_name, device in self.hid_devices.items():
             if device:
                 logging.info(f"正在关闭HID设备: {device_name}")
@@ -600,6 +1404,7 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    startup_timing.mark("窗口显示")
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""YUV到RGB/灰度转换基准（module.color_convert）
+
+在 720p 和 1080p 的合成YUYV、NV12帧上测量每秒转换帧数、每帧CPU时间和每帧分配
+（预分配缓冲区时应接近0），并与逐帧分配的浮点实现对比。
+
+用法:
+    python benchmarks/bench_color.py [--frames 60] [--output color.json] [--compare baseline.json]
+"""
+import argparse
+
+from bench_common import measure, write_results  # noqa: E402
+from module.color_convert import (LAYOUT_RGB888, LAYOUT_RGB32, YuvConverter,  # noqa: E402
+                                  reference_rgb, synthetic_frame)
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080)}
+# (格式, 缩放, 输出布局)
+CASES = [
+    ('yuyv', 1, LAYOUT_RGB888),
+    ('yuyv', 1, LAYOUT_RGB32),
+    ('yuyv', 2, LAYOUT_RGB32),
+    ('yuyv', 4, LAYOUT_RGB32),
+    ('nv12', 1, LAYOUT_RGB888),
+    ('nv12', 2, LAYOUT_RGB32),
+]
+
+
+def _result(name, frames, dispatch):
+    result = measure(name, frames, dispatch, alloc_sample=min(len(frames), 10))
+    result['fps'] = result['events_per_sec']
+    result['ms_per_frame'] = result['cpu_us_per_event'] / 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=60, help='每种情况的转换帧数')
+    parser.add_argument('--output', help='写入JSON结果文件')
+    parser.add_argument('--compare', help='与之前的JSON结果对比')
+    args = parser.parse_args()
+
+    results = []
+    for label, (width, height) in RESOLUTIONS.items():
+        for pixel_format in ('yuyv', 'nv12'):
+            data = synthetic_frame(pixel_format, width, height)
+            frames = [data] * args.frames
+            results.append(_result(f"{pixel_format}_{label}_float", frames[:max(1, args.frames // 4)],
+                                   lambda frame: reference_rgb(frame, pixel_format, width, height)))
+            converter = YuvConverter(pixel_format, width, height)
+            results.append(_result(f"{pixel_format}_{label}_gray", frames, converter.to_gray))
+            for case_format, scale, layout in CASES:
+                if case_format != pixel_format:
+                    continue
+                converter = YuvConverter(pixel_format, width, height, scale=scale, layout=layout)
+                results.append(_result(f"{pixel_format}_{label}_{layout}_scale{scale}", frames, converter.to_rgb))
+    write_results('color', results, args.output, args.compare)
+
+
+if __name__ == '__main__':
+    main()
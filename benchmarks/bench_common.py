@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""基准测试共用工具：假HID设备、计时/分配统计和JSON结果输出"""
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from module.hid_writer import HidReportWriter  # noqa: E402
+
+
+class MemoryHidDevice:
+    """内存中的假HID设备，只统计报告数和字节数"""
+
+    def __init__(self, name=''):
+        self.name = name
+        self.reports = 0
+        self.bytes = 0
+
+    def write(self, report):
+        self.reports += 1
+        self.bytes += len(report)
+        return len(report)
+
+    def write_burst(self, reports, interval=None, coalesce=False):
+        for report in reports:
+            self.write(report)
+        return len(reports)
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        return -1
+
+    def close(self):
+        pass
+
+
+class PipeHidDevice(HidReportWriter):
+    """以管道为替身的HID设备，后台线程读空另一端，写入路径与真实设备一致"""
+
+    def __init__(self, name=''):
+        read_fd, write_fd = os.pipe()
+        super().__init__(write_fd, name=name, raw=True, poll_interval=0)
+        self._read_fd = read_fd
+        self._drain = threading.Thread(target=self._drain_loop, daemon=True)
+        self._drain.start()
+
+    def _drain_loop(self):
+        while True:
+            try:
+                if not os.read(self._read_fd, 65536):
+                    break
+            except OSError:
+                break
+
+    def write_burst(self, reports, interval=None, coalesce=False):
+        return super().write_burst(reports, 0, coalesce)  # 基准中不模拟主机节拍
+
+    def close(self):
+        super().close()
+        self._drain.join(timeout=1)
+        os.close(self._read_fd)
+
+
+def make_device(kind, name=''):
+    return PipeHidDevice(name) if kind == 'pipe' else MemoryHidDevice(name)
+
+
+def measure(name, events, dispatch, alloc_sample=1000):
+    """执行一组事件并统计吞吐、CPU时间和分配
+
+    dispatch(event) 处理单个事件。alloc_bytes_per_event 为单个事件处理期间
+    tracemalloc 观察到的瞬时峰值（包括随即释放的临时对象），在单独一轮中抽样测得。
+    """
+    count = len(events)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for event in events:
+        dispatch(event)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    sample = events[:alloc_sample]
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    transient = 0
+    for event in sample:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        dispatch(event)
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - current
+    tracemalloc.stop()
+    net_blocks = sys.getallocatedblocks() - blocks_before
+
+    return {
+        'name': name,
+        'events': count,
+        'events_per_sec': count / wall if wall else 0.0,
+        'cpu_us_per_event': cpu / count * 1e6 if count else 0.0,
+        'alloc_bytes_per_event': transient / len(sample) if sample else 0.0,
+        'net_blocks_per_event': net_blocks / len(sample) if sample else 0.0,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def write_results(suite, results, output=None, compare=None):
+    """打印结果，并按需写入JSON文件、与基线JSON对比"""
+    document = {
+        'suite': suite,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    baseline = {}
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            baseline = {r['name']: r for r in json.load(f).get('results', [])}
+    for result in results:
+        line = f"{result['name']:28}" + ''.join(
+            f" {key}={value:.2f}" if isinstance(value, float) else f" {key}={value}"
+            for key, value in result.items() if key != 'name')
+        old = baseline.get(result['name'])
+        metric = 'events_per_sec' if 'events_per_sec' in result else 'fps'
+        if old and old.get(metric) and result.get(metric):
+            change = (result[metric] / old[metric] - 1) * 100
+            line += f"  ({change:+.1f}% vs 基线)"
+        print(line)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {output}")
+    return document
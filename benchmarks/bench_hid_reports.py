@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""HID报告构建微基准：旧的 struct.pack/列表写法 与 module.hid_reports 中的构建器 对比
+
+只测报告构建本身（不经过Qt事件和设备写入），端到端对比请用 bench_input.py --compare。
+复用缓冲区的键盘、相对鼠标构建器应为零分配（zero_alloc），否则以非零状态退出。
+
+用法:
+    python benchmarks/bench_hid_reports.py [--events 200000] [--output reports.json] [--compare baseline.json]
+"""
+import sys
+import random
+import struct
+import argparse
+
+from bench_common import measure, write_results  # noqa: E402
+from module.hid_reports import KeyboardReport, RelativeMouseReport, AbsoluteMouseReport  # noqa: E402
+
+
+ALLOC_FREE_BUILDERS = ('keyboard_builder', 'relative_builder')
+
+
+def keyboard_events(count, rng):
+    """按键序列 (修饰键, 键码, 是否按下)：最多同时按住3个键，按下后以一定概率松开"""
+    held = []
+    events = []
+    for _ in range(count):
+        if held and (len(held) == 3 or rng.random() < 0.5):
+            events.append((rng.choice((0, 0, 0x02, 0x01)), held.pop(rng.randrange(len(held))), False))
+        else:
+            code = rng.choice([c for c in range(4, 0x66) if c not in held])
+            held.append(code)
+            events.append((rng.choice((0, 0, 0x02, 0x01)), code, True))
+    return events
+
+
+def legacy_keyboard(modifiers, pressed):
+    keys = list(pressed.values())[:6]
+    keys.extend([0] * (6 - len(keys)))
+    return struct.pack('BBBBBBBB', modifiers, 0, *keys)
+
+
+def legacy_absolute(buttons, x, y):
+    return struct.pack('<BHHHH', buttons, x, y, 0, 0)
+
+
+def legacy_relative(buttons, dx, dy):
+    dx = max(-127, min(127, dx))
+    dy = max(-127, min(127, dy))
+    return struct.pack('<BBBBB', buttons, dx & 0xFF, dy & 0xFF, 0, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--output', help='写入JSON结果文件')
+    parser.add_argument('--compare', help='与之前的JSON结果对比')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    key_events = keyboard_events(args.events, rng)
+    positions = [(rng.randint(0, 1), rng.randint(0, 32767), rng.randint(0, 32767)) for _ in range(args.events)]
+    moves = [(0, rng.randint(-200, 200), rng.randint(-200, 200)) for _ in range(args.events)]
+
+    keyboard = KeyboardReport()
+    legacy_pressed = {}
+
+    # 两种写法都包含按下/松开时的状态更新（旧写法更新字典，构建器更新报告的键码槽位）
+    def legacy_key(e):
+        if e[2]:
+            legacy_pressed[e[1]] = e[1]
+        else:
+            del legacy_pressed[e[1]]
+        return legacy_keyboard(e[0], legacy_pressed)
+
+    def builder_key(e):
+        if e[2]:
+            keyboard.press(e[1])
+        else:
+            keyboard.release(e[1])
+        return keyboard.build(e[0])
+
+    absolute = AbsoluteMouseReport()
+    relative = RelativeMouseReport()
+    # 参数逐个传入：f(*e) 会为方法调用创建临时的绑定方法对象，与热路径上的 obj.build(...) 调用不一致
+    results = [
+        measure('keyboard_legacy_pack', key_events, legacy_key),
+        measure('keyboard_builder', key_events, builder_key),
+        measure('absolute_legacy_pack', positions, lambda e: legacy_absolute(e[0], e[1], e[2])),
+        measure('absolute_builder', positions, lambda e: absolute.build(e[0], e[1], e[2])),
+        measure('relative_legacy_pack', moves, lambda e: legacy_relative(e[0], e[1], e[2])),
+        measure('relative_builder', moves, lambda e: relative.build(e[0], e[1], e[2])),
+    ]
+    for legacy, builder in zip(results[::2], results[1::2]):
+        builder['speedup_vs_legacy'] = builder['events_per_sec'] / legacy['events_per_sec']
+        builder['zero_alloc'] = builder['alloc_bytes_per_event'] == 0
+    write_results('hid_reports', results, args.output, args.compare)
+    allocating = [r['name'] for r in results if r['name'] in ALLOC_FREE_BUILDERS and not r['zero_alloc']]
+    if allocating:
+        print(f"热路径上有分配: {', '.join(allocating)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
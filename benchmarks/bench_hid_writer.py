@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""HID报告写入路径基准：缓冲文件对象 vs 原始fd逐个写入 vs writev合并
+
+以 FIFO 和 pty 作为 /dev/hidgN 的替身，后台线程持续读空另一端。
+用法: python benchmarks/bench_hid_writer.py [--reports 20000] [--burst 16]
+"""
+import os
+import sys
+import tty
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from module.hid_writer import HidReportWriter  # noqa: E402
+
+REPORT = bytes([0x02, 0, 0x04, 0, 0, 0, 0, 0])
+
+
+def _drain(fd, stop):
+    while not stop.is_set():
+        try:
+            if not os.read(fd, 65536):
+                break
+        except OSError:
+            break
+
+
+def _open_fifo():
+    directory = tempfile.mkdtemp(prefix='kvm-bench-')
+    path = os.path.join(directory, 'hidg')
+    os.mkfifo(path)
+    reader = {}
+    opener = threading.Thread(target=lambda: reader.setdefault('fd', os.open(path, os.O_RDONLY)))
+    opener.start()
+    write_fd = os.open(path, os.O_WRONLY)
+    opener.join()
+
+    def cleanup():
+        os.unlink(path)
+        os.rmdir(directory)
+    return write_fd, reader['fd'], cleanup
+
+
+def _open_pty():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, lambda: None
+
+
+def run_case(opener, mode, reports, burst):
+    write_fd, read_fd, cleanup = opener()
+    stop = threading.Event()
+    drain = threading.Thread(target=_drain, args=(read_fd, stop), daemon=True)
+    drain.start()
+    writer = HidReportWriter(write_fd, name=mode, raw=(mode != 'buffered'))
+    batch = [REPORT] * burst
+    batches = reports // burst
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(batches):
+        if mode == 'buffered':
+            for report in batch:  # 原有路径：每个报告 write() + flush()
+                writer.write(report)
+        else:
+            writer.write_burst(batch, interval=0, coalesce=(mode == 'writev'))
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    writer.close()
+    stop.set()
+    os.close(read_fd)
+    drain.join(timeout=1)
+    cleanup()
+    sent = batches * burst
+    return {
+        'reports': sent,
+        'reports_per_sec': sent / wall,
+        'us_per_report': wall / sent * 1e6,
+        'cpu_us_per_report': cpu / sent * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=20000)
+    parser.add_argument('--burst', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'stand-in':8} {'mode':9} {'reports/s':>12} {'us/report':>10} {'cpu us':>8}")
+    for name, opener in (('fifo', _open_fifo), ('pty', _open_pty)):
+        for mode in ('buffered', 'raw', 'writev'):
+            result = run_case(opener, mode, args.reports, args.burst)
+            print(f"{name:8} {mode:9} {result['reports_per_sec']:12.0f} "
+                  f"{result['us_per_report']:10.2f} {result['cpu_us_per_report']:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
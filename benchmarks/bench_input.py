@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""键盘/鼠标HID报告生成与分发基准
+
+用合成的 QKeyEvent/QMouseEvent 流驱动 KeyboardHandler 和 MouseHandler，
+输出到内存或管道假设备，统计事件/秒、每事件CPU时间和分配。
+
+用法:
+    python benchmarks/bench_input.py [--device memory|pipe] [--output result.json] [--compare baseline.json]
+"""
+import os
+import random
+import logging
+import argparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from bench_common import make_device, measure, write_results  # noqa: E402
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF  # noqa: E402
+from PyQt5.QtGui import QKeyEvent, QMouseEvent, QWheelEvent  # noqa: E402
+from PyQt5.QtWidgets import QApplication, QWidget  # noqa: E402
+
+import module.keyboard_module as keyboard_module  # noqa: E402
+from module.keyboard_module import KeyboardHandler  # noqa: E402
+from module.mouse_module import MouseHandler  # noqa: E402
+
+VIEWPORT = (1280, 720)
+PASTE_ALPHABET = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 !?()\n'
+
+
+def key_events_for_text(text):
+    """把文本展开为按下/释放 QKeyEvent 对"""
+    events = []
+    for char in text:
+        if char == '\n':
+            key = Qt.Key_Return
+        elif char == ' ':
+            key = Qt.Key_Space
+        else:
+            key = getattr(Qt, f'Key_{char.upper()}', None) or ord(char.upper())
+        events.append((QKeyEvent(QEvent.KeyPress, key, Qt.NoModifier, char), True))
+        events.append((QKeyEvent(QEvent.KeyRelease, key, Qt.NoModifier, char), False))
+    return events
+
+
+def chord_events(count):
+    """快速组合键：Ctrl+Shift+<字母>，按下后立即释放"""
+    events = []
+    letters = [Qt.Key_A + i for i in range(26)]
+    for i in range(count):
+        key = letters[i % len(letters)]
+        modifiers = Qt.ControlModifier | Qt.ShiftModifier
+        events.append((QKeyEvent(QEvent.KeyPress, Qt.Key_Control, Qt.ControlModifier), True))
+        events.append((QKeyEvent(QEvent.KeyPress, Qt.Key_Shift, modifiers), True))
+        events.append((QKeyEvent(QEvent.KeyPress, key, modifiers), True))
+        events.append((QKeyEvent(QEvent.KeyRelease, key, modifiers), False))
+        events.append((QKeyEvent(QEvent.KeyRelease, Qt.Key_Shift, Qt.ControlModifier), False))
+        events.append((QKeyEvent(QEvent.KeyRelease, Qt.Key_Control, Qt.NoModifier), False))
+    return events
+
+
+def mouse_motion_events(count, seed=1):
+    """1 kHz 鼠标轨迹：每毫秒一个移动事件，步长1~8像素"""
+    rng = random.Random(seed)
+    width, height = VIEWPORT
+    x, y = width // 2, height // 2
+    events = []
+    for _ in range(count):
+        x = min(width - 1, max(0, x + rng.randint(-8, 8)))
+        y = min(height - 1, max(0, y + rng.randint(-8, 8)))
+        events.append(QMouseEvent(QEvent.MouseMove, QPointF(x, y), Qt.NoButton, Qt.NoButton, Qt.NoModifier))
+    return events
+
+
+def wheel_events(count):
+    events = []
+    for i in range(count):
+        delta = 120 if i % 2 else -120
+        events.append(QWheelEvent(QPointF(640, 360), QPointF(640, 360), QPoint(0, 0), QPoint(0, delta),
+                                  Qt.NoButton, Qt.NoModifier, Qt.NoScrollPhase, False))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', choices=['memory', 'pipe'], default='memory', help='假HID设备类型')
+    parser.add_argument('--paste-chars', type=int, default=10000)
+    parser.add_argument('--mouse-events', type=int, default=10000)
+    parser.add_argument('--chords', type=int, default=2000)
+    parser.add_argument('--log-level', default='WARNING', help='处理器日志级别（默认关闭DEBUG/INFO输出）')
+    parser.add_argument('--output', help='写入JSON结果文件')
+    parser.add_argument('--compare', help='与之前的JSON结果对比')
+    args = parser.parse_args()
+
+    logging.disable(getattr(logging, args.log_level.upper()) - 1)
+    keyboard_module.PASTE_REPORT_INTERVAL = 0  # 只测生成与分发，不模拟主机节拍
+
+    app = QApplication([])
+    parent = QWidget()
+    parent.resize(*VIEWPORT)
+    devices = {name: make_device(args.device, name) for name in ('keyboard', 'relative', 'absolute')}
+    keyboard = KeyboardHandler(devices['keyboard'])
+    mouse = MouseHandler(parent, devices['absolute'], devices['relative'], *VIEWPORT)
+    mouse.update_viewport(VIEWPORT[0], VIEWPORT[1], 0, 0)
+
+    rng = random.Random(7)
+    text = ''.join(rng.choice(PASTE_ALPHABET) for _ in range(args.paste_chars))
+    results = []
+
+    results.append(measure('paste_key_events', key_events_for_text(text),
+                           lambda e: keyboard.handle_key_event(e[0], e[1])))
+    def send_text(chunk):
+        # 粘贴报告由定时器逐个发送，计入把队列发送完所需的事件循环开销
+        keyboard.send_text(chunk)
+        while keyboard.has_pending_reports():
+            app.processEvents()
+    results.append(measure('paste_send_text_100char_chunks', [text[i:i + 100] for i in range(0, len(text), 100)],
+                           send_text, alloc_sample=20))
+    results.append(measure('rapid_chords', chord_events(args.chords),
+                           lambda e: keyboard.handle_key_event(e[0], e[1])))
+
+    motion = mouse_motion_events(args.mouse_events)
+    mouse.set_mode('absolute')
+    results.append(measure('mouse_motion_absolute_1khz', motion, mouse.mouseMoveEvent))
+    mouse.set_mode('relative')
+    results.append(measure('mouse_motion_relative_1khz', motion, mouse.mouseMoveEvent))
+    mouse.set_mode('absolute')
+    results.append(measure('mouse_wheel', wheel_events(args.mouse_events // 10),
+                           lambda e: (mouse.wheelEvent(e), mouse.scroll_engine.flush())))
+
+    for result in results:
+        # 1 kHz 输入下每个事件的CPU预算为1ms
+        result['budget_pct_at_1khz'] = result['cpu_us_per_event'] / 1000 * 100
+    write_results('input', results, args.output, args.compare)
+
+    for device in devices.values():
+        device.close()
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""视频管线离线基准：回放MJPEG或原始帧序列，测量解码与呈现耗时
+
+不指定输入时，会在内存中合成 720p 和 1080p 的 MJPEG 序列（类桌面画面+移动窗口）。
+
+用法:
+    python benchmarks/bench_video.py                                  # 合成 720p/1080p
+    python benchmarks/bench_video.py --mjpeg capture.mjpeg            # 回放录制的MJPEG
+    python benchmarks/bench_video.py --raw capture.yuyv --size 1920x1080 --format yuyv
+    python benchmarks/bench_video.py --raw capture.yuyv --size 1920x1080 --format yuyv --scale 2
+    python benchmarks/bench_video.py --realtime --fps 30 --output video.json
+
+录制MJPEG示例: ffmpeg -f v4l2 -input_format mjpeg -i /dev/video0 -c copy -t 10 capture.mjpeg
+"""
+import os
+import time
+import argparse
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from bench_common import write_results  # noqa: E402
+from module.color_convert import FORMATS, SCALES, LAYOUT_RGB32, YuvConverter, frame_bytes  # noqa: E402
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QRect  # noqa: E402
+from PyQt5.QtGui import QImage, QPainter, QColor, QFont  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+VIEWPORT = (1280, 720)
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def synthesize_mjpeg(width, height, count, quality=80):
+    """合成MJPEG帧：纯色桌面、文字行和一个移动的窗口"""
+    frames = []
+    image = QImage(width, height, QImage.Format_RGB32)
+    font = QFont('Monospace', max(8, height // 60))
+    for i in range(count):
+        image.fill(QColor(32, 96, 160))
+        painter = QPainter(image)
+        painter.setFont(font)
+        painter.setPen(QColor(240, 240, 240))
+        for row in range(0, height, height // 30):
+            painter.drawText(10, row + height // 40, f"line {row:04d} frame {i:05d} the quick brown fox")
+        x = (i * 7) % max(1, width - width // 3)
+        painter.fillRect(QRect(x, height // 4, width // 3, height // 3), QColor(220, 220, 220))
+        painter.end()
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, 'JPG', quality)
+        frames.append(bytes(data))
+    return frames
+
+
+def read_mjpeg(path):
+    """按 SOI/EOI 标记切分录制的MJPEG流"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    frames = []
+    start = data.find(b'\xff\xd8')
+    while start >= 0:
+        end = data.find(b'\xff\xd9', start + 2)
+        if end < 0:
+            break
+        frames.append(data[start:end + 2])
+        start = data.find(b'\xff\xd8', end + 2)
+    return frames
+
+
+def read_raw(path, width, height, pixel_format):
+    frame_size = width * height * 3 if pixel_format == 'rgb24' else frame_bytes(pixel_format, width, height)
+    frames = []
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(frame_size)
+            if len(chunk) < frame_size:
+                break
+            frames.append(chunk)
+    return frames
+
+
+def make_decoder(kind, width=0, height=0, scale=1):
+    if kind == 'mjpeg':
+        return lambda data: QImage.fromData(data, 'JPG')
+    if kind == 'rgb24':
+        return lambda data: QImage(data, width, height, width * 3, QImage.Format_RGB888)
+    # YUV：查表转换到复用的缓冲区，scale>1 时在转换前缩小
+    converter = YuvConverter(kind, width, height, scale=scale, layout=LAYOUT_RGB32)
+    out_width, out_height = converter.output_size
+
+    def decode_yuv(data):
+        rgb = converter.to_rgb(data)
+        return QImage(rgb.data, out_width, out_height, out_width * 4, QImage.Format_RGB32)
+    return decode_yuv
+
+
+def replay(name, frames, decode, fps, realtime, smooth):
+    """回放帧序列：解码 -> 缩放到取景器 -> 绘制到目标表面"""
+    target = QImage(VIEWPORT[0], VIEWPORT[1], QImage.Format_RGB32)
+    transform = Qt.SmoothTransformation if smooth else Qt.FastTransformation
+    interval = 1.0 / fps
+    decode_ms, present_ms, total_ms = [], [], []
+    dropped = 0
+    start = time.perf_counter()
+    next_deadline = start
+    for index, data in enumerate(frames):
+        if realtime:
+            now = time.perf_counter()
+            if now > next_deadline + interval:
+                dropped += 1  # 处理落后超过一帧，丢弃该帧（与实时采集行为一致）
+                next_deadline += interval
+                continue
+            if now < next_deadline:
+                time.sleep(next_deadline - now)
+            next_deadline += interval
+        t0 = time.perf_counter()
+        image = decode(data)
+        t1 = time.perf_counter()
+        scaled = image.scaled(VIEWPORT[0], VIEWPORT[1], Qt.KeepAspectRatio, transform)
+        painter = QPainter(target)
+        painter.drawImage(0, 0, scaled)
+        painter.end()
+        t2 = time.perf_counter()
+        decode_ms.append((t1 - t0) * 1000)
+        present_ms.append((t2 - t1) * 1000)
+        total_ms.append((t2 - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    processed = len(total_ms)
+    return {
+        'name': name,
+        'frames': len(frames),
+        'fps': processed / elapsed if elapsed else 0.0,
+        'max_sustainable_fps': 1000.0 / (sum(total_ms) / processed) if processed else 0.0,
+        'decode_ms_p50': _percentile(decode_ms, 50),
+        'decode_ms_p95': _percentile(decode_ms, 95),
+        'present_ms_p50': _percentile(present_ms, 50),
+        'present_ms_p95': _percentile(present_ms, 95),
+        'pipeline_ms_max': max(total_ms) if total_ms else 0.0,
+        'budget_pct_at_target': _percentile(total_ms, 50) / (interval * 1000) * 100,
+        'dropped_frames': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mjpeg', help='录制的MJPEG文件')
+    parser.add_argument('--raw', help='原始帧文件（配合 --size 和 --format）')
+    parser.add_argument('--size', help='原始帧尺寸，如 1920x1080')
+    parser.add_argument('--format', choices=list(FORMATS) + ['rgb24'], default='yuyv')
+    parser.add_argument('--scale', type=int, choices=SCALES, default=1, help='YUV转换时同时缩小的倍数')
+    parser.add_argument('--frames', type=int, default=120, help='合成帧数')
+    parser.add_argument('--fps', type=float, default=30.0, help='目标帧率（与 setMinimumFrameRate 一致）')
+    parser.add_argument('--realtime', action='store_true', help='按目标帧率节拍回放并统计丢帧')
+    parser.add_argument('--smooth', action='store_true', help='使用平滑缩放')
+    parser.add_argument('--output', help='写入JSON结果文件')
+    parser.add_argument('--compare', help='与之前的JSON结果对比')
+    args = parser.parse_args()
+
+    app = QApplication([])
+    results = []
+    if args.mjpeg:
+        frames = read_mjpeg(args.mjpeg)
+        results.append(replay(f"mjpeg_{os.path.basename(args.mjpeg)}", frames, make_decoder('mjpeg'),
+                              args.fps, args.realtime, args.smooth))
+    elif args.raw:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        frames = read_raw(args.raw, width, height, args.format)
+        suffix = f"_scale{args.scale}" if args.scale > 1 else ''
+        results.append(replay(f"{args.format}_{width}x{height}{suffix}", frames,
+                              make_decoder(args.format, width, height, args.scale),
+                              args.fps, args.realtime, args.smooth))
+    else:
+        for label, (width, height) in RESOLUTIONS.items():
+            frames = synthesize_mjpeg(width, height, args.frames)
+            results.append(replay(f"mjpeg_{label}", frames, make_decoder('mjpeg'),
+                                  args.fps, args.realtime, args.smooth))
+    write_results('video', results, args.output, args.compare)
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
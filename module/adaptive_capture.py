@@ -0,0 +1,184 @@
+import time
+import logging
+from typing import Optional, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+MODE_FULL = 'full'      # 用户选择的分辨率和帧率
+MODE_IDLE = 'idle'      # 画面静止：保持分辨率，降低帧率
+MODE_LOAD = 'load'      # 本机CPU饱和：降低帧率，可选降低分辨率（同宽高比）
+
+
+def read_cpu_times() -> Optional[Tuple[int, int]]:
+    """读取 /proc/stat 的总CPU时间和空闲时间（jiffies），非Linux返回None"""
+    try:
+        with open('/proc/stat', 'r') as f:
+            fields = f.readline().split()[1:]
+    except OSError:
+        return None
+    values = [int(v) for v in fields]
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return sum(values), idle
+
+
+class AdaptiveCaptureController(QObject):
+    """根据画面活动和本机CPU负载自动调整采集帧率/分辨率
+
+    - 画面静止超过 idle_after 秒：降到低帧率（分辨率不变，画面不会有可见变化）
+    - CPU 连续 load_samples 次超过 cpu_high：降帧率，允许时再降到同宽高比的较低分辨率
+    - 有键鼠输入或画面变化时立即恢复；CPU负载需连续低于 cpu_low 才恢复（滞回）
+    切换只修改正在运行的摄像头的取景器设置，不重建QCamera。
+    """
+    mode_changed = pyqtSignal(str)
+
+    def __init__(self, video_handler, capability_cache=None, parent=None,
+                 idle_after: float = 5.0, idle_fps: float = 5.0, load_fps: float = 15.0,
+                 cpu_high: float = 0.85, cpu_low: float = 0.60, load_samples: int = 3,
+                 reduce_resolution: bool = False):
+        super().__init__(parent)
+        self.video_handler = video_handler
+        self.capability_cache = capability_cache
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        self.load_fps = load_fps
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.load_samples = load_samples
+        self.reduce_resolution = reduce_resolution
+        self.enabled = False
+        self.mode = MODE_FULL
+        self.cpu_load = 0.0
+        self._last_activity = time.monotonic()
+        self._high_count = 0
+        self._low_count = 0
+        self._cpu_times = read_cpu_times()
+        self._previous_thumb = None
+        self._next_sample = 0.0
+        self.sample_interval = 0.25  # 画面比对间隔（秒），不逐帧计算
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._tick)
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._last_activity = time.monotonic()
+        self._high_count = self._low_count = 0
+        if enabled:
+            self._timer.start()
+        else:
+            self._timer.stop()
+            self._set_mode(MODE_FULL)
+
+    def set_reduce_resolution(self, enabled: bool) -> None:
+        """CPU饱和时是否同时降低分辨率（设置菜单），已处于负载模式时立即重新应用"""
+        self.reduce_resolution = enabled
+        if self.enabled and self.mode == MODE_LOAD:
+            self._apply()
+
+    def notify_activity(self) -> None:
+        """键鼠输入：立即恢复全质量"""
+        self._last_activity = time.monotonic()
+        if self.enabled and self.mode == MODE_IDLE:
+            self._set_mode(MODE_FULL)
+
+    def on_video_frame(self, frame) -> None:
+        """抽样比较缩略亮度图，检测远端画面是否变化"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self._next_sample:
+            return
+        self._next_sample = now + self.sample_interval
+        from module.latency_probe import frame_to_gray, count_changed
+        gray = frame_to_gray(frame)
+        if gray is None:
+            return
+        thumb = gray[::8, ::8]
+        previous, self._previous_thumb = self._previous_thumb, thumb
+        if previous is None or previous.shape != thumb.shape:
+            return
+        if count_changed(thumb, previous, 24) > 4:
+            self._last_activity = now
+            if self.mode == MODE_IDLE:
+                self._set_mode(MODE_FULL)
+
+    def _sample_cpu(self) -> None:
+        times = read_cpu_times()
+        if times is None or self._cpu_times is None:
+            return
+        total = times[0] - self._cpu_times[0]
+        idle = times[1] - self._cpu_times[1]
+        self._cpu_times = times
+        if total > 0:
+            self.cpu_load = 1.0 - idle / total
+
+    def _tick(self) -> None:
+        self._sample_cpu()
+        if self.cpu_load >= self.cpu_high:
+            self._high_count += 1
+            self._low_count = 0
+        elif self.cpu_load <= self.cpu_low:
+            self._low_count += 1
+            self._high_count = 0
+
+        if self.mode == MODE_LOAD:
+            if self._low_count >= self.load_samples:
+                self._set_mode(MODE_FULL)
+        elif self._high_count >= self.load_samples:
+            self._set_mode(MODE_LOAD)
+        elif self.mode == MODE_FULL and time.monotonic() - self._last_activity >= self.idle_after:
+            self._set_mode(MODE_IDLE)
+        else:
+            self._apply()  # 摄像头被重新创建后（切换设备/分辨率）按当前模式重新应用
+
+    def _pick_fps(self, width: int, height: int, wanted: float) -> float:
+        """在设备支持的帧率中取不低于wanted的最小值，未知时直接使用wanted"""
+        if not self.capability_cache:
+            return wanted
+        device_name = self.video_handler.camera_config['device_name']
+        rates = sorted(self.capability_cache.get_frame_rates(device_name, width, height))
+        for rate in rates:
+            if rate >= wanted:
+                return rate
+        return rates[-1] if rates else wanted
+
+    def _pick_resolution(self, width: int, height: int) -> Tuple[int, int]:
+        """同宽高比、面积不低于四分之一的下一级分辨率"""
+        if not self.capability_cache:
+            return width, height
+        device_name = self.video_handler.camera_config['device_name']
+        candidates = []
+        for text in self.capability_cache.get_resolutions(device_name):
+            w, h = (int(v) for v in text.split('x'))
+            if w * height == h * width and w < width and w * h * 4 >= width * height:
+                candidates.append((w * h, w, h))
+        if not candidates:
+            return width, height
+        _, w, h = max(candidates)
+        return w, h
+
+    def target_mode(self) -> Tuple[int, int, float]:
+        config = self.video_handler.camera_config
+        width, height = config['resolution_X'], config['resolution_Y']
+        full_fps = self.video_handler.full_frame_rate
+        if self.mode == MODE_IDLE:
+            return width, height, min(full_fps, self._pick_fps(width, height, self.idle_fps))
+        if self.mode == MODE_LOAD:
+            if self.reduce_resolution:
+                width, height = self._pick_resolution(width, height)
+            return width, height, min(full_fps, self._pick_fps(width, height, self.load_fps))
+        return width, height, full_fps
+
+    def _set_mode(self, mode: str) -> None:
+        if mode == self.mode:
+            return
+        logger.info(f"自适应采集: {self.mode} -> {mode} (CPU {self.cpu_load:.0%})")
+        self.mode = mode
+        self._apply()
+        self.mode_changed.emit(mode)
+
+    def _apply(self) -> None:
+        if self.video_handler.is_camera_started():
+            self.video_handler.apply_capture_mode(*self.target_mode())
@@ -0,0 +1,262 @@
+"""多进程模式的采集进程（见 module.process_supervisor）
+
+采集进程持有 QCamera，取景器是写入共享内存帧缓冲区（module.shm_ring.FrameRing）的
+QAbstractVideoSurface，每写入一帧经控制管道通知界面进程。界面进程的 RemoteCapture
+只读取最新的一帧（积压的通知合并处理），包装成 QVideoFrame 交给帧时序统计和各分析模块，
+并在取景器上方的 SharedFrameView 中绘制（YUV帧由 module.color_convert 转换为RGB）。
+"""
+import os
+import logging
+from typing import Optional
+
+import numpy as np
+from PyQt5.QtCore import QEvent, QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtMultimedia import (QAbstractVideoBuffer, QAbstractVideoSurface, QCamera, QCameraInfo,
+                                QCameraViewfinderSettings, QVideoFrame)
+
+from module.shm_ring import FrameRing, DEFAULT_FRAME_BYTES
+from module.color_convert import LAYOUT_RGB32, converter
+from module.process_supervisor import ChildControl, ChildEndpoint, child_main
+
+logger = logging.getLogger(__name__)
+
+# 按优先顺序：RGB可直接显示，YUV需要在界面进程中转换
+SHARED_FORMATS = (QVideoFrame.Format_RGB32, QVideoFrame.Format_ARGB32,
+                  QVideoFrame.Format_YUYV, QVideoFrame.Format_UYVY, QVideoFrame.Format_NV12)
+RGB_FORMATS = (QVideoFrame.Format_RGB32, QVideoFrame.Format_ARGB32)
+YUV_FORMATS = {QVideoFrame.Format_YUYV: 'yuyv', QVideoFrame.Format_UYVY: 'uyvy', QVideoFrame.Format_NV12: 'nv12'}
+
+
+class _RingSurface(QAbstractVideoSurface):
+    """把每一帧写入共享内存并通知界面进程"""
+
+    def __init__(self, control: ChildControl, parent=None):
+        super().__init__(parent)
+        self.control = control
+        self.ring: Optional[FrameRing] = None
+
+    def supportedPixelFormats(self, handle_type=QAbstractVideoBuffer.NoHandle):
+        return list(SHARED_FORMATS) if handle_type == QAbstractVideoBuffer.NoHandle else []
+
+    def present(self, frame: QVideoFrame) -> bool:
+        if self.ring is None or not frame.map(QAbstractVideoBuffer.ReadOnly):
+            return False
+        try:
+            bits = frame.bits()
+            bits.setsize(frame.mappedBytes())
+            sequence = self.ring.write(np.frombuffer(bits, dtype=np.uint8), frame.width(), frame.height(),
+                                       frame.bytesPerLine(), int(frame.pixelFormat()), frame.startTime())
+        finally:
+            frame.unmap()
+        if sequence:
+            self.control.send('frame', sequence)
+        return True
+
+
+class CaptureProcess(QObject):
+    """采集进程中的对象：按界面进程的命令打开、切换、关闭摄像头"""
+
+    def __init__(self, conn):
+        super().__init__()
+        self.control = ChildControl(conn, self._on_command, self)
+        self.surface = _RingSurface(self.control, self)
+        self.camera: Optional[QCamera] = None
+        logger.info(f"采集进程已就绪，pid {os.getpid()}")
+
+    def _on_command(self, command: str, *args) -> None:
+        if command == 'open':
+            self._open(*args)
+        elif command == 'mode':
+            self._set_mode(*args)
+        elif command == 'close':
+            self._close_camera()
+        else:
+            logger.warning(f"未知命令: {command}")
+
+    def _attach_ring(self, ring_name: str) -> None:
+        if self.surface.ring is not None and self.surface.ring.name == ring_name:
+            return
+        if self.surface.ring is not None:
+            self.surface.ring.close()
+        self.surface.ring = FrameRing.attach(ring_name)
+
+    def _open(self, ring_name: str, device_name: str, width: int, height: int, fps: float) -> None:
+        self._close_camera()
+        self._attach_ring(ring_name)
+        info = next((camera for camera in QCameraInfo.availableCameras() if camera.deviceName() == device_name), None)
+        if info is None:
+            self.control.send('error', f"采集设备不存在: {device_name}")
+            return
+        self.camera = QCamera(info)
+        self.camera.setViewfinder(self.surface)
+        self.camera.error.connect(lambda: self.control.send('error', self.camera.errorString()))
+        self._apply_settings(width, height, fps, fixed=False)
+        self.camera.start()
+        self.control.send('opened', device_name, width, height, fps)
+        logger.info(f"摄像头已启动: {device_name} {width}x{height}")
+
+    def _apply_settings(self, width: int, height: int, fps: float, fixed: bool) -> None:
+        settings = QCameraViewfinderSettings()
+        settings.setResolution(width, height)
+        settings.setMinimumFrameRate(fps)
+        if fixed:
+            settings.setMaximumFrameRate(fps)
+        self.camera.setViewfinderSettings(settings)
+
+    def _set_mode(self, ring_name: str, width: int, height: int, fps: float) -> None:
+        if self.camera is None:
+            return
+        self._attach_ring(ring_name)
+        self._apply_settings(width, height, fps, fixed=True)
+        logger.info(f"采集模式: {width}x{height} @ {fps:g}fps")
+
+    def _close_camera(self) -> None:
+        if self.camera:
+            self.camera.stop()
+            self.camera.unload()
+            self.camera.deleteLater()
+            self.camera = None
+
+    def close(self) -> None:
+        self._close_camera()
+        if self.surface.ring is not None:
+            self.surface.ring.close()
+
+
+def run_capture_process(conn) -> None:
+    child_main(CaptureProcess, conn)
+
+
+def ring_to_image(data: np.ndarray, width: int, height: int, stride: int, pixel_format: int) -> QImage:
+    """把共享内存中的一帧转换为可绘制的QImage（不拷贝，数据在下一帧到达前有效）"""
+    if pixel_format in RGB_FORMATS:
+        image = QImage(data.data, width, height, stride, QImage.Format_RGB32)
+    else:  # YUV转换到按格式和尺寸复用的缓冲区
+        data = converter(YUV_FORMATS[pixel_format], width, height, stride, layout=LAYOUT_RGB32).to_rgb(data)
+        image = QImage(data.data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_RGB32)
+    image.ndarray = data  # QImage不持有数据，保持引用
+    return image
+
+
+class SharedFrameView(QWidget):
+    """覆盖在取景器上的画面（取景器没有QCamera时），大小随取景器变化"""
+
+    def __init__(self, viewfinder: QWidget):
+        super().__init__(viewfinder)
+        self.image = QImage()
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)  # 鼠标事件仍由取景器和主窗口处理
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.resize(viewfinder.size())
+        viewfinder.installEventFilter(self)
+
+    def set_image(self, image: QImage) -> None:
+        self.image = image
+        self.update()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize:
+            self.resize(event.size())
+        return False
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.image.isNull():
+            painter.fillRect(self.rect(), Qt.black)
+        else:
+            painter.drawImage(self.rect(), self.image)  # 取景器已按采集宽高比调整
+        painter.end()
+
+
+class RemoteCapture(ChildEndpoint):
+    """界面进程中代表采集进程：发送摄像头命令，读取共享内存中的最新帧"""
+    name = 'capture'
+    target = staticmethod(run_capture_process)
+    frame_ready = pyqtSignal(QVideoFrame)  # 最新帧（供帧时序统计和分析模块）
+    opened = pyqtSignal(str, int, int, float)
+    failed = pyqtSignal(str)
+
+    def __init__(self, viewfinder: QWidget, parent=None):
+        super().__init__(parent)
+        self.ring = FrameRing.create()
+        self.view = SharedFrameView(viewfinder)
+        self.view.hide()
+        self._buffer = np.empty(DEFAULT_FRAME_BYTES, dtype=np.uint8)
+        self._last_sequence = 0
+        self._open_args = None  # 采集进程重启后重新打开
+        self._mode_args = None
+        self.frames = 0
+
+    def replay(self) -> None:
+        if self._open_args:
+            self.send(('open', self.ring.name) + self._open_args)
+        if self._mode_args:
+            self.send(('mode', self.ring.name) + self._mode_args)
+
+    def _ensure_capacity(self, width: int, height: int) -> None:
+        """帧缓冲区按4字节/像素分配，分辨率超过时换一块更大的共享内存"""
+        needed = width * height * 4
+        if needed <= self.ring.slot_bytes:
+            return
+        old = self.ring
+        self.ring = FrameRing.create(slot_bytes=needed)
+        self._buffer = np.empty(needed, dtype=np.uint8)
+        self._last_sequence = 0
+        old.close()
+
+    def open_camera(self, device_name: str, width: int, height: int, fps: float) -> None:
+        self._ensure_capacity(width, height)
+        self._open_args = (device_name, width, height, fps)
+        self._mode_args = None
+        self.view.show()
+        self.send(('open', self.ring.name) + self._open_args)
+
+    def set_mode(self, width: int, height: int, fps: float) -> None:
+        self._ensure_capacity(width, height)
+        self._mode_args = (width, height, fps)
+        self.send(('mode', self.ring.name) + self._mode_args)
+
+    def close_camera(self) -> None:
+        self._open_args = self._mode_args = None
+        self.view.hide()
+        self.view.set_image(QImage())
+        self.send(('close',))
+
+    def handle_message(self, message: tuple) -> None:
+        kind = message[0]
+        if kind == 'frame':
+            self._read_frame()
+        elif kind == 'opened':
+            self.opened.emit(*message[1:])
+        elif kind == 'error':
+            self.failed.emit(message[1])
+        else:
+            super().handle_message(message)
+
+    def _read_frame(self) -> None:
+        result = self.ring.read_latest(self._buffer, self._last_sequence)
+        if result is None:
+            return  # 已读过更新的帧，或读取时被覆盖（下一条通知会读到更新的帧）
+        self._last_sequence, (timestamp_us, width, height, stride, pixel_format), data = result
+        self.frames += 1
+        frame = QVideoFrame(len(data), QSize(width, height), stride, QVideoFrame.PixelFormat(pixel_format))
+        if frame.map(QAbstractVideoBuffer.WriteOnly):
+            bits = frame.bits()
+            bits.setsize(frame.mappedBytes())
+            np.frombuffer(bits, dtype=np.uint8, count=len(data))[:] = data
+            frame.unmap()
+            frame.setStartTime(timestamp_us)
+            self.frame_ready.emit(frame)
+        self.view.set_image(ring_to_image(data, width, height, stride, pixel_format))
+
+    def latest_image(self) -> QImage:
+        """当前显示的画面（截图用，返回拷贝）"""
+        return self.view.image.copy()
+
+    def on_exited(self) -> None:
+        super().on_exited()
+        self._last_sequence = 0
+
+    def close(self) -> None:
+        self.ring.close()
@@ -0,0 +1,255 @@
+"""YUV（YUYV/UYVY/NV12/NV21）到RGB、灰度的转换
+
+采集卡常输出YUYV，界面进程（多进程模式下的共享内存帧）和离线分析需要在Python中转换。
+- 查表：BT.601 有限范围系数预先算成 int16 表，每帧只有查表、加法和截断，没有浮点乘法
+- 预分配：YuvConverter 按 (格式, 尺寸, 缩放) 创建一次，中间结果和输出都复用，
+  每帧不分配整帧大小的数组（也可以传入 out 写入调用方的缓冲区）
+- 缩放：scale 为2的幂时先对亮度、色度按块求平均再查表，转换只在缩小后的分辨率上进行
+
+输出布局 LAYOUT_RGB888 对应 QImage.Format_RGB888；LAYOUT_RGB32 为 B、G、R、0xFF，
+对应小端机器上的 QImage.Format_RGB32。
+"""
+import argparse
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+FORMATS = ('yuyv', 'uyvy', 'nv12', 'nv21')
+LAYOUT_RGB888 = 'rgb888'
+LAYOUT_RGB32 = 'rgb32'
+SCALES = (1, 2, 4, 8)
+
+
+def _table(coefficient: float, offset: int) -> np.ndarray:
+    return np.round(coefficient * (np.arange(256) - offset)).astype(np.int16)
+
+
+# BT.601 有限范围（Y 16~235，UV 16~240）
+Y_TABLE = _table(1.164, 16)
+V_TO_R = _table(1.596, 128)
+U_TO_G = _table(-0.392, 128)
+V_TO_G = _table(-0.813, 128)
+U_TO_B = _table(2.017, 128)
+
+
+def frame_bytes(pixel_format: str, width: int, height: int, stride: int = 0) -> int:
+    """一帧的字节数（stride 为0时按紧密排列计算）"""
+    if pixel_format in ('yuyv', 'uyvy'):
+        return (stride or width * 2) * height
+    return (stride or width) * height * 3 // 2
+
+
+def planes(data, pixel_format: str, width: int, height: int, stride: int = 0
+           ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """不拷贝地取出 Y、U、V 平面的视图
+
+    YUYV/UYVY 的色度为 (高, 宽/2)，NV12/NV21 为 (高/2, 宽/2)。
+    """
+    if pixel_format not in FORMATS:
+        raise ValueError(f"不支持的像素格式: {pixel_format}")
+    buffer = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.uint8)
+    buffer = buffer.reshape(-1)
+    if pixel_format in ('yuyv', 'uyvy'):
+        stride = stride or width * 2
+        rows = buffer[:stride * height].reshape(height, stride)[:, :width * 2]
+        if pixel_format == 'yuyv':
+            return rows[:, 0::2], rows[:, 1::4], rows[:, 3::4]
+        return rows[:, 1::2], rows[:, 0::4], rows[:, 2::4]
+    stride = stride or width
+    luma = buffer[:stride * height].reshape(height, stride)[:, :width]
+    chroma = buffer[stride * height:stride * height + stride * (height // 2)].reshape(height // 2, stride)[:, :width]
+    if pixel_format == 'nv12':
+        return luma, chroma[:, 0::2], chroma[:, 1::2]
+    return luma, chroma[:, 1::2], chroma[:, 0::2]
+
+
+class _BlockMean:
+    """按 (块高, 块宽) 求平均到预分配的 uint16 数组（块大小为2的幂，用移位代替除法）"""
+
+    def __init__(self, shape: Tuple[int, int], block: Tuple[int, int]):
+        self.block = block
+        count = block[0] * block[1]
+        self.shift = count.bit_length() - 1
+        self.half = count // 2
+        self.acc = np.empty(shape, dtype=np.uint16)
+
+    def __call__(self, plane: np.ndarray) -> np.ndarray:
+        by, bx = self.block
+        if by == bx == 1:
+            return plane
+        height, width = self.acc.shape
+        acc = self.acc
+        acc.fill(self.half)  # 四舍五入
+        for dy in range(by):
+            for dx in range(bx):
+                np.add(acc, plane[dy:height * by:by, dx:width * bx:bx], out=acc)
+        np.right_shift(acc, self.shift, out=acc)
+        return acc
+
+
+class YuvConverter:
+    """固定格式、尺寸的YUV转换器，缓冲区在构造时分配"""
+
+    def __init__(self, pixel_format: str, width: int, height: int, stride: int = 0,
+                 scale: int = 1, layout: str = LAYOUT_RGB888):
+        if pixel_format not in FORMATS:
+            raise ValueError(f"不支持的像素格式: {pixel_format}")
+        if scale not in SCALES:
+            raise ValueError(f"缩放倍数必须是 {SCALES} 之一: {scale}")
+        if layout not in (LAYOUT_RGB888, LAYOUT_RGB32):
+            raise ValueError(f"不支持的输出布局: {layout}")
+        self.pixel_format = pixel_format
+        self.width, self.height, self.stride = width, height, stride
+        self.scale = scale
+        self.layout = layout
+        packed = pixel_format in ('yuyv', 'uyvy')
+        # 缩小后的尺寸按色度采样对齐，多余的行列丢弃
+        align = 2 * scale
+        out_w = width // align * align // scale
+        out_h = (height // align * align if not packed else height // scale * scale) // scale
+        self.output_size = (out_w, out_h)
+        self._luma = _BlockMean((out_h, out_w), (scale, scale))
+        if scale == 1:
+            # 色度比输出分辨率低：每个色度样本对应 repeat 个输出像素
+            self.repeat = (1, 2) if packed else (2, 2)
+            chroma_shape = (out_h // self.repeat[0], out_w // 2)
+            chroma_block = (1, 1)
+        else:
+            self.repeat = (1, 1)
+            chroma_shape = (out_h, out_w)
+            chroma_block = (scale, scale // 2) if packed else (scale // 2, scale // 2)
+        self._u = _BlockMean(chroma_shape, chroma_block)
+        self._v = _BlockMean(chroma_shape, chroma_block)
+        self._y_term = np.empty((out_h, out_w), dtype=np.int16)
+        self._r_term = np.empty(chroma_shape, dtype=np.int16)
+        self._g_term = np.empty(chroma_shape, dtype=np.int16)
+        self._b_term = np.empty(chroma_shape, dtype=np.int16)
+        self._scratch = np.empty(chroma_shape, dtype=np.int16)
+        self._channel = np.empty((out_h, out_w), dtype=np.int16)
+        # 查表的下标先转换到这里（np.take 对非 intp 下标每次都会分配整帧大小的临时数组）
+        self._index = np.empty(out_h * out_w, dtype=np.intp)
+        channels = 3 if layout == LAYOUT_RGB888 else 4
+        self.rgb = np.empty((out_h, out_w, channels), dtype=np.uint8)
+        if channels == 4:
+            self.rgb[:, :, 3] = 255
+        self.gray = np.empty((out_h, out_w), dtype=np.uint8)
+
+    def matches(self, pixel_format: str, width: int, height: int, stride: int = 0) -> bool:
+        return (pixel_format, width, height, stride) == (self.pixel_format, self.width, self.height, self.stride)
+
+    def _planes(self, data):
+        return planes(data, self.pixel_format, self.width, self.height, self.stride)
+
+    def to_gray(self, data, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """亮度平面（原始Y值，不做范围扩展），写入 out 或内部缓冲区"""
+        out = self.gray if out is None else out
+        luma = self._luma(self._planes(data)[0])
+        out_h, out_w = self.output_size[1], self.output_size[0]
+        np.copyto(out, luma[:out_h, :out_w], casting='unsafe')
+        return out
+
+    def to_rgb(self, data, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """转换为 (高, 宽, 3或4) 的 uint8 数组，写入 out 或内部缓冲区（下次转换会覆盖）"""
+        out = self.rgb if out is None else out
+        out_w, out_h = self.output_size
+        y, u, v = self._planes(data)
+        luma = self._luma(y)[:out_h, :out_w]
+        u = self._u(u)
+        v = self._v(v)
+        rows, cols = self._r_term.shape
+        u, v = u[:rows, :cols], v[:rows, :cols]
+        self._lookup(luma, (Y_TABLE, self._y_term))
+        self._lookup(v, (V_TO_R, self._r_term), (V_TO_G, self._scratch))
+        self._lookup(u, (U_TO_G, self._g_term), (U_TO_B, self._b_term))
+        np.add(self._g_term, self._scratch, out=self._g_term)
+        # RGB888 为 R、G、B；RGB32（小端）为 B、G、R
+        order = (0, 1, 2) if out.shape[2] == 3 else (2, 1, 0)
+        for index, term in zip(order, (self._r_term, self._g_term, self._b_term)):
+            self._combine(term, out[:, :, index])
+        return out
+
+    def _lookup(self, plane: np.ndarray, *tables) -> None:
+        index = self._index[:plane.size].reshape(plane.shape)
+        np.copyto(index, plane, casting='unsafe')
+        for table, out in tables:
+            np.take(table, index, out=out, mode='clip')
+
+    def _combine(self, chroma_term: np.ndarray, target: np.ndarray) -> None:
+        channel = self._channel
+        ry, rx = self.repeat
+        for dy in range(ry):
+            for dx in range(rx):
+                np.add(self._y_term[dy::ry, dx::rx], chroma_term, out=channel[dy::ry, dx::rx])
+        np.clip(channel, 0, 255, out=channel)
+        np.copyto(target, channel, casting='unsafe')
+
+
+_converters = {}
+
+
+def converter(pixel_format: str, width: int, height: int, stride: int = 0,
+              scale: int = 1, layout: str = LAYOUT_RGB888) -> YuvConverter:
+    """按参数复用的转换器（同一组参数只分配一次缓冲区）"""
+    key = (pixel_format, width, height, stride, scale, layout)
+    instance = _converters.get(key)
+    if instance is None:
+        if len(_converters) >= 8:  # 分辨率切换后旧的转换器不再使用
+            _converters.clear()
+        instance = _converters[key] = YuvConverter(pixel_format, width, height, stride, scale, layout)
+    return instance
+
+
+def yuv_to_rgb(data, pixel_format: str, width: int, height: int, stride: int = 0, scale: int = 1,
+               layout: str = LAYOUT_RGB888, out: Optional[np.ndarray] = None) -> np.ndarray:
+    return converter(pixel_format, width, height, stride, scale, layout).to_rgb(data, out)
+
+
+def yuv_to_gray(data, pixel_format: str, width: int, height: int, stride: int = 0, scale: int = 1,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+    return converter(pixel_format, width, height, stride, scale).to_gray(data, out)
+
+
+def reference_rgb(data, pixel_format: str, width: int, height: int, stride: int = 0) -> np.ndarray:
+    """浮点参考实现（逐像素上采样色度），用于校验查表结果"""
+    y, u, v = (plane.astype(np.float32) for plane in planes(data, pixel_format, width, height, stride))
+    repeat_y = 1 if pixel_format in ('yuyv', 'uyvy') else 2
+    u = np.repeat(np.repeat(u, 2, axis=1), repeat_y, axis=0)[:height, :width] - 128.0
+    v = np.repeat(np.repeat(v, 2, axis=1), repeat_y, axis=0)[:height, :width] - 128.0
+    y = 1.164 * (y - 16.0)
+    rgb = np.stack([y + 1.596 * v, y - 0.392 * u - 0.813 * v, y + 2.017 * u], axis=2)
+    return np.clip(np.round(rgb), 0, 255).astype(np.uint8)
+
+
+def synthetic_frame(pixel_format: str, width: int, height: int, seed: int = 0) -> bytes:
+    """合成测试帧：平滑渐变加噪声"""
+    rng = np.random.default_rng(seed)
+    size = frame_bytes(pixel_format, width, height)
+    ramp = (np.arange(size, dtype=np.uint32) * 7 // 5 % 220 + 16).astype(np.uint8)
+    noise = rng.integers(0, 8, size, dtype=np.uint8)
+    return (ramp + noise).tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YUV转换校验与计时")
+    parser.add_argument('--format', choices=FORMATS, default='yuyv')
+    parser.add_argument('--size', default='1920x1080')
+    parser.add_argument('--scale', type=int, choices=SCALES, default=1)
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    data = synthetic_frame(args.format, width, height)
+    instance = YuvConverter(args.format, width, height, scale=args.scale)
+    rgb = instance.to_rgb(data)
+    if args.scale == 1:
+        error = np.abs(rgb.astype(np.int16) - reference_rgb(data, args.format, width, height)).max()
+        print(f"与浮点参考实现的最大误差: {error}")
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        instance.to_rgb(data)
+    elapsed = (time.perf_counter() - start) / args.frames * 1000
+    print(f"{args.format} {width}x{height} 缩放1/{args.scale} -> {rgb.shape[1]}x{rgb.shape[0]}: {elapsed:.2f} ms/帧")
+
+
+if __name__ == '__main__':
+    main()
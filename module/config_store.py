@@ -0,0 +1,199 @@
+import json
+import logging
+from dataclasses import MISSING, dataclass, field, asdict, fields
+from typing import Any, Dict, List, Optional
+
+from PyQt5.QtCore import QObject, QSettings, QTimer
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+CONFIG_KEY = "config"          # QSettings中保存整个配置（JSON）的键
+DEFAULT_PROFILE = "默认"
+
+
+def _default_value(f):
+    return f.default_factory() if f.default is MISSING else f.default
+
+
+def _type_matches(value: Any, default: Any) -> bool:
+    """值与默认值的类型是否一致（整数可作为浮点数，列表逐项比较）"""
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, float):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(default, int):
+        return isinstance(value, int) and not isinstance(value, bool)
+    if isinstance(default, list):
+        return (isinstance(value, list) and len(value) == len(default)
+                and all(_type_matches(v, d) for v, d in zip(value, default)))
+    return isinstance(value, type(default))
+
+
+def _checked_fields(cls, data: Dict[str, Any], skip=()) -> Dict[str, Any]:
+    """data中类型与字段默认值一致的项；类型错误的项记录警告，使用默认值"""
+    values = {}
+    for f in fields(cls):
+        if f.name in skip or f.name not in data:
+            continue
+        value, default = data[f.name], _default_value(f)
+        if not _type_matches(value, default):
+            logger.warning(f"配置项 {f.name} 的值 {value!r} 类型错误，使用默认值 {default!r}")
+            continue
+        values[f.name] = float(value) if isinstance(default, float) else value
+    return values
+
+
+@dataclass
+class TargetProfile:
+    """单台被控机的配置"""
+    keyboard_layout: str = 'US'
+    mouse_mode: str = 'absolute'
+    resolution: List[int] = field(default_factory=lambda: [1280, 720])
+    device_identity: str = ''      # 采集卡标识（card@bus_info），设备路径变化后仍可匹配
+    device_path: str = ''          # 上次使用的设备路径（标识不可用时的回退）
+    paste_interval: float = 0.025  # 粘贴时相邻HID报告的间隔（秒）
+    target_region: List[float] = field(default_factory=lambda: [0.0, 0.0, 1.0, 1.0])  # 被采集显示器在虚拟桌面中的区域
+    key_repeat: str = 'target'     # 按住按键时的重复：'target' 由被控机重复，'host' 由本程序发送
+    repeat_delay_ms: int = 500     # 主机端重复的首次延迟
+    repeat_rate_hz: float = 30.0   # 主机端重复的速率
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TargetProfile':
+        return cls(**_checked_fields(cls, data))
+
+
+@dataclass
+class AppConfig:
+    schema_version: int = SCHEMA_VERSION
+    save_path: str = ''
+    cursor_overlay: bool = True
+    adaptive_capture: bool = True
+    adaptive_resolution: bool = False  # CPU饱和时同时降低采集分辨率
+    active_profile: str = DEFAULT_PROFILE
+    profiles: Dict[str, TargetProfile] = field(default_factory=lambda: {DEFAULT_PROFILE: TargetProfile()})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AppConfig':
+        config = cls(**_checked_fields(cls, data, skip=('profiles',)))
+        profiles = data.get('profiles') or {}
+        if not isinstance(profiles, dict):
+            logger.warning(f"被控机配置格式错误（{type(profiles).__name__}），使用默认配置")
+            profiles = {}
+        valid = {}
+        for name, profile in profiles.items():
+            if isinstance(profile, dict):
+                valid[name] = TargetProfile.from_dict(profile)
+            else:
+                logger.warning(f"被控机配置 {name} 格式错误，已忽略")
+        if valid:
+            config.profiles = valid
+        if config.active_profile not in config.profiles:
+            config.active_profile = next(iter(config.profiles))
+        return config
+
+
+def migrate(data: Dict[str, Any], settings: QSettings) -> Dict[str, Any]:
+    """把旧版本配置升级到当前 schema_version"""
+    version = data.get('schema_version', 0)
+    if version < 1:
+        # 版本0：零散的QSettings键（save_path、keyboard_layout）
+        if settings.contains("save_path"):
+            data['save_path'] = settings.value("save_path")
+        if settings.contains("keyboard_layout"):
+            data.setdefault('profiles', {}).setdefault(DEFAULT_PROFILE, {})['keyboard_layout'] = \
+                settings.value("keyboard_layout")
+        logger.info("已迁移旧版配置")
+    data['schema_version'] = SCHEMA_VERSION
+    return data
+
+
+class ConfigStore(QObject):
+    """类型化配置：启动时从QSettings读取一次到内存快照，修改后延迟批量写回
+
+    读取配置直接访问内存中的 config / profile，不再逐项访问QSettings；
+    多次修改在 flush_delay_ms 内合并为一次写入。
+    """
+
+    def __init__(self, organization: str = "YourCompany", application: str = "YourApp",
+                 flush_delay_ms: int = 500, parent=None):
+        super().__init__(parent)
+        self._settings = QSettings(organization, application)
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_delay_ms)
+        self._flush_timer.timeout.connect(self.flush)
+        self.read_only = False  # 配置来自较新版本时不写回
+        self.config = self._load()
+
+    def _load(self) -> AppConfig:
+        raw = self._settings.value(CONFIG_KEY, "")
+        data = {}
+        if raw:
+            try:
+                data = json.loads(raw)
+            except ValueError as e:
+                logger.error(f"配置解析失败，使用默认配置: {e}")
+            if not isinstance(data, dict):
+                logger.error(f"配置格式错误（{type(data).__name__}），使用默认配置")
+                data = {}
+        if not isinstance(data.get('schema_version', 0), int):
+            logger.warning(f"配置版本号无效: {data['schema_version']!r}")
+            data['schema_version'] = 0
+        if data.get('schema_version', 0) > SCHEMA_VERSION:
+            # 较新版本程序写入的配置可能含有本版本不认识的项，写回会丢失，本次运行不保存
+            logger.warning(f"配置版本 {data['schema_version']} 高于程序支持的版本 {SCHEMA_VERSION}，"
+                           f"本次运行的修改不会保存")
+            self.read_only = True
+        elif data.get('schema_version', 0) < SCHEMA_VERSION:
+            data = migrate(data, self._settings)
+            self._schedule()
+        return AppConfig.from_dict(data)
+
+    @property
+    def profile(self) -> TargetProfile:
+        """当前被控机配置"""
+        return self.config.profiles[self.config.active_profile]
+
+    def profile_names(self) -> List[str]:
+        return list(self.config.profiles)
+
+    def update(self, **changes) -> None:
+        """修改全局配置项"""
+        self._apply(self.config, changes)
+
+    def update_profile(self, **changes) -> None:
+        """修改当前被控机配置项"""
+        self._apply(self.profile, changes)
+
+    def _apply(self, target, changes: Dict[str, Any]) -> None:
+        changed = False
+        for key, value in changes.items():
+            if not hasattr(target, key):
+                raise AttributeError(f"未知配置项: {key}")
+            if getattr(target, key) != value:
+                setattr(target, key, value)
+                changed = True
+        if changed:
+            self._schedule()
+
+    def switch_profile(self, name: str, copy_from: Optional[str] = None) -> TargetProfile:
+        """切换当前被控机配置，不存在时新建（可从已有配置复制）"""
+        if name not in self.config.profiles:
+            source = self.config.profiles.get(copy_from) if copy_from else None
+            self.config.profiles[name] = TargetProfile.from_dict(asdict(source)) if source else TargetProfile()
+        self.config.active_profile = name
+        self._schedule()
+        return self.profile
+
+    def _schedule(self) -> None:
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """立即写回（退出时调用）"""
+        self._flush_timer.stop()
+        if self.read_only:
+            return
+        self._settings.setValue(CONFIG_KEY, json.dumps(asdict(self.config), ensure_ascii=False))
+        self._settings.sync()
@@ -0,0 +1,97 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QKeyEvent
+import logging
+from typing import List, Optional
+
+from module.hid_reports import consumer_report, system_report
+from module.media_key_mappings import NAMED_KEYS, QT_MEDIA_KEYS, CONSUMER, canonical_name
+from module.usb_gadget import request_remote_wakeup
+
+KEY_HOLD_TIME = 0.05  # 菜单/快捷键触发时按住的时间
+
+
+class ConsumerHandler(QObject):
+    """媒体键（音量、播放、亮度等）和电源键（关机、睡眠、唤醒）
+
+    单进程模式下与键盘、鼠标处理器一起在输入线程中运行（经 InputWorker.call 调用）；
+    所有方法都不阻塞，菜单按键的松开报告由定时器稍后发送。
+    """
+    transport_lost = pyqtSignal()  # USB主机断开（ESHUTDOWN）时发出
+
+    def __init__(self, hid_consumer, udc: str = ''):
+        super().__init__()
+        self.hid_consumer = hid_consumer
+        self.udc = udc  # 唤醒挂起的主机时使用
+        self.logger = logging.getLogger(__name__)
+        self._held: Optional[str] = None  # 本地按住的媒体键
+
+    def handles(self, qt_key: int) -> bool:
+        return qt_key in QT_MEDIA_KEYS
+
+    @staticmethod
+    def is_named_key(name: str) -> bool:
+        return canonical_name(name) is not None
+
+    @staticmethod
+    def _press_report(name: str) -> bytes:
+        kind, value = NAMED_KEYS[name]
+        return consumer_report(value) if kind == CONSUMER else system_report(value)
+
+    @staticmethod
+    def _release_report(name: str) -> bytes:
+        kind, _ = NAMED_KEYS[name]
+        return consumer_report(0) if kind == CONSUMER else system_report(0)
+
+    def handle_key_event(self, event: QKeyEvent, is_press: bool) -> None:
+        self.handle_key(event.key(), is_press, event.isAutoRepeat())
+
+    def handle_key(self, qt_key: int, is_press: bool, auto_repeat: bool = False) -> None:
+        """本地媒体键：按下时发送用途，松开时发送空报告（忽略自动重复）"""
+        if not self.hid_consumer or auto_repeat:
+            return
+        name = QT_MEDIA_KEYS.get(qt_key)
+        if name is None:
+            return
+        if is_press:
+            self._wake_if_needed(name)
+            self._held = name
+            self._send([self._press_report(name)])
+        elif self._held == name:
+            self._held = None
+            self._send([self._release_report(name)])
+
+    def press(self, name: str) -> bool:
+        """按下并松开一个命名按键（菜单、自定义快捷键），名称不区分大小写"""
+        name = canonical_name(name)
+        if name is None or not self.hid_consumer:
+            return False
+        self._wake_if_needed(name)
+        if not self._send([self._press_report(name)]):
+            return False
+        release = self._release_report(name)
+        QTimer.singleShot(round(KEY_HOLD_TIME * 1000), lambda: self._send([release]))
+        return True
+
+    def release_all(self) -> None:
+        if self.hid_consumer:
+            self._held = None
+            self._send([consumer_report(0), system_report(0)])
+
+    def _wake_if_needed(self, name: str) -> None:
+        # 主机挂起时报告无法送达，唤醒需要由UDC发出远程唤醒信号
+        if name == 'WakeUp' and request_remote_wakeup(self.udc):
+            self.logger.info("已请求远程唤醒被控机")
+
+    def _send(self, reports: List[bytes]) -> bool:
+        if not self.hid_consumer:
+            return False  # 定时松开之前设备已被关闭
+        try:
+            self.hid_consumer.write_burst(reports, 0.0)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("媒体/电源键报告已发送: %s", ' '.join(r.hex() for r in reports))
+            return True
+        except Exception as e:
+            self.logger.error(f"发送媒体/电源键报告失败: {e}")
+            if getattr(e, 'errno', None) == 108:  # Cannot send after transport endpoint shutdown
+                self.transport_lost.emit()
+        return False
@@ -0,0 +1,78 @@
+"""窗口坐标 -> 绝对HID坐标 的映射缓存
+
+取景器几何、画面有效区域和被控机目标区域只在变化时（update_viewport、切换配置）
+重新计算为整数定点参数；每个鼠标事件只需一次减法、一次范围比较和一次乘法移位。
+"""
+from typing import Optional, Sequence, Tuple
+
+from module.hid_reports import ABSOLUTE_MAX
+
+FIXED_SHIFT = 16
+FULL_REGION = (0.0, 0.0, 1.0, 1.0)
+
+
+class CoordinateMapper:
+    """把主窗口坐标映射为绝对鼠标HID坐标（0~32767）
+
+    - viewport：取景器在主窗口中的位置和尺寸（_calculate_viewfinder_size 计算的非黑边区域）
+    - active_region：画面中被控机桌面实际占据的部分（画面比例，采集信号自带黑边时使用）
+    - target_region：被采集的显示器在被控机整个虚拟桌面中的位置（比例，多显示器时使用）
+    """
+    __slots__ = ('x0', 'y0', 'width', 'height', 'scale_x', 'scale_y', 'hid_x0', 'hid_y0',
+                 '_viewport', 'active_region', 'target_region')
+
+    def __init__(self):
+        self._viewport = (0, 0, 1, 1)
+        self.active_region = FULL_REGION
+        self.target_region = FULL_REGION
+        self._recompute()
+
+    def update_viewport(self, width: int, height: int, x_offset: int, y_offset: int) -> None:
+        self._viewport = (x_offset, y_offset, max(1, width), max(1, height))
+        self._recompute()
+
+    def set_active_region(self, region: Sequence[float] = FULL_REGION) -> None:
+        self.active_region = _checked_region(region)
+        self._recompute()
+
+    def set_target_region(self, region: Sequence[float] = FULL_REGION) -> None:
+        self.target_region = _checked_region(region)
+        self._recompute()
+
+    def set_target_monitor(self, desktop_w: int, desktop_h: int,
+                           monitor_x: int, monitor_y: int, monitor_w: int, monitor_h: int) -> None:
+        """按被控机像素坐标设置被采集的显示器（虚拟桌面尺寸 + 显示器位置和尺寸）"""
+        self.set_target_region((monitor_x / desktop_w, monitor_y / desktop_h,
+                                monitor_w / desktop_w, monitor_h / desktop_h))
+
+    def _recompute(self) -> None:
+        view_x, view_y, view_w, view_h = self._viewport
+        ax, ay, aw, ah = self.active_region
+        tx, ty, tw, th = self.target_region
+        self.x0 = view_x + round(ax * view_w)
+        self.y0 = view_y + round(ay * view_h)
+        self.width = max(1, round(aw * view_w))
+        self.height = max(1, round(ah * view_h))
+        self.hid_x0 = round(tx * ABSOLUTE_MAX)
+        self.hid_y0 = round(ty * ABSOLUTE_MAX)
+        self.scale_x = (round(tw * ABSOLUTE_MAX) << FIXED_SHIFT) // self.width
+        self.scale_y = (round(th * ABSOLUTE_MAX) << FIXED_SHIFT) // self.height
+
+    def map(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """窗口坐标 -> HID坐标，落在有效区域外（黑边）时返回None"""
+        x -= self.x0
+        y -= self.y0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.hid_x0 + (x * self.scale_x >> FIXED_SHIFT), self.hid_y0 + (y * self.scale_y >> FIXED_SHIFT)
+        return None
+
+    def center(self) -> Tuple[int, int]:
+        """有效区域中心的窗口坐标"""
+        return self.x0 + self.width // 2, self.y0 + self.height // 2
+
+
+def _checked_region(region: Sequence[float]) -> Tuple[float, float, float, float]:
+    x, y, w, h = (float(v) for v in region)
+    if not (0.0 <= x < 1.0 and 0.0 <= y < 1.0 and 0.0 < w <= 1.0 - x + 1e-9 and 0.0 < h <= 1.0 - y + 1e-9):
+        raise ValueError(f"无效的区域: {region}")
+    return x, y, w, h
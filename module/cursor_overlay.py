@@ -0,0 +1,134 @@
+import time
+import logging
+
+from PyQt5.QtCore import Qt, QTimer, QPoint, QPointF, QRect
+from PyQt5.QtGui import QPainter, QPixmap, QPolygonF, QColor, QPen
+from PyQt5.QtWidgets import QWidget
+
+logger = logging.getLogger(__name__)
+
+# 箭头光标轮廓（热点在左上角）
+ARROW_SHAPE = [(0, 0), (0, 16), (4, 12), (7, 18), (9, 17), (6, 11), (11, 11)]
+
+
+def _make_cursor_pixmap():
+    pixmap = QPixmap(13, 20)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor(0, 0, 0), 1))
+    painter.setBrush(QColor(255, 255, 255, 220))
+    painter.drawPolygon(QPolygonF([QPointF(x + 0.5, y + 0.5) for x, y in ARROW_SHAPE]))
+    painter.end()
+    return pixmap
+
+
+class CursorOverlay(QWidget):
+    """绝对模式下的本地预测光标
+
+    覆盖取景器区域的透明控件（不随鼠标移动），在最后一次发送的绝对坐标处绘制光标，掩盖采集延迟；
+    检测到远端光标已追上（画面中对应位置出现变化）或超过估计延迟后隐藏。启用期间取景器上的
+    系统光标隐藏，画面上只有一个本地光标。每次移动只重绘新旧光标所在的小矩形，
+    帧对账只拷贝预测位置附近的一小块亮度数据。
+    """
+
+    def __init__(self, parent, default_lag_ms: float = 150.0):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_NoSystemBackground)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setFocusPolicy(Qt.NoFocus)
+        self._pixmap = _make_cursor_pixmap()
+        self.enabled = False
+        self.lag_ms = default_lag_ms  # 远端光标追上本地光标所需时间的估计（指数平均）
+        self._last_send = 0.0
+        self._pos = None        # 光标位置（控件坐标）
+        self._visible = False   # 是否绘制光标（控件本身在启用期间一直显示）
+        self._previous_gray = None
+        self._previous_region = None
+        self._viewport = (0, 0, 1, 1)  # x偏移, y偏移, 宽, 高（主窗口坐标）
+        self._hide_timer = QTimer(self)
+        self._hide_timer.setSingleShot(True)
+        self._hide_timer.timeout.connect(self._hide_cursor)
+        self.hide()
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        if enabled:
+            self.show()
+            self.raise_()
+        else:
+            self._hide_timer.stop()
+            self._hide_cursor()
+            self.hide()
+
+    def update_viewport(self, width, height, x_offset, y_offset) -> None:
+        self._viewport = (x_offset, y_offset, max(1, width), max(1, height))
+        self.setGeometry(x_offset, y_offset, max(1, width), max(1, height))
+        self._pos = None
+        self._visible = False
+        self._previous_gray = None
+
+    def _cursor_rect(self) -> QRect:
+        return QRect(QPoint(*self._pos), self._pixmap.size())
+
+    def _hide_cursor(self) -> None:
+        if self._visible:
+            self._visible = False
+            self.update(self._cursor_rect())
+
+    def on_absolute_sent(self, x: int, y: int) -> None:
+        """MouseHandler发送绝对坐标后调用（主窗口坐标）"""
+        if not self.enabled:
+            return
+        if self._visible:
+            self.update(self._cursor_rect())  # 旧位置
+        self._pos = (x - self._viewport[0], y - self._viewport[1])
+        self._visible = True
+        self._last_send = time.perf_counter()
+        self.update(self._cursor_rect())
+        # 兜底：没有帧检测结果时，估计延迟后隐藏
+        self._hide_timer.start(int(self.lag_ms * 1.5) + 20)
+
+    def paintEvent(self, event):
+        if not (self._visible and self._pos):
+            return
+        painter = QPainter(self)
+        painter.drawPixmap(QPoint(*self._pos), self._pixmap)
+        painter.end()
+
+    def _frame_region(self, width: int, height: int):
+        """预测位置附近的帧区域 (x0, y0, x1, y1)，超出画面返回None"""
+        _, _, view_w, view_h = self._viewport
+        fx = self._pos[0] * width // view_w
+        fy = self._pos[1] * height // view_h
+        radius = max(8, width // 60)
+        x0, y0 = max(0, fx - radius // 2), max(0, fy - radius // 2)
+        x1, y1 = min(width, fx + radius * 2), min(height, fy + radius * 2)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def on_video_frame(self, frame) -> None:
+        """与采集帧对账：预测位置附近出现变化即认为远端光标已到达"""
+        if not (self.enabled and self._visible and self._pos):
+            self._previous_gray = None
+            return
+        from module.latency_probe import frame_to_gray, count_changed
+        region = self._frame_region(frame.width(), frame.height())
+        if region is None:
+            return
+        gray = frame_to_gray(frame, region)
+        if gray is None:
+            return
+        previous, previous_region = self._previous_gray, self._previous_region
+        self._previous_gray, self._previous_region = gray, region
+        if previous is None or previous_region != region:
+            return  # 光标移动后区域改变，下一帧再比较
+        if count_changed(gray, previous, 40) >= 12:
+            lag = (time.perf_counter() - self._last_send) * 1000
+            # 鼠标仍在移动时保留预测光标，停止后远端已追上即隐藏
+            if lag >= self.lag_ms * 0.5:
+                self.lag_ms = 0.8 * self.lag_ms + 0.2 * lag
+                self._hide_timer.stop()
+                self._hide_cursor()
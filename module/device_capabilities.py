@@ -0,0 +1,294 @@
+import os
+import glob
+import json
+import fcntl
+import struct
+import threading
+import logging
+from typing import Dict, List, Optional, Any
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 能力缓存文件位置（跨重启持久化）
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "kvm", "device_capabilities.json")
+
+# V4L2 ioctl 定义（linux/videodev2.h）
+_IOC_READ = 2
+_IOC_WRITE = 1
+
+def _ioc(direction, nr, size):
+    return (direction << 30) | (size << 16) | (ord('V') << 8) | nr
+
+_CAPABILITY = struct.Struct('16s32s32sIII12x')     # struct v4l2_capability
+_FMTDESC = struct.Struct('III32sII12x')            # struct v4l2_fmtdesc
+_FRMSIZEENUM = struct.Struct('III6I8x')            # struct v4l2_frmsizeenum
+_FRMIVALENUM = struct.Struct('IIIII6I8x')          # struct v4l2_frmivalenum
+
+VIDIOC_QUERYCAP = _ioc(_IOC_READ, 0, _CAPABILITY.size)
+VIDIOC_ENUM_FMT = _ioc(_IOC_READ | _IOC_WRITE, 2, _FMTDESC.size)
+VIDIOC_ENUM_FRAMESIZES = _ioc(_IOC_READ | _IOC_WRITE, 74, _FRMSIZEENUM.size)
+VIDIOC_ENUM_FRAMEINTERVALS = _ioc(_IOC_READ | _IOC_WRITE, 75, _FRMIVALENUM.size)
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMIVAL_TYPE_DISCRETE = 1
+
+# 非离散帧尺寸时使用的通用分辨率
+COMMON_RESOLUTIONS = [(640, 480), (800, 600), (1024, 768), (1280, 720), (1920, 1080)]
+
+
+def _cstr(raw: bytes) -> str:
+    return raw.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def _fourcc(code: int) -> str:
+    return ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip()
+
+
+def query_identity(device_path: str) -> Optional[str]:
+    """通过VIDIOC_QUERYCAP获取设备标识（card@bus_info），不启动采集"""
+    try:
+        fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError as e:
+        logger.debug(f"无法打开视频设备 {device_path}: {e}")
+        return None
+    try:
+        buf = bytearray(_CAPABILITY.size)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, buf)
+        _driver, card, bus_info, _version, caps, device_caps = _CAPABILITY.unpack(buf)
+        if caps & V4L2_CAP_DEVICE_CAPS:
+            caps = device_caps
+        if not caps & V4L2_CAP_VIDEO_CAPTURE:
+            return None  # 元数据节点等非采集设备
+        return f"{_cstr(card)}@{_cstr(bus_info)}"
+    except OSError as e:
+        logger.debug(f"查询设备能力失败 {device_path}: {e}")
+        return None
+    finally:
+        os.close(fd)
+
+
+def probe_device(device_path: str) -> Optional[Dict[str, Any]]:
+    """枚举设备支持的像素格式、分辨率和帧率"""
+    try:
+        fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError as e:
+        logger.debug(f"无法打开视频设备 {device_path}: {e}")
+        return None
+    pixel_formats = []
+    resolutions = []
+    frame_rates = {}
+    try:
+        for fmt_index in range(64):
+            buf = bytearray(_FMTDESC.pack(fmt_index, V4L2_BUF_TYPE_VIDEO_CAPTURE, 0, b'', 0, 0))
+            try:
+                fcntl.ioctl(fd, VIDIOC_ENUM_FMT, buf)
+            except OSError:
+                break
+            pixelformat = _FMTDESC.unpack(buf)[4]
+            pixel_formats.append(_fourcc(pixelformat))
+            for width, height in _enum_frame_sizes(fd, pixelformat):
+                key = f"{width}x{height}"
+                if [width, height] not in resolutions:
+                    resolutions.append([width, height])
+                rates = frame_rates.setdefault(key, [])
+                for fps in _enum_frame_rates(fd, pixelformat, width, height):
+                    if fps not in rates:
+                        rates.append(fps)
+    finally:
+        os.close(fd)
+    resolutions.sort()
+    for rates in frame_rates.values():
+        rates.sort(reverse=True)
+    return {
+        'pixel_formats': pixel_formats,
+        'resolutions': resolutions,
+        'frame_rates': frame_rates,
+    }
+
+
+def _enum_frame_sizes(fd, pixelformat):
+    sizes = []
+    for index in range(256):
+        buf = bytearray(_FRMSIZEENUM.pack(index, pixelformat, 0, 0, 0, 0, 0, 0, 0))
+        try:
+            fcntl.ioctl(fd, VIDIOC_ENUM_FRAMESIZES, buf)
+        except OSError:
+            break
+        fields = _FRMSIZEENUM.unpack(buf)
+        if fields[2] == V4L2_FRMSIZE_TYPE_DISCRETE:
+            sizes.append((fields[3], fields[4]))
+        else:
+            # 连续/步进尺寸：取范围内的通用分辨率
+            min_w, max_w, _step_w, min_h, max_h, _step_h = fields[3:9]
+            sizes.extend((w, h) for w, h in COMMON_RESOLUTIONS
+                         if min_w <= w <= max_w and min_h <= h <= max_h)
+            break
+    return sizes
+
+
+def _enum_frame_rates(fd, pixelformat, width, height):
+    rates = []
+    for index in range(64):
+        buf = bytearray(_FRMIVALENUM.pack(index, pixelformat, width, height, 0, 0, 0, 0, 0, 0, 0))
+        try:
+            fcntl.ioctl(fd, VIDIOC_ENUM_FRAMEINTERVALS, buf)
+        except OSError:
+            break
+        fields = _FRMIVALENUM.unpack(buf)
+        if fields[4] != V4L2_FRMIVAL_TYPE_DISCRETE:
+            # 连续/步进帧间隔：记录最大帧率（最小间隔）
+            numerator, denominator = fields[5], fields[6]
+            if numerator:
+                rates.append(round(denominator / numerator, 2))
+            break
+        numerator, denominator = fields[5], fields[6]
+        if numerator:
+            rates.append(round(denominator / numerator, 2))
+    return rates
+
+
+ALL_DEVICES = 'all'
+
+
+class DeviceCapabilityCache(QObject):
+    """视频设备能力缓存：后台线程探测，按设备标识持久化"""
+    capabilities_updated = pyqtSignal(str)  # 参数为设备标识
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        super().__init__()
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._capabilities: Dict[str, Dict[str, Any]] = {}  # 设备标识 -> 能力
+        self._identities: Dict[str, str] = {}               # 设备路径 -> 设备标识
+        self._probe_thread = None
+        self._pending_paths = None   # 探测进行中时收到的请求：设备路径集合，ALL_DEVICES 表示全部
+        self._pending_force = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._capabilities = data.get('devices', {})
+            logger.info(f"已加载设备能力缓存: {len(self._capabilities)} 个设备")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"设备能力缓存损坏，已忽略: {e}")
+
+    def _save(self):
+        with self._lock:
+            data = {'devices': dict(self._capabilities)}
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = self.cache_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"保存设备能力缓存失败: {e}")
+
+    def probe_async(self, device_paths: Optional[List[str]] = None, force: bool = False) -> None:
+        """在后台线程中探测设备（启动时及热插拔时调用）"""
+        with self._lock:
+            if self._probe_thread is not None:
+                # 当前探测结束后由同一线程再跑一轮，合并期间收到的所有请求
+                if device_paths is None or self._pending_paths is ALL_DEVICES:
+                    self._pending_paths = ALL_DEVICES
+                else:
+                    self._pending_paths = (self._pending_paths or set()) | set(device_paths)
+                self._pending_force = self._pending_force or force
+                return
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, args=(device_paths, force),
+                name="device-capability-probe", daemon=True)
+            self._probe_thread.start()
+
+    def _probe_loop(self, device_paths, force):
+        try:
+            while True:
+                try:
+                    if device_paths is None or device_paths is ALL_DEVICES:
+                        device_paths = sorted(glob.glob('/dev/video*'))
+                    self._probe_worker(sorted(device_paths), force)
+                except Exception as e:
+                    # 一轮失败不影响之后的请求
+                    logger.exception(f"设备能力探测失败: {e}")
+                with self._lock:
+                    if self._pending_paths is None:
+                        self._probe_thread = None
+                        return
+                    device_paths, force = self._pending_paths, self._pending_force
+                    self._pending_paths, self._pending_force = None, False
+        finally:
+            # 线程异常退出时也要清除，否则之后的 probe_async 只会排队、不再启动探测
+            with self._lock:
+                if self._probe_thread is threading.current_thread():
+                    self._probe_thread = None
+
+    def _probe_worker(self, device_paths, force):
+        changed = False
+        for path in device_paths:
+            identity = query_identity(path)
+            if not identity:
+                continue
+            with self._lock:
+                self._identities[path] = identity
+                cached = identity in self._capabilities
+            if cached and not force:
+                continue
+            capabilities = probe_device(path)
+            if not capabilities or not capabilities['resolutions']:
+                continue
+            with self._lock:
+                self._capabilities[identity] = capabilities
+            changed = True
+            logger.info(f"已探测设备能力: {identity} ({path})")
+            self.capabilities_updated.emit(identity)  # 跨线程信号，自动排队到主线程
+        if changed:
+            self._save()
+
+    def forget_path(self, device_path: str) -> None:
+        """设备移除时丢弃路径映射（能力数据保留，以便重新插入时直接使用）"""
+        with self._lock:
+            self._identities.pop(device_path, None)
+
+    def identity_for(self, device_path: str) -> Optional[str]:
+        with self._lock:
+            identity = self._identities.get(device_path)
+        if identity is None:
+            identity = query_identity(device_path)  # 只做一次QUERYCAP，不打开采集流
+            if identity:
+                with self._lock:
+                    self._identities[device_path] = identity
+        return identity
+
+    def get(self, device_path: str) -> Optional[Dict[str, Any]]:
+        identity = self.identity_for(device_path)
+        if not identity:
+            return None
+        with self._lock:
+            return self._capabilities.get(identity)
+
+    def get_resolutions(self, device_path: str) -> List[str]:
+        capabilities = self.get(device_path)
+        if not capabilities:
+            return []
+        return [f"{w}x{h}" for w, h in capabilities['resolutions']]
+
+    def get_frame_rates(self, device_path: str, width: int, height: int) -> List[float]:
+        capabilities = self.get(device_path)
+        if not capabilities:
+            return []
+        return list(capabilities['frame_rates'].get(f"{width}x{height}", []))
+
+    def get_pixel_formats(self, device_path: str) -> List[str]:
+        capabilities = self.get(device_path)
+        if not capabilities:
+            return []
+        return list(capabilities['pixel_formats'])
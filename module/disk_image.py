@@ -0,0 +1,253 @@
+"""虚拟U盘/光驱的磁盘镜像后端
+
+- RawImage：普通或稀疏的ISO/IMG文件，按偏移 pread（空洞读出为0，不占用空间）
+- ChunkedImage：分块压缩镜像（.kvmz），按块解压，带LRU缓存和顺序读预读
+
+分块压缩格式（小端）：
+    文件头  MAGIC(8字节) + 块大小('I') + 镜像大小('Q') + 块数('I')
+    块表    每块一项：数据偏移('Q') + 数据长度('I')；长度为0表示全零块，
+            最高位为1表示该块未压缩（压缩后反而更大）
+    数据    各块的zlib压缩数据
+"""
+import os
+import sys
+import zlib
+import time
+import struct
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'KVMZIMG1'
+HEADER = struct.Struct('<8sIQI')
+TABLE_ENTRY = struct.Struct('<QI')
+RAW_FLAG = 1 << 31
+CHUNKED_SUFFIX = '.kvmz'
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CACHE_CHUNKS = 64
+DEFAULT_READAHEAD = 4
+
+
+class ImageStats:
+    """读取统计（NBD服务线程写入，界面线程读取，数值字段的读写不需要加锁）"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes_read = 0
+        self.requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._last_time = self.started
+        self._last_bytes = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """累计数据和自上次调用以来的读取速度（MB/s）"""
+        now = time.monotonic()
+        bytes_read = self.bytes_read
+        recent = (bytes_read - self._last_bytes) / max(now - self._last_time, 1e-6)
+        self._last_time, self._last_bytes = now, bytes_read
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'bytes_read': bytes_read,
+            'requests': self.requests,
+            'average_mb_s': bytes_read / max(now - self.started, 1e-6) / 1e6,
+            'recent_mb_s': recent / 1e6,
+            'cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+        }
+
+
+class RawImage:
+    """未压缩镜像（含稀疏文件）"""
+    kind = 'raw'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = os.fstat(self.fd).st_size
+        self.stats = ImageStats()
+
+    def read(self, offset: int, length: int) -> bytes:
+        data = os.pread(self.fd, length, offset)
+        if len(data) < length:  # 读到文件末尾之外时补零，与块设备行为一致
+            data += bytes(length - len(data))
+        self.stats.requests += 1
+        self.stats.bytes_read += length
+        return data
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ChunkedImage:
+    """分块压缩镜像：解压后的块放在LRU缓存中，检测到顺序读取时在后台预读后续的块"""
+    kind = 'chunked'
+
+    def __init__(self, path: str, cache_chunks: int = DEFAULT_CACHE_CHUNKS,
+                 readahead: int = DEFAULT_READAHEAD):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        magic, self.chunk_size, self.size, count = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+        if magic != MAGIC:
+            os.close(self.fd)
+            raise ValueError(f"不是分块压缩镜像: {path}")
+        table = os.pread(self.fd, count * TABLE_ENTRY.size, HEADER.size)
+        self.table = [TABLE_ENTRY.unpack_from(table, i * TABLE_ENTRY.size) for i in range(count)]
+        self.cache_chunks = max(cache_chunks, readahead + 2)
+        self.readahead = readahead
+        self.stats = ImageStats()
+        self._cache: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_chunk = -2
+        # zlib 解压时释放GIL，预读线程可以与服务线程并行
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-readahead")
+
+    def _chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def _load(self, index: int) -> bytes:
+        offset, length = self.table[index]
+        if length == 0:
+            return bytes(self._chunk_length(index))
+        data = os.pread(self.fd, length & ~RAW_FLAG, offset)
+        return data if length & RAW_FLAG else zlib.decompress(data)
+
+    def _store(self, index: int, data: bytes) -> None:
+        with self._lock:
+            self._pending.pop(index, None)
+            self._cache[index] = data
+            while len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+
+    def _prefetch_done(self, index: int, future) -> None:
+        if future.exception() is None:
+            self._store(index, future.result())
+        else:
+            with self._lock:
+                self._pending.pop(index, None)
+
+    def _chunk(self, index: int) -> bytes:
+        with self._lock:
+            data = self._cache.get(index)
+            if data is not None:
+                self._cache.move_to_end(index)
+                self.stats.cache_hits += 1
+                return data
+            future = self._pending.get(index)
+        self.stats.cache_misses += 1
+        data = future.result() if future is not None else self._load(index)
+        self._store(index, data)
+        return data
+
+    def _schedule_readahead(self, index: int) -> None:
+        end = min(index + 1 + self.readahead, len(self.table))
+        submitted = []
+        with self._lock:
+            for ahead in range(index + 1, end):
+                if ahead in self._cache or ahead in self._pending:
+                    continue
+                future = self._executor.submit(self._load, ahead)
+                self._pending[ahead] = future
+                submitted.append((ahead, future))
+        # 已完成的future会在当前线程立即执行回调，必须在释放锁之后注册
+        for ahead, future in submitted:
+            future.add_done_callback(lambda f, i=ahead: self._prefetch_done(i, f))
+
+    def read(self, offset: int, length: int) -> bytes:
+        self.stats.requests += 1
+        chunk_size = self.chunk_size
+        end = min(offset + length, self.size)
+        first = offset // chunk_size
+        parts = []
+        position = offset
+        index = first
+        while position < end:
+            data = self._chunk(index)
+            start = position - index * chunk_size
+            piece = data[start:start + end - position]
+            parts.append(piece)
+            position += len(piece)
+            index += 1
+        last = index - 1
+        if self.readahead and first in (self._last_chunk, self._last_chunk + 1):
+            self._schedule_readahead(last)
+        self._last_chunk = last
+        result = b''.join(parts)
+        if len(result) < length:
+            result += bytes(length - len(result))
+        self.stats.bytes_read += length
+        return result
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self._cache.clear()
+
+
+def open_image(path: str, **kwargs):
+    """按文件头选择后端"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        return ChunkedImage(path, **kwargs)
+    return RawImage(path)
+
+
+def is_chunked(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def compress_image(source: str, destination: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   level: int = 6) -> Dict[str, int]:
+    """把ISO/IMG转换为分块压缩镜像，返回原始大小和压缩后大小"""
+    size = os.path.getsize(source)
+    count = (size + chunk_size - 1) // chunk_size
+    table: List[tuple] = []
+    zero_chunk = bytes(chunk_size)
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        dst.write(HEADER.pack(MAGIC, chunk_size, size, count))
+        dst.write(bytes(count * TABLE_ENTRY.size))  # 先占位，写完数据后回填
+        offset = dst.tell()
+        for _ in range(count):
+            chunk = src.read(chunk_size)
+            if chunk == zero_chunk[:len(chunk)]:
+                table.append((0, 0))
+                continue
+            data = zlib.compress(chunk, level)
+            length = len(data)
+            if length >= len(chunk):
+                data, length = chunk, len(chunk) | RAW_FLAG
+            dst.write(data)
+            table.append((offset, length))
+            offset += len(data)
+        dst.seek(HEADER.size)
+        dst.write(b''.join(TABLE_ENTRY.pack(*entry) for entry in table))
+    return {'image_size': size, 'compressed_size': offset}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="转换ISO/IMG为分块压缩镜像")
+    parser.add_argument('source')
+    parser.add_argument('destination', nargs='?')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE // 1024, help='块大小（KiB）')
+    parser.add_argument('--level', type=int, default=6, help='zlib压缩级别')
+    args = parser.parse_args(argv)
+    destination = args.destination or os.path.splitext(args.source)[0] + CHUNKED_SUFFIX
+    result = compress_image(args.source, destination, args.chunk_size * 1024, args.level)
+    ratio = result['compressed_size'] / max(result['image_size'], 1)
+    print(f"{destination}: {result['image_size']} -> {result['compressed_size']} 字节 ({ratio:.1%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
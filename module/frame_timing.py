@@ -0,0 +1,146 @@
+import json
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+from PyQt5.QtCore import QObject, QEvent, pyqtSignal
+from PyQt5.QtMultimedia import QVideoProbe, QVideoFrame
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FrameTimingMonitor(QObject):
+    """采集/渲染帧时序统计
+
+    每帧记录：
+    - capture_us：帧的采集时间戳（管线运行时间，QVideoFrame.startTime）
+    - arrival_jitter_ms：帧到达Qt（已解码）的时刻相对采集时间戳的延迟，减去观测到的最小值，
+      即到达时间相对最佳情况的抖动（采集时钟与本机时钟的绝对偏移无法得知，不是解码耗时）
+    - present_ms：到达Qt后到取景器下一次绘制的时间（仅在控件渲染时可得）
+    丢帧按采集时间戳间隔推算，有效帧率与请求的最小帧率对比。
+    """
+    frame_probed = pyqtSignal(QVideoFrame)  # 转发探测到的帧，供其他分析模块使用
+
+    def __init__(self, parent=None, viewfinder=None, target_fps: float = 30.0, history: int = 600):
+        super().__init__(parent)
+        self.target_fps = target_fps
+        self.records = deque(maxlen=history)
+        self.dropped_frames = 0
+        self.total_frames = 0
+        self._probe = QVideoProbe(self)
+        self._probe.videoFrameProbed.connect(self._on_frame)
+        self._last_capture_us = None
+        self._min_offset_ns = None
+        self._pending_present = None  # 等待绘制的最新记录（窗口最小化时不会有绘制事件，只保留一条）
+        self.render_skipped = 0       # 到达后被更新的帧取代、未被单独绘制的帧数
+        self._arrivals = deque(maxlen=256)
+        self.viewfinder = viewfinder
+        if viewfinder is not None:
+            viewfinder.installEventFilter(self)
+
+    def attach(self, camera, target_fps: Optional[float] = None) -> bool:
+        """绑定到新的QCamera（每次重新创建摄像头后调用）"""
+        if target_fps:
+            self.target_fps = target_fps
+        self.reset()
+        if not self._probe.setSource(camera):
+            logger.warning("当前视频后端不支持帧探测，帧时序统计不可用")
+            return False
+        return True
+
+    def feed(self, frame) -> None:
+        """直接提供帧（多进程模式下帧来自采集进程，没有可探测的QCamera）"""
+        self._on_frame(frame)
+
+    def set_target_fps(self, target_fps: float) -> None:
+        """采集帧率在运行中改变（自适应采集），帧间隔变化不计为丢帧"""
+        self.target_fps = target_fps
+        self._last_capture_us = None
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.dropped_frames = 0
+        self.total_frames = 0
+        self._last_capture_us = None
+        self._min_offset_ns = None
+        self._pending_present = None
+        self.render_skipped = 0
+        self._arrivals.clear()
+
+    def _on_frame(self, frame):
+        now_ns = time.perf_counter_ns()
+        capture_us = frame.startTime()
+        record = {'capture_us': capture_us, 'arrival_ns': now_ns,
+                  'arrival_jitter_ms': None, 'present_ms': None,
+                  'width': frame.width(), 'height': frame.height()}
+        if capture_us >= 0:
+            offset_ns = now_ns - capture_us * 1000
+            if self._min_offset_ns is None or offset_ns < self._min_offset_ns:
+                self._min_offset_ns = offset_ns
+            record['arrival_jitter_ms'] = (offset_ns - self._min_offset_ns) / 1e6
+            if self._last_capture_us is not None and self.target_fps > 0:
+                interval_us = 1e6 / self.target_fps
+                gap = capture_us - self._last_capture_us
+                if gap > 1.5 * interval_us:
+                    self.dropped_frames += int(round(gap / interval_us)) - 1
+            self._last_capture_us = capture_us
+        self.total_frames += 1
+        self.records.append(record)
+        self._arrivals.append(now_ns)
+        if self._pending_present is not None:
+            self.render_skipped += 1  # 一次绘制呈现的是最新帧，之前未绘制的帧视为被渲染跳过
+        self._pending_present = record
+        self.frame_probed.emit(frame)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self._pending_present is not None:
+            latest = self._pending_present
+            latest['present_ms'] = (time.perf_counter_ns() - latest['arrival_ns']) / 1e6
+            self._pending_present = None
+        return False
+
+    def effective_fps(self) -> float:
+        if len(self._arrivals) < 2:
+            return 0.0
+        now_ns = time.perf_counter_ns()
+        recent = [t for t in self._arrivals if now_ns - t <= 1_000_000_000]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / ((recent[-1] - recent[0]) / 1e9)
+
+    def get_summary(self) -> Dict[str, Any]:
+        jitter = [r['arrival_jitter_ms'] for r in self.records if r['arrival_jitter_ms'] is not None]
+        present = [r['present_ms'] for r in self.records if r['present_ms'] is not None]
+        return {
+            'frames': self.total_frames,
+            'effective_fps': round(self.effective_fps(), 2),
+            'target_fps': self.target_fps,
+            'dropped_frames': self.dropped_frames,
+            'render_skipped': self.render_skipped if present else None,  # 到达但未被单独绘制的帧
+            'arrival_jitter_ms_p50': round(_percentile(jitter, 50), 2),
+            'arrival_jitter_ms_p95': round(_percentile(jitter, 95), 2),
+            'present_ms_p50': round(_percentile(present, 50), 2) if present else None,
+            'present_ms_p95': round(_percentile(present, 95), 2) if present else None,
+        }
+
+    def summary_text(self) -> str:
+        s = self.get_summary()
+        text = (f"帧率: {s['effective_fps']:.1f}/{s['target_fps']:.0f} fps | 丢帧: {s['dropped_frames']} | "
+                f"到达抖动 p50/p95: {s['arrival_jitter_ms_p50']:.1f}/{s['arrival_jitter_ms_p95']:.1f} ms")
+        if s['present_ms_p50'] is not None:
+            text += f" | 呈现 p50/p95: {s['present_ms_p50']:.1f}/{s['present_ms_p95']:.1f} ms"
+        return text
+
+    def dump_json(self, path: str) -> None:
+        """导出摘要和逐帧记录"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.get_summary(), 'frames': list(self.records)}, f, indent=1)
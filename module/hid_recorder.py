@@ -0,0 +1,255 @@
+"""HID报告录制与回放
+
+录制：在 HidReportWriter.write 上挂接 tap，把发往各端点的每个原始报告追加到紧凑的二进制日志；
+回放：按记录的时间间隔（或N倍速）把报告重新写入HID设备，用于复现现场操作和无人值守压测。
+
+文件格式（小端）：
+    文件头  MAGIC(8字节) + 录制开始的墙钟时间（纳秒，'<Q'）
+    记录    相对开始的单调时间（纳秒，'<Q'）+ 端点号（'B'）+ 报告长度（'B'）+ 报告
+"""
+import sys
+import time
+import struct
+import logging
+import argparse
+import threading
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from module.hid_reports import touch_release_report
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'KVMREC\x00\x01'
+FILE_HEADER = struct.Struct('<Q')
+RECORD_HEADER = struct.Struct('<QBB')
+FILE_SUFFIX = '.kvmrec'
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# 端点号即在此元组中的下标（只在末尾追加，旧录制文件仍可回放），名称与 MainWindow.hid_devices 的键一致
+ENDPOINTS = ('keyboard', 'mouse_relative', 'mouse_absolute', 'touch', 'consumer')
+
+# 一个端点上有多个输入报告（按报告ID区分）的端点：回放结束时每个报告ID各发送一次释放报告
+MULTI_REPORT_ENDPOINTS = frozenset({ENDPOINTS.index('consumer')})
+
+Record = Tuple[int, int, bytes]  # (时间戳ns, 端点号, 报告)
+
+
+class HidRecorder:
+    """把HID报告追加到录制文件；attach() 后每次 write 都会被记录"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._file.write(MAGIC + FILE_HEADER.pack(time.time_ns()))
+        self._start = time.monotonic_ns()
+        self._lock = threading.Lock()  # 回放线程的写入也可能经过 tap
+        self._writers = []
+        self.records = 0
+
+    def attach(self, devices: Dict[str, object]) -> None:
+        """在各端点的写入器上挂接 tap（HID设备重新打开后需要再次调用，替换之前挂接的写入器）"""
+        self.detach()
+        for endpoint, name in enumerate(ENDPOINTS):
+            writer = devices.get(name)
+            if writer is not None:
+                writer.tap = self._make_tap(endpoint)
+                self._writers.append(writer)
+
+    def detach(self) -> None:
+        for writer in self._writers:
+            writer.tap = None
+        self._writers = []
+
+    def _make_tap(self, endpoint: int):
+        def tap(report):
+            self.record(endpoint, report)
+        return tap
+
+    def record(self, endpoint: int, report) -> None:
+        # 报告可能是构建器复用的缓冲区，写入文件缓冲即完成复制
+        timestamp = time.monotonic_ns() - self._start
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD_HEADER.pack(timestamp, endpoint, len(report)))
+            self._file.write(report)
+            self.records += 1
+
+    def close(self) -> None:
+        self.detach()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logger.info(f"录制结束: {self.path}，共 {self.records} 个报告")
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """逐条读取录制文件；文件尾部不完整的记录（录制中断）被忽略"""
+    with open(path, 'rb') as f:
+        header = f.read(len(MAGIC) + FILE_HEADER.size)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"不是HID录制文件: {path}")
+        data = f.read()
+    offset = 0
+    size = RECORD_HEADER.size
+    while offset + size <= len(data):
+        timestamp, endpoint, length = RECORD_HEADER.unpack_from(data, offset)
+        offset += size
+        if offset + length > len(data):
+            break
+        yield timestamp, endpoint, data[offset:offset + length]
+        offset += length
+
+
+def release_report(endpoint: int, last_report: bytes) -> bytes:
+    """回放结束或中止时发送的释放报告：松开所有按键，绝对鼠标停在原位，触点原地抬起"""
+    if ENDPOINTS[endpoint] == 'consumer':  # 媒体键/电源键报告带报告ID，保留ID、清空用途
+        return last_report[:1] + bytes(len(last_report) - 1)
+    if ENDPOINTS[endpoint] == 'mouse_absolute':
+        return bytes([0]) + last_report[1:5] + bytes(len(last_report) - 5)
+    if ENDPOINTS[endpoint] == 'touch':
+        return touch_release_report(last_report)
+    return bytes(len(last_report))
+
+
+class HidReplayer(QObject):
+    """按录制时序回放HID报告
+
+    speed 为回放倍速（2表示两倍速）；0 表示不等待，尽快发送（压测）。
+    start() 在后台线程中回放，run() 为阻塞版本（命令行使用）。
+    """
+    progress = pyqtSignal(int, int)   # 已发送, 总数
+    finished = pyqtSignal(int, bool)  # 已发送, 是否被中止
+
+    def __init__(self, records: List[Record], devices: Dict[str, object], speed: float = 1.0,
+                 parent=None):
+        super().__init__(parent)
+        self.records = records
+        self.devices = devices
+        self.speed = speed
+        self._stop = threading.Event()
+        self._thread = None
+        self.late_reports = 0
+
+    @classmethod
+    def from_file(cls, path: str, devices: Dict[str, object], speed: float = 1.0,
+                  parent=None) -> 'HidReplayer':
+        return cls(list(read_records(path)), devices, speed, parent)
+
+    @property
+    def duration(self) -> float:
+        """录制时长（秒）"""
+        return self.records[-1][0] / 1e9 if self.records else 0.0
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="hid-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self) -> int:
+        # 回放的报告不经过录制钩子：录制进行中时只记录实时输入
+        writers = [getattr(writer, 'write_untapped', writer.write) if writer is not None else None
+                   for writer in (self.devices.get(name) for name in ENDPOINTS)]
+        last_reports: Dict[Tuple[int, int], bytes] = {}  # (端点号, 报告ID或0) -> 最后的报告
+        total = len(self.records)
+        scale = 1e-9 / self.speed if self.speed > 0 else 0.0
+        perf_counter = time.perf_counter
+        sent = 0
+        completed = False
+        try:
+            start = perf_counter()
+            for timestamp, endpoint, report in self.records:
+                if self._stop.is_set():
+                    break
+                # 按截止时间调度，不会因逐个sleep累积漂移
+                deadline = start + timestamp * scale
+                now = perf_counter()
+                if deadline > now:
+                    if self._stop.wait(deadline - now):
+                        break
+                elif now - deadline > 0.01:
+                    self.late_reports += 1
+                write = writers[endpoint] if endpoint < len(writers) else None
+                if write is None:
+                    continue
+                try:
+                    write(report)
+                except OSError as e:
+                    logger.error(f"回放写入 {ENDPOINTS[endpoint]} 失败: {e}")
+                    self._stop.set()
+                    break
+                last_reports[endpoint, report[0] if endpoint in MULTI_REPORT_ENDPOINTS else 0] = report
+                sent += 1
+                if sent % 500 == 0:
+                    self.progress.emit(sent, total)
+            completed = not self._stop.is_set()
+        finally:
+            # 中止（包括命令行的Ctrl+C）时也要松开按键、抬起触点，不在被控机上留下按住的键
+            for (endpoint, _), report in last_reports.items():
+                try:
+                    writers[endpoint](release_report(endpoint, report))
+                except OSError:
+                    pass
+            logger.info(f"回放{'完成' if completed else '中止'}: {sent}/{total} 个报告，"
+                        f"延迟超过10ms: {self.late_reports}")
+        self.finished.emit(sent, not completed)
+        return sent
+
+
+def summarize(path: str) -> str:
+    counts = [0] * len(ENDPOINTS)
+    last = 0
+    for timestamp, endpoint, _ in read_records(path):
+        if endpoint < len(counts):
+            counts[endpoint] += 1
+        last = timestamp
+    parts = ", ".join(f"{name}={count}" for name, count in zip(ENDPOINTS, counts))
+    return f"{path}: {sum(counts)} 个报告, 时长 {last / 1e9:.2f}s ({parts})"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from module.hid_writer import open_hid_device
+    from module.usb_gadget import load_endpoint_map
+
+    parser = argparse.ArgumentParser(description="HID录制文件查看与回放")
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help='显示录制文件摘要')
+    info.add_argument('path')
+    replay = sub.add_parser('replay', help='回放录制文件')
+    replay.add_argument('path')
+    replay.add_argument('--speed', type=float, default=1.0, help='回放倍速，0表示尽快发送')
+    replay.add_argument('--loop', type=int, default=1, help='重复次数（压测）')
+    device_paths = load_endpoint_map()['devices']
+    for name in ENDPOINTS:
+        replay.add_argument(f"--{name.replace('_', '-')}", default=device_paths.get(name, ''),
+                            help=f'{name} 设备路径（为空时跳过该端点）')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'info':
+        print(summarize(args.path))
+        return 0
+    devices = {name: open_hid_device(getattr(args, name)) for name in ENDPOINTS if getattr(args, name)}
+    try:
+        replayer = HidReplayer.from_file(args.path, devices, args.speed)
+        for _ in range(args.loop):
+            replayer.run()
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        for writer in devices.values():
+            writer.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""HID报告构建器：预编译的struct格式 + 复用的缓冲区
+
+键盘、相对鼠标和触控构建器持有一个固定长度的bytearray，build() 原地写入并返回该缓冲区，
+逐事件的热路径上不再创建列表、元组或新的bytes对象（键盘的键码槽位在按下/松开时更新，见 KeyboardReport）。
+返回的缓冲区在下一次 build() 前有效；需要排队保存的报告（粘贴序列等）请用 bytes() 复制。
+绝对鼠标报告直接返回新的bytes（见 AbsoluteMouseReport）。
+报告格式与 module/usb_gadget.py 中声明的描述符一致。
+"""
+import struct
+
+KEYBOARD_REPORT = struct.Struct('<BB6B')   # 修饰键, 保留, 6个键码
+RELATIVE_REPORT = struct.Struct('<Bbbbb')  # 按钮, X, Y, 滚轮, 水平滚轮（AC Pan）
+ABSOLUTE_REPORT = struct.Struct('<BHHbb')  # 按钮, X, Y, 滚轮, 水平滚轮（AC Pan）
+
+CONSUMER_REPORT = struct.Struct('<BH')     # 报告ID, Consumer Page 用途（0为松开）
+SYSTEM_REPORT = struct.Struct('<BB')       # 报告ID, 关机/睡眠/唤醒位
+TOUCH_CONTACT = struct.Struct('<BBHH')     # 状态位（接触、置信）, 触点ID, X, Y
+
+CONSUMER_REPORT_ID = 1
+SYSTEM_REPORT_ID = 2
+SYSTEM_POWER_DOWN = 0x01
+SYSTEM_SLEEP = 0x02
+SYSTEM_WAKE_UP = 0x04
+TOUCH_REPORT_ID = 1
+TOUCH_FEATURE_REPORT_ID = 2                # 最大触点数（Contact Count Maximum）
+TOUCH_MAX_CONTACTS = 10
+TOUCH_TIP = 0x01
+TOUCH_CONFIDENCE = 0x02
+TOUCH_REPORT_SIZE = 1 + TOUCH_CONTACT.size * TOUCH_MAX_CONTACTS + 1  # 报告ID + 触点 + 触点数
+
+ABSOLUTE_MAX = 32767
+_EMPTY_KEYBOARD = bytes(KEYBOARD_REPORT.size)
+_pack_absolute = ABSOLUTE_REPORT.pack
+
+
+class KeyboardReport:
+    """8字节键盘报告（6键无冲）
+
+    键码槽位（第2~7字节）随按下/松开原地更新（press/release），按下顺序保持不变，
+    build() 只写入修饰键字节；快捷键、重复等任意键码组合的报告用 pack() 生成独立的bytes。
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = bytearray(KEYBOARD_REPORT.size)
+
+    def press(self, code: int) -> bool:
+        """把键码放入第一个空槽位；6个槽位都已占用时返回False"""
+        index = self.buffer.find(0, 2)
+        if index < 0:
+            return False
+        self.buffer[index] = code
+        return True
+
+    def release(self, code: int) -> None:
+        """移除键码，后面的键码前移一位"""
+        buffer = self.buffer
+        index = buffer.find(code, 2)
+        if index < 0:
+            return
+        last = KEYBOARD_REPORT.size - 1
+        while index < last:
+            buffer[index] = buffer[index + 1]
+            index += 1
+        buffer[last] = 0
+
+    def build(self, modifiers: int) -> bytearray:
+        self.buffer[0] = modifiers
+        return self.buffer
+
+    def clear(self) -> bytearray:
+        self.buffer[:] = _EMPTY_KEYBOARD
+        return self.buffer
+
+    @staticmethod
+    def pack(modifiers: int, key_codes) -> bytes:
+        """任意键码组合的报告（超过6个时只取前6个），不影响槽位"""
+        codes = list(key_codes)[:6]
+        return KEYBOARD_REPORT.pack(modifiers, 0, *codes, *(0,) * (6 - len(codes)))
+
+
+class RelativeMouseReport:
+    """5字节相对鼠标报告，位移和滚轮限制在 -127~127"""
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = bytearray(RELATIVE_REPORT.size)
+
+    def build(self, buttons: int, dx: int = 0, dy: int = 0, wheel: int = 0, pan: int = 0) -> bytearray:
+        RELATIVE_REPORT.pack_into(
+            self.buffer, 0, buttons,
+            -127 if dx < -127 else 127 if dx > 127 else dx,
+            -127 if dy < -127 else 127 if dy > 127 else dy,
+            -127 if wheel < -127 else 127 if wheel > 127 else wheel,
+            -127 if pan < -127 else 127 if pan > 127 else pan)
+        return self.buffer
+
+
+def consumer_report(usage: int) -> bytes:
+    """媒体键报告（非热路径，直接返回独立的bytes以便放入按下/松开序列）"""
+    return CONSUMER_REPORT.pack(CONSUMER_REPORT_ID, usage)
+
+
+def system_report(bits: int) -> bytes:
+    return SYSTEM_REPORT.pack(SYSTEM_REPORT_ID, bits)
+
+
+class AbsoluteMouseReport:
+    """7字节绝对鼠标报告，记住最后的坐标，滚轮报告不会移动指针
+
+    与其他构建器不同，这里不复用缓冲区：单个7字节报告用预编译的 Struct.pack 直接生成
+    比 pack_into 写入缓冲区更快（Python层的方法调用开销抵消了复用缓冲区的收益），返回的bytes也无需再复制。
+    """
+    __slots__ = ('x', 'y')
+
+    def __init__(self):
+        self.x = ABSOLUTE_MAX // 2
+        self.y = ABSOLUTE_MAX // 2
+
+    def build(self, buttons: int, x: int, y: int) -> bytes:
+        self.x = x
+        self.y = y
+        return _pack_absolute(buttons, x, y, 0, 0)
+
+    def build_scroll(self, buttons: int, wheel: int, pan: int = 0) -> bytes:
+        return _pack_absolute(
+            buttons, self.x, self.y,
+            -127 if wheel < -127 else 127 if wheel > 127 else wheel,
+            -127 if pan < -127 else 127 if pan > 127 else pan)
+
+
+class TouchReport:
+    """多点触控报告（并行模式）：一个报告携带本帧全部触点，最后一个字节为有效触点数"""
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = bytearray(TOUCH_REPORT_SIZE)
+        self.buffer[0] = TOUCH_REPORT_ID
+
+    def build(self, contacts) -> bytearray:
+        """contacts 为 (触点ID, 是否接触, x, y) 的可迭代对象，超过10个时只取前10个"""
+        buffer = self.buffer
+        offset = 1
+        count = 0
+        for contact_id, tip, x, y in contacts:
+            if count == TOUCH_MAX_CONTACTS:
+                break
+            TOUCH_CONTACT.pack_into(buffer, offset, TOUCH_CONFIDENCE | TOUCH_TIP if tip else TOUCH_CONFIDENCE,
+                                    contact_id, x, y)
+            offset += TOUCH_CONTACT.size
+            count += 1
+        end = TOUCH_REPORT_SIZE - 1
+        buffer[offset:end] = bytes(end - offset)
+        buffer[end] = count
+        return buffer
+
+
+def touch_release_report(last_report) -> bytes:
+    """把报告中的所有触点改为抬起（回放中止、断开时使用）"""
+    report = bytearray(last_report)
+    for index in range(report[-1]):
+        report[1 + index * TOUCH_CONTACT.size] &= ~TOUCH_TIP
+    return bytes(report)
@@ -0,0 +1,176 @@
+import io
+import os
+import time
+import logging
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 高速USB下 f_hid 默认 bInterval=4，即主机每 1ms 轮询一次中断端点
+HOST_POLL_INTERVAL = 0.001
+IOV_MAX = 1024  # 单次 writev 的最大缓冲区数量
+
+
+class HidReportWriter:
+    """HID报告写入器
+
+    raw 模式直接对原始文件描述符调用 os.write，没有Python层缓冲，也不需要flush；
+    buffered 模式保留原来 open(path, 'rb+') + write() + flush() 的行为，便于对比。
+
+    注意：f_hid 的每次 write 只取前 report_length 个字节作为一个报告，
+    因此对 /dev/hidgN 的突发写入必须逐个报告 write，不能用 writev 合并；
+    coalesce 只适用于管道、pty 等字节流替身。
+    """
+
+    def __init__(self, fd: int, name: str = '', raw: bool = True,
+                 poll_interval: float = HOST_POLL_INTERVAL):
+        self.fd = fd
+        self.name = name
+        self.raw = raw
+        self.poll_interval = poll_interval
+        self._file = None if raw else self._open_buffered(fd)
+        self.tap = None  # 录制钩子 tap(report)，见 module.hid_recorder
+        # 发送耗时统计：f_hid 在上一个报告未被主机取走前会阻塞写入，
+        # 因此单次写入耗时反映了主机的实际轮询间隔
+        self.reports_sent = 0
+        self.late_reports = 0
+        self.max_write_time = 0.0
+        self.total_write_time = 0.0
+
+    @staticmethod
+    def _open_buffered(fd):
+        try:
+            return os.fdopen(fd, 'rb+', closefd=False)
+        except io.UnsupportedOperation:
+            return os.fdopen(fd, 'wb', closefd=False)  # 管道等不可定位的替身
+
+    @classmethod
+    def open(cls, path: str, raw: bool = True, **kwargs) -> 'HidReportWriter':
+        fd = os.open(path, os.O_RDWR)
+        return cls(fd, name=path, raw=raw, **kwargs)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def write(self, report) -> int:
+        if self.tap is not None:
+            self.tap(report)
+        if self.raw:
+            return os.write(self.fd, report)
+        written = self._file.write(report)
+        self._file.flush()
+        return written
+
+    def write_untapped(self, report) -> int:
+        """写入报告但不经过录制钩子（回放时使用，回放的报告不会再被录制）"""
+        if self.raw:
+            return os.write(self.fd, report)
+        written = self._file.write(report)
+        self._file.flush()
+        return written
+
+    def flush(self) -> None:
+        if self._file:
+            self._file.flush()
+
+    def write_burst(self, reports: Sequence, interval: Optional[float] = None,
+                    coalesce: bool = False) -> int:
+        """连续发送一组报告
+
+        interval 为相邻报告的最小间隔（默认一个主机轮询周期），按截止时间调度，
+        不会因为逐个 sleep 而累积漂移；interval <= 0 时不等待，整组只计时一次
+        （max_write_ms 记录的是该组的平均单个写入耗时）。返回发送的报告数。
+        """
+        if coalesce:
+            return self._write_coalesced(reports)
+        if interval is None:
+            interval = self.poll_interval
+        if interval <= 0:
+            return self._write_unpaced(reports)
+        perf_counter = time.perf_counter
+        write = self.write
+        late = 0
+        start = perf_counter()
+        for index, report in enumerate(reports):
+            deadline = start + index * interval
+            now = perf_counter()
+            if deadline > now:
+                time.sleep(deadline - now)
+                now = perf_counter()
+            write(report)
+            elapsed = perf_counter() - now
+            self.total_write_time += elapsed
+            if elapsed > self.max_write_time:
+                self.max_write_time = elapsed
+            if elapsed > 2 * self.poll_interval:
+                late += 1
+        self.reports_sent += len(reports)
+        if late:
+            self.late_reports += late
+            logger.debug(f"{self.name}: {late}/{len(reports)} 个报告的写入超过两个主机轮询周期")
+        return len(reports)
+
+    def _write_unpaced(self, reports: Sequence) -> int:
+        """不需要间隔的突发：逐个写入，整组只取两次时间戳"""
+        count = len(reports)
+        if not count:
+            return 0
+        start = time.perf_counter()
+        if self.raw and self.tap is None:
+            write, fd = os.write, self.fd
+            for report in reports:
+                write(fd, report)
+        else:
+            write = self.write
+            for report in reports:
+                write(report)
+        elapsed = time.perf_counter() - start
+        self.total_write_time += elapsed
+        if elapsed / count > self.max_write_time:
+            self.max_write_time = elapsed / count
+        self.reports_sent += count
+        return count
+
+    def _write_coalesced(self, reports: Sequence) -> int:
+        """单次 writev 提交全部报告（仅用于字节流替身）"""
+        if self.tap is not None:
+            for report in reports:
+                self.tap(report)
+        start = time.perf_counter()
+        for offset in range(0, len(reports), IOV_MAX):
+            chunk = reports[offset:offset + IOV_MAX]
+            total = sum(len(r) for r in chunk)
+            written = os.writev(self.fd, chunk)
+            if written < total:  # 管道满时 writev 可能只写入一部分
+                data = b''.join(bytes(r) for r in chunk)
+                while written < total:
+                    written += os.write(self.fd, data[written:])
+        elapsed = time.perf_counter() - start
+        self.total_write_time += elapsed
+        self.max_write_time = max(self.max_write_time, elapsed)
+        self.reports_sent += len(reports)
+        return len(reports)
+
+    def get_stats(self) -> dict:
+        sent = self.reports_sent
+        return {
+            'reports_sent': sent,
+            'late_reports': self.late_reports,
+            'max_write_ms': self.max_write_time * 1000,
+            'avg_write_ms': (self.total_write_time / sent * 1000) if sent else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.fd is not None and self.fd >= 0:
+            os.close(self.fd)
+        self.fd = -1
+
+
+def open_hid_device(path: str, raw: Optional[bool] = None) -> HidReportWriter:
+    """打开HID设备；设置环境变量 KVM_HID_BUFFERED=1 可回到缓冲写入模式"""
+    if raw is None:
+        raw = os.environ.get('KVM_HID_BUFFERED', '0') != '1'
+    return HidReportWriter.open(path, raw=raw)
@@ -0,0 +1,148 @@
+import glob
+import socket
+import logging
+from typing import Dict, Set
+
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+UDC_STATE_GLOB = '/sys/class/udc/*/state'
+VIDEO_DEVICE_GLOB = '/dev/video*'
+
+
+class HotplugMonitor(QObject):
+    """监听视频采集设备插拔和USB gadget连接状态
+
+    优先使用内核uevent（netlink）和sysfs_notify，失败时回退为定时轮询。
+    全部在Qt事件循环中以文件描述符通知驱动，不涉及输入热路径。
+    """
+    video_devices_changed = pyqtSignal(list, list)  # 新增设备路径, 移除设备路径
+    udc_state_changed = pyqtSignal(str, str)        # UDC名称, 新状态（如 configured / not attached）
+
+    def __init__(self, parent=None, poll_interval_ms: int = 2000):
+        super().__init__(parent)
+        self.video_devices: Set[str] = set(glob.glob(VIDEO_DEVICE_GLOB))
+        self.udc_states: Dict[str, str] = {}
+        self._netlink = None
+        self._netlink_notifier = None
+        self._udc_files = {}
+        self._udc_notifiers = []
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(poll_interval_ms)
+        self._poll_timer.timeout.connect(self.poll)
+
+    def start(self) -> None:
+        if not self._start_netlink():
+            logger.warning("无法订阅内核uevent，使用轮询方式检测视频设备")
+            self._poll_timer.start()
+        self._start_udc_watch()
+        if not self._udc_notifiers and not self._poll_timer.isActive():
+            self._poll_timer.start()
+
+    def stop(self) -> None:
+        self._poll_timer.stop()
+        if self._netlink_notifier:
+            self._netlink_notifier.setEnabled(False)
+            self._netlink_notifier = None
+        if self._netlink:
+            self._netlink.close()
+            self._netlink = None
+        for notifier in self._udc_notifiers:
+            notifier.setEnabled(False)
+        self._udc_notifiers = []
+        for f in self._udc_files.values():
+            f.close()
+        self._udc_files = {}
+
+    def _start_netlink(self) -> bool:
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, UEVENT_KERNEL_GROUP))
+            sock.setblocking(False)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"netlink不可用: {e}")
+            return False
+        self._netlink = sock
+        self._netlink_notifier = QSocketNotifier(sock.fileno(), QSocketNotifier.Read, self)
+        self._netlink_notifier.activated.connect(self._on_uevent)
+        return True
+
+    def _on_uevent(self, _fd):
+        while True:
+            try:
+                data = self._netlink.recv(8192)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logger.error(f"读取uevent失败: {e}")
+                break
+            fields = {}
+            for item in data.split(b'\0')[1:]:
+                key, sep, value = item.partition(b'=')
+                if sep:
+                    fields[key] = value
+            subsystem = fields.get(b'SUBSYSTEM')
+            if subsystem == b'video4linux':
+                self._check_video_devices()
+            elif subsystem == b'udc':
+                self._start_udc_watch()  # UDC出现/消失时重新建立监听
+                self._check_udc_states()
+
+    def _start_udc_watch(self):
+        for path in glob.glob(UDC_STATE_GLOB):
+            if path in self._udc_files:
+                continue
+            try:
+                f = open(path, 'rb', buffering=0)
+            except OSError as e:
+                logger.debug(f"无法打开UDC状态文件 {path}: {e}")
+                continue
+            self._udc_files[path] = f
+            # sysfs_notify 以 POLLPRI 唤醒，对应 QSocketNotifier 的 Exception 类型
+            notifier = QSocketNotifier(f.fileno(), QSocketNotifier.Exception, self)
+            notifier.activated.connect(lambda _fd, p=path: self._read_udc_state(p))
+            self._udc_notifiers.append(notifier)
+            self._read_udc_state(path)
+
+    def _read_udc_state(self, path):
+        f = self._udc_files.get(path)
+        try:
+            if f:
+                f.seek(0)
+                state = f.read().decode('ascii', 'replace').strip()
+            else:
+                with open(path, 'r') as state_file:
+                    state = state_file.read().strip()
+        except OSError:
+            state = 'not attached'
+        udc = path.split('/')[-2]
+        if self.udc_states.get(udc) != state:
+            previous = self.udc_states.get(udc)
+            self.udc_states[udc] = state
+            logger.info(f"UDC {udc} 状态: {previous} -> {state}")
+            if previous is not None:
+                self.udc_state_changed.emit(udc, state)
+
+    def _check_udc_states(self):
+        for path in glob.glob(UDC_STATE_GLOB):
+            self._read_udc_state(path)
+
+    def _check_video_devices(self):
+        current = set(glob.glob(VIDEO_DEVICE_GLOB))
+        added = sorted(current - self.video_devices)
+        removed = sorted(self.video_devices - current)
+        if added or removed:
+            self.video_devices = current
+            logger.info(f"视频设备变化: 新增 {added}, 移除 {removed}")
+            self.video_devices_changed.emit(added, removed)
+
+    def poll(self) -> None:
+        """轮询回退路径，也可以在收到传输错误后主动调用"""
+        self._check_video_devices()
+        self._check_udc_states()
+
+    def is_configured(self) -> bool:
+        return any(state == 'configured' for state in self.udc_states.values())
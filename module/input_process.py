@@ -0,0 +1,238 @@
+"""多进程模式的输入进程（见 module.process_supervisor）
+
+输入进程持有键盘、鼠标的 /dev/hidg* 描述符，运行与单进程时相同的 KeyboardHandler、
+MouseHandler 和 InputWorker。界面进程把事件元组打包写入共享内存事件缓冲区
+（module.shm_ring.EventRing），用信号量唤醒输入进程的读取线程；处理器的状态修改
+（布局、鼠标模式、取景器尺寸等）通过控制管道按方法名调用。处理器的信号（状态栏文本、
+本地预测光标、传输断开）和被控机LED状态经管道发回界面进程，由界面进程中同名处理器的
+信号重新发出，主窗口的连接不需要区分两种模式。
+
+事件和调用走不同的通道，但保持单进程时的先后顺序：每个调用带有发送时事件缓冲区的
+写指针，输入进程先把该位置之前的事件交给 InputWorker，再执行调用。
+"""
+import gc
+import os
+import logging
+import threading
+from typing import Dict
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from module.shm_ring import EventRing
+from module.input_worker import InputWorker, pack_event, unpack_event
+from module.keyboard_module import KeyboardHandler
+from module.mouse_module import MouseHandler
+from module.keyboard_leds import KeyboardLedReader, LED_CAPS_LOCK
+from module.hid_writer import open_hid_device
+from module.usb_gadget import load_endpoint_map
+from module.process_supervisor import SPAWN, ChildControl, ChildEndpoint, child_main
+
+logger = logging.getLogger(__name__)
+
+INPUT_DEVICES = ('keyboard', 'mouse_relative', 'mouse_absolute')
+# 会改变处理器状态的调用：界面进程中的处理器同样执行（主窗口读取鼠标模式、取景器尺寸、坐标映射），
+# 输入进程重启后按顺序重放
+STATE_CALLS = ('set_keyboard_layout', 'set_repeat_policy', 'set_paste_interval',
+               'set_target_region', 'set_mode', 'update_viewport')
+# 界面进程中的处理器不持有设备，这些调用只镜像状态，不执行发送报告的部分
+STATE_MIRRORS = {
+    'update_viewport': lambda handler, *args: handler.set_viewport(*args),
+    'set_mode': lambda handler, mode: setattr(handler, 'mode', mode),
+}
+# 转发到界面进程的处理器信号
+FORWARDED_SIGNALS = {
+    'keyboard': ('key_status_changed', 'text_sent', 'transport_lost'),
+    'mouse': ('status_message', 'absolute_sent', 'transport_lost'),
+}
+DOORBELL_TIMEOUT = 0.5  # 读取线程检查退出标志的间隔（秒）
+
+
+class InputProcess(QObject):
+    """输入进程中的对象：打开HID设备、读取事件缓冲区、执行控制命令"""
+
+    def __init__(self, conn, ring_name: str, doorbell):
+        super().__init__()
+        self.control = ChildControl(conn, self._on_command, self)
+        self.ring = EventRing.attach(ring_name)
+        self.doorbell = doorbell
+        self.devices = self._open_devices()
+        self.keyboard = KeyboardHandler(self.devices['keyboard'])
+        self.mouse = MouseHandler(None, self.devices['mouse_absolute'], self.devices['mouse_relative'], 1280, 720)
+        if 'wheel_resolution_multiplier' in self.endpoint_map:  # 与描述符中的高分辨率滚轮倍数一致
+            self.mouse.scroll_engine.resolution_multiplier = max(1, self.endpoint_map['wheel_resolution_multiplier'])
+        self.handlers = {'keyboard': self.keyboard, 'mouse': self.mouse}
+        for target, names in FORWARDED_SIGNALS.items():
+            for name in names:
+                signal = getattr(self.handlers[target], name)
+                signal.connect(lambda *args, target=target, name=name: self.control.send('signal', target, name, args))
+        self.led_reader = KeyboardLedReader(self)
+        self.led_reader.leds_changed.connect(self._on_leds_changed)
+        self.led_reader.attach(self.devices['keyboard'])
+        self.worker = InputWorker(self.keyboard, self.mouse)
+        self.worker.start()
+        self._stopping = False
+        self._drain_lock = threading.Lock()  # 读取线程和控制命令都会取出事件（缓冲区只允许一个消费者）
+        self._reader = threading.Thread(target=self._read_events, name="event-ring", daemon=True)
+        self._reader.start()
+        self.control.send('devices', {name: bool(device) for name, device in self.devices.items()})
+        # 初始化产生的对象不再参与分代回收，减少之后每次GC的扫描量
+        gc.collect()
+        gc.freeze()
+        logger.info(f"输入进程已就绪，pid {os.getpid()}")
+
+    def _open_devices(self) -> Dict:
+        devices = {name: None for name in INPUT_DEVICES}
+        self.endpoint_map = load_endpoint_map()
+        for name in INPUT_DEVICES:
+            try:
+                devices[name] = open_hid_device(self.endpoint_map['devices'][name])
+            except Exception as e:
+                logger.error(f"HID设备 {name} 打开失败: {e}")
+        return devices
+
+    def _close_devices(self) -> None:
+        self.led_reader.detach()
+        for device in self.devices.values():
+            if device:
+                device.close()
+        self.devices = {name: None for name in INPUT_DEVICES}
+
+    def _read_events(self) -> None:
+        while not self._stopping:
+            if self.doorbell.acquire(timeout=DOORBELL_TIMEOUT):
+                self._drain_events()
+
+    def _drain_events(self) -> None:
+        """把缓冲区中的事件交给 InputWorker（持锁投递，与之后的调用保持顺序）"""
+        post = self.worker.post
+        with self._drain_lock:
+            for record in self.ring.drain():
+                post(unpack_event(record))
+
+    def _drain_until(self, sequence: int) -> None:
+        """调用执行前，先投递界面进程发出调用之前写入的全部事件"""
+        self._drain_events()
+        if self.ring.consumed() < sequence:
+            logger.warning(f"调用前的事件未到达（{self.ring.consumed()}/{sequence}）")
+
+    def _on_leds_changed(self, leds: int) -> None:
+        self.worker.call(setattr, self.keyboard, 'caps_lock', bool(leds & LED_CAPS_LOCK))
+        self.control.send('leds', leds)
+
+    def _on_command(self, command: str, *args) -> None:
+        if command == 'call':
+            target, method, call_args, sequence = args
+            self._drain_until(sequence)
+            self.worker.call(getattr(self.handlers[target], method), *call_args, wait=True)
+        elif command == 'reopen':
+            self.worker.call(self._attach_devices, None, wait=True)
+            self._close_devices()
+            self.devices = self._open_devices()
+            self.worker.call(self._attach_devices, self.devices)
+            self.led_reader.attach(self.devices['keyboard'])
+            self.control.send('devices', {name: bool(device) for name, device in self.devices.items()})
+            logger.info("HID设备已重新打开")
+        else:
+            logger.warning(f"未知命令: {command}")
+
+    def _attach_devices(self, devices) -> None:
+        devices = devices or {}
+        self.keyboard.hid_keyboard = devices.get('keyboard')
+        self.mouse.hid_mouse_absolute = devices.get('mouse_absolute')
+        self.mouse.hid_mouse_relative = devices.get('mouse_relative')
+        if self.keyboard.hid_keyboard:
+            self.keyboard._reset_keyboard_state()
+        if self.mouse.hid_mouse_absolute or self.mouse.hid_mouse_relative:
+            self.mouse._reset_hid_devices()
+
+    def close(self) -> None:
+        self._stopping = True
+        self._reader.join(DOORBELL_TIMEOUT * 2)
+        self.worker.stop()
+        self._close_devices()
+        self.ring.close()
+
+
+def run_input_process(conn, ring_name: str, doorbell) -> None:
+    child_main(InputProcess, conn, ring_name, doorbell)
+
+
+class RemoteInputWorker(ChildEndpoint):
+    """界面进程中代替 InputWorker：接口相同（post / call），事件和调用发往输入进程
+
+    构造时传入的处理器留在界面进程中、不持有设备，只执行 STATE_CALLS 保持状态一致，
+    并作为输入进程转发回来的信号的发出者。
+    """
+    name = 'input'
+    target = staticmethod(run_input_process)
+    leds_changed = pyqtSignal(int)      # 被控机LED状态
+    devices_changed = pyqtSignal(dict)  # 输入进程中各HID设备是否已打开
+
+    def __init__(self, keyboard_handler, mouse_handler, parent=None):
+        super().__init__(parent)
+        self.handlers = {'keyboard': keyboard_handler, 'mouse': mouse_handler}
+        self.ring = EventRing.create()
+        self.doorbell = SPAWN.Semaphore(0)
+        self.devices = {name: False for name in INPUT_DEVICES}
+        self._state = {}  # (处理器, 方法) -> 参数，按首次调用的顺序重放
+        self.events = 0
+
+    def child_args(self) -> tuple:
+        self.ring.reset()  # 上一个输入进程未处理的事件不再发送（可能是崩溃的原因，也可能造成按键残留）
+        return self.ring.name, self.doorbell
+
+    def replay(self) -> None:
+        for (target, method), args in self._state.items():
+            self.send(('call', target, method, args, self.ring.produced()))
+
+    def device_ready(self, name: str) -> bool:
+        return self.is_connected() and self.devices.get(name, False)
+
+    def post(self, event: tuple) -> None:
+        if not self.is_connected():
+            return  # 输入进程重启中，事件丢弃
+        if self.ring.push(pack_event(event)):
+            self.doorbell.release()
+            self.events += 1
+        elif self.ring.dropped % 100 == 1:
+            logger.warning(f"输入事件缓冲区已满，已丢弃 {self.ring.dropped} 个事件")
+
+    def call(self, function, *args, wait: bool = False) -> None:
+        """在输入进程中执行处理器方法（function 必须是构造时传入的处理器的绑定方法）"""
+        owner = getattr(function, '__self__', None)
+        target = next((name for name, handler in self.handlers.items() if handler is owner), None)
+        if target is None:
+            raise TypeError(f"输入进程只能执行键盘、鼠标处理器的方法: {function}")
+        method = function.__name__
+        if method in STATE_CALLS:
+            mirror = STATE_MIRRORS.get(method)
+            if mirror is not None:
+                mirror(owner, *args)
+            else:
+                function(*args)
+            self._state[(target, method)] = args
+        self.send(('call', target, method, args, self.ring.produced()), wait=wait)
+
+    def reopen(self) -> None:
+        """输入进程关闭并重新打开HID设备（USB主机重新连接后）"""
+        self.send(('reopen',))
+
+    def handle_message(self, message: tuple) -> None:
+        kind = message[0]
+        if kind == 'signal':
+            _, target, name, args = message
+            getattr(self.handlers[target], name).emit(*args)
+        elif kind == 'leds':
+            self.leds_changed.emit(message[1])
+        elif kind == 'devices':
+            self.devices = message[1]
+            self.devices_changed.emit(self.devices)
+        else:
+            super().handle_message(message)
+
+    def on_exited(self) -> None:
+        super().on_exited()
+        self.devices = {name: False for name in INPUT_DEVICES}
+
+    def close(self) -> None:
+        self.ring.close()
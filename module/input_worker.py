@@ -0,0 +1,163 @@
+"""输入处理线程：键盘、鼠标处理器在独立的 QThread 事件循环中运行
+
+GUI线程只从Qt事件中取出紧凑的元组（键值、文本、坐标、触点等）并投递到工作线程，
+取景器重绘、状态栏更新和模态对话框（VideoHandler.alert 等）不会再推迟HID报告的发送。
+处理器的状态只在工作线程中修改：其他线程通过 call() 把操作排入同一个队列，
+与事件保持先后顺序；需要等待结果时使用 call(..., wait=True)。
+
+需要GUI线程完成的动作（光标回中、状态栏、本地预测光标）由处理器以信号发回。
+"""
+import struct
+import logging
+from typing import Callable
+
+from PyQt5.QtCore import QEvent, QObject, QThread, Qt, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 事件元组的第一个元素
+KEY = 0            # (KEY, qt_key, text, is_press, auto_repeat)
+MOUSE_PRESS = 1    # (MOUSE_PRESS, button, x, y)
+MOUSE_RELEASE = 2  # (MOUSE_RELEASE, button, x, y)
+MOUSE_MOVE = 3     # (MOUSE_MOVE, x, y, force)
+WHEEL = 4          # (WHEEL, angle_x, angle_y)
+RECENTER = 5       # (RECENTER, x, y)  GUI线程已把光标移回中心（相对模式）
+TOUCH_MOVE = 6     # (TOUCH_MOVE, ident, x, y)  触点按下或移动（窗口坐标）
+TOUCH_UP = 7       # (TOUCH_UP, ident)
+TOUCH_FRAME = 8    # (TOUCH_FRAME,)  一个触摸事件的触点都已投递，合并为一个报告
+TOUCH_CANCEL = 9   # (TOUCH_CANCEL,)
+TOUCH_KINDS = (TOUCH_MOVE, TOUCH_UP, TOUCH_FRAME, TOUCH_CANCEL)
+
+# 多进程模式下事件元组在共享内存中的定长记录（module.shm_ring.EventRing）：
+# 类型、标志位、三个整数参数、按键文本（UTF-8）
+EVENT_RECORD = struct.Struct('<BBxxiii16s')
+FLAG_PRESS = 1
+FLAG_AUTO_REPEAT = 2
+FLAG_FORCE = 4
+
+
+def key_tuple(event, is_press: bool) -> tuple:
+    return KEY, event.key(), event.text(), is_press, event.isAutoRepeat()
+
+
+def mouse_tuple(kind: int, event) -> tuple:
+    pos = event.pos()
+    if kind == MOUSE_MOVE:
+        return MOUSE_MOVE, pos.x(), pos.y(), False
+    return kind, int(event.button()), pos.x(), pos.y()
+
+
+def wheel_tuple(event) -> tuple:
+    angle = event.angleDelta()
+    return WHEEL, angle.x(), angle.y()
+
+
+def touch_tuples(event) -> list:
+    """QTouchEvent -> 触控事件元组，以 TOUCH_FRAME 结束（触控不经过多进程的事件缓冲区）"""
+    if event.type() == QEvent.TouchCancel:
+        return [(TOUCH_CANCEL,)]
+    events = []
+    for point in event.touchPoints():
+        state = point.state()
+        if state == Qt.TouchPointReleased:
+            events.append((TOUCH_UP, point.id()))
+        elif state != Qt.TouchPointStationary:
+            pos = point.pos()
+            events.append((TOUCH_MOVE, point.id(), round(pos.x()), round(pos.y())))
+    events.append((TOUCH_FRAME,))
+    return events
+
+
+def pack_event(event: tuple) -> bytes:
+    kind = event[0]
+    if kind == KEY:
+        flags = (FLAG_PRESS if event[3] else 0) | (FLAG_AUTO_REPEAT if event[4] else 0)
+        return EVENT_RECORD.pack(kind, flags, event[1], 0, 0, event[2].encode('utf-8')[:16])
+    if kind == MOUSE_MOVE:
+        return EVENT_RECORD.pack(kind, FLAG_FORCE if event[3] else 0, event[1], event[2], 0, b'')
+    values = tuple(event[1:]) + (0,) * (4 - len(event))
+    return EVENT_RECORD.pack(kind, 0, *values, b'')
+
+
+def unpack_event(record: bytes) -> tuple:
+    kind, flags, a, b, c, text = EVENT_RECORD.unpack(record)
+    if kind == KEY:
+        return KEY, a, text.rstrip(b'\0').decode('utf-8', 'ignore'), bool(flags & FLAG_PRESS), \
+            bool(flags & FLAG_AUTO_REPEAT)
+    if kind == MOUSE_MOVE:
+        return MOUSE_MOVE, a, b, bool(flags & FLAG_FORCE)
+    if kind in (MOUSE_PRESS, MOUSE_RELEASE):
+        return kind, a, b, c
+    return kind, a, b
+
+
+class InputWorker(QObject):
+    """持有键盘、鼠标（以及媒体键、触控）处理器的工作线程"""
+    _event = pyqtSignal(tuple)
+    _call = pyqtSignal(object)
+    _call_blocking = pyqtSignal(object)
+
+    def __init__(self, keyboard_handler, mouse_handler, consumer_handler=None, touch_handler=None):
+        super().__init__()
+        self.keyboard = keyboard_handler
+        self.mouse = mouse_handler
+        self.consumer = consumer_handler  # 媒体键只经过 call()，不使用事件元组
+        self.touch = touch_handler        # 与鼠标共用坐标映射（mouse.mapper），只在本线程中更新
+        self.thread = QThread()
+        self.thread.setObjectName("hid-input")
+        for obj in (self, keyboard_handler, mouse_handler, consumer_handler, touch_handler):
+            if obj is not None:
+                obj.moveToThread(self.thread)
+        # 接收者在工作线程中，跨线程发射时自动排队
+        self._event.connect(self._dispatch)
+        self._call.connect(self._run)
+        self._call_blocking.connect(self._run, Qt.BlockingQueuedConnection)
+        self.events = 0
+
+    def start(self) -> None:
+        self.thread.start(QThread.HighestPriority)
+        logger.info("输入处理线程已启动")
+
+    def stop(self) -> None:
+        self.thread.quit()
+        if not self.thread.wait(2000):
+            logger.warning("输入处理线程未能在2秒内退出")
+
+    def post(self, event: tuple) -> None:
+        """投递一个事件元组（任意线程）"""
+        self._event.emit(event)
+
+    def call(self, function: Callable, *args, wait: bool = False) -> None:
+        """在工作线程中执行 function(*args)，与已投递的事件保持顺序；wait=True 时阻塞到执行完毕"""
+        if not wait:
+            self._call.emit((function, args))
+        elif QThread.currentThread() is self.thread or not self.thread.isRunning():
+            function(*args)
+        else:
+            self._call_blocking.emit((function, args))
+
+    def _run(self, item) -> None:
+        function, args = item
+        try:
+            function(*args)
+        except Exception as e:
+            logger.error(f"输入线程执行 {getattr(function, '__name__', function)} 失败: {e}")
+
+    def _dispatch(self, event: tuple) -> None:
+        self.events += 1
+        kind = event[0]
+        mouse = self.mouse
+        if kind == MOUSE_MOVE:
+            mouse.move(event[1], event[2], event[3])
+        elif kind == KEY:
+            self.keyboard.handle_key(event[1], event[2], event[3], event[4])
+        elif kind == MOUSE_PRESS:
+            mouse.press(event[1], event[2], event[3])
+        elif kind == MOUSE_RELEASE:
+            mouse.release(event[1], event[2], event[3])
+        elif kind == WHEEL:
+            mouse.wheel(event[1], event[2])
+        elif kind == RECENTER:
+            mouse.recenter(event[1], event[2])
+        elif kind in TOUCH_KINDS and self.touch is not None:
+            self.touch.handle_event(event)
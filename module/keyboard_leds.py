@@ -0,0 +1,73 @@
+import os
+import logging
+
+from PyQt5.QtCore import QObject, QSocketNotifier, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# LED输出报告位定义（与 module/usb_gadget.py 中键盘描述符的 LED Usage 顺序一致）
+LED_NUM_LOCK = 0x01
+LED_CAPS_LOCK = 0x02
+LED_SCROLL_LOCK = 0x04
+
+
+class KeyboardLedReader(QObject):
+    """读取被控机发给键盘端点的LED输出报告（Num/Caps/Scroll Lock）
+
+    复用已打开的键盘文件描述符，只在事件循环poll到可读时才读取，
+    不修改文件的阻塞模式，因此不影响同一描述符上的写入。
+    """
+    leds_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.leds = 0
+        self._fd = None
+        self._notifier = None
+
+    def attach(self, hid_keyboard) -> None:
+        """绑定到键盘HID设备（文件对象或任何提供fileno()的对象）"""
+        self.detach()
+        if not hid_keyboard:
+            return
+        try:
+            self._fd = hid_keyboard.fileno()
+        except (AttributeError, OSError, ValueError) as e:
+            logger.warning(f"无法获取键盘设备描述符，LED状态不可用: {e}")
+            return
+        self._notifier = QSocketNotifier(self._fd, QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._on_readable)
+
+    def detach(self) -> None:
+        if self._notifier:
+            self._notifier.setEnabled(False)
+            self._notifier.deleteLater()
+            self._notifier = None
+        self._fd = None
+
+    def _on_readable(self, _fd):
+        try:
+            data = os.read(self._fd, 8)  # poll已报告可读，不会阻塞
+        except OSError as e:
+            logger.error(f"读取键盘LED报告失败: {e}")
+            self.detach()  # 端点失效，等待热插拔恢复后重新绑定
+            return
+        if not data:
+            return
+        leds = data[0]
+        if leds != self.leds:
+            self.leds = leds
+            logger.debug(f"被控机LED状态: {leds:#04x}")
+            self.leds_changed.emit(leds)
+
+    @property
+    def num_lock(self) -> bool:
+        return bool(self.leds & LED_NUM_LOCK)
+
+    @property
+    def caps_lock(self) -> bool:
+        return bool(self.leds & LED_CAPS_LOCK)
+
+    @property
+    def scroll_lock(self) -> bool:
+        return bool(self.leds & LED_SCROLL_LOCK)
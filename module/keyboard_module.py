@@ -1,17 +1,31 @@
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QTimer
 from PyQt5.QtGui import QKeyEvent
-import struct
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import time
 import logging
 from typing import Optional, List, Tuple
 
+from module.hid_reports import KeyboardReport, KEYBOARD_REPORT
 from module.us_keyboard_mappings import US_MAPPINGS
 from module.uk_keyboard_mappings import UK_MAPPINGS
 from .key_names import MODIFIER_NAMES, SPECIAL_KEYS
 
+EMPTY_REPORT = bytes(KEYBOARD_REPORT.size)
+PASTE_REPORT_INTERVAL = 0.025  # 粘贴时相邻报告的间隔（按下25ms后释放，约20字符/秒）
+SHORTCUT_HOLD_TIME = 0.1       # 快捷键按住时间
+SHORTCUT_GAP_TIME = 0.2        # 快捷键松开后，下一个排队报告（快捷键、粘贴）之前的间隔
+CHARACTER_HOLD_TIME = 0.05     # send_character 按住时间
+
+# 按键重复策略：按住时本地的自动重复事件一律不转发
+REPEAT_TARGET = 'target'  # 报告保持按下状态，由被控机系统自行重复（默认）
+REPEAT_HOST = 'host'      # 被控机不重复（部分BIOS/引导程序）时，由本程序按设定的延迟和速率发送 松开+按下
+REPEAT_MODES = (REPEAT_TARGET, REPEAT_HOST)
+
 class KeyboardHandler(QObject):
     key_event = pyqtSignal(QKeyEvent, bool)  # True for press, False for release
+    transport_lost = pyqtSignal()  # USB主机断开（ESHUTDOWN）时发出
+    key_status_changed = pyqtSignal(str)  # 按键状态文本（在输入线程中处理时由主窗口显示）
+    text_sent = pyqtSignal(int)           # send_text 完成，参数为已发送字符数
 
     def __init__(self, hid_keyboard):
         super().__init__()
@@ -19,17 +33,52 @@ class KeyboardHandler(QObject):
         self.current_layout = 'US'  # 默认US布局
         self.current_modifiers = 0  # 跟踪当前按下的修饰键
         self.current_mappings = US_MAPPINGS  # 默认使用US映射
-        self.pressed_keys = OrderedDict()  # 跟踪当前按下的普通键
+        self.pressed_keys = OrderedDict()  # 跟踪当前按下的普通键（Qt键值 -> 键码，与报告槽位同步）
+        self.caps_lock = False  # 被控机Caps Lock状态（来自LED输出报告）
+        self.paste_interval = PASTE_REPORT_INTERVAL  # 可按被控机配置调整
+        # 需要间隔的报告序列（粘贴、快捷键、主机端重复）：(报告, 之后的间隔秒数, 完成的粘贴字符数)，
+        # 由单次定时器逐个发送，两个报告之间输入线程照常处理排队的鼠标、键盘事件
+        self._sequence = deque()
+        self._sequence_ready = 0.0  # 上一个报告的间隔结束时间（time.monotonic）
+        self._sequence_timer = QTimer(self)
+        self._sequence_timer.setSingleShot(True)
+        self._sequence_timer.setTimerType(Qt.PreciseTimer)
+        self._sequence_timer.timeout.connect(self._send_next_report)
+        self._paste_sent = 0
+        self._paste_remaining = 0  # 已排队、尚未发送完的粘贴字符数
         self.logger = logging.getLogger(__name__)
+        self._report = KeyboardReport()  # 复用的报告缓冲区，键码槽位随 pressed_keys 更新
+        self.repeat_mode = REPEAT_TARGET
+        self.repeat_delay_ms = 500
+        self.repeat_interval_ms = 33
+        self.repeats_suppressed = 0  # 被忽略的本地自动重复事件数
+        self._repeat_key = None      # 主机端重复时正在重复的键
+        self._repeat_timer = QTimer(self)
+        self._repeat_timer.timeout.connect(self._send_repeat)
         self._reset_hid_device()
 
     def _reset_keyboard_state(self):
         """重置键盘状态"""
         self.current_modifiers = 0
         self.pressed_keys.clear()
+        self._report.clear()
+        self._stop_repeat()
+        self._clear_sequence()  # 设备已更换，未发送的粘贴内容丢弃
         self._reset_hid_device()
+        self.key_status_changed.emit("")
         self.logger.info("键盘状态已完全重置")
 
+    def release_held_keys(self) -> None:
+        """释放本地按住的键（窗口失去焦点后收不到松开事件）；排队的粘贴、快捷键照常发送"""
+        if not self.pressed_keys and not self.current_modifiers:
+            return
+        self.current_modifiers = 0
+        self.pressed_keys.clear()
+        self._report.clear()
+        self._stop_repeat()
+        self._reset_hid_device()
+        self.key_status_changed.emit("")
+
     def set_keyboard_layout(self, layout: str) -> None:
         """设置键盘布局"""
         if layout == 'US':
@@ -45,6 +94,25 @@ class KeyboardHandler(QObject):
         self.logger.info(f"键盘布局已切换为: {layout}")
         self._reset_keyboard_state()
 
+    def set_repeat_policy(self, mode: str, delay_ms: int = 500, rate_hz: float = 30.0) -> None:
+        """设置按键重复策略（REPEAT_TARGET / REPEAT_HOST），延迟和速率只在主机端重复时使用"""
+        if mode not in REPEAT_MODES:
+            self.logger.warning(f"不支持的按键重复策略: {mode}")
+            return
+        self.repeat_mode = mode
+        self.repeat_delay_ms = max(0, int(delay_ms))
+        self.repeat_interval_ms = max(1, round(1000 / max(rate_hz, 1.0)))
+        self._stop_repeat()
+        self.logger.info(f"按键重复策略: {mode}（延迟 {self.repeat_delay_ms}ms，间隔 {self.repeat_interval_ms}ms）")
+
+    def set_paste_interval(self, interval: float) -> None:
+        """设置粘贴时相邻HID报告的间隔（秒）"""
+        self.paste_interval = max(0.0, float(interval))
+
+    def set_caps_lock(self, enabled: bool) -> None:
+        """被控机Caps Lock状态（键盘LED输出报告）"""
+        self.caps_lock = enabled
+
     def get_current_layout(self) -> str:
         """获取当前布局"""
         return self.current_layout
@@ -57,38 +125,88 @@ class KeyboardHandler(QObject):
         """重置HID设备"""
         try:
             if self.hid_keyboard:
-                empty_report = struct.pack('BBBBBBBB', 0, 0, 0, 0, 0, 0, 0, 0)
-                self._send_report(empty_report)
+                self._send_report(EMPTY_REPORT)  # 键码槽位不变，下一个报告重新带上仍按住的键
                 self.logger.debug("HID设备已重置")
         except Exception as e:
             self.logger.error(f"重置HID设备失败: {e}")
 
+    def _queue_reports(self, steps) -> None:
+        """把 (报告, 之后的间隔秒数, 完成的粘贴字符数) 排入发送序列"""
+        self._sequence.extend(steps)
+        if self._sequence and not self._sequence_timer.isActive():
+            wait = self._sequence_ready - time.monotonic()
+            self._sequence_timer.start(max(0, round(wait * 1000)))
+
+    def _send_next_report(self) -> None:
+        if not self._sequence:
+            return
+        report, delay, chars = self._sequence.popleft()
+        if not self._send_report(report):
+            self._clear_sequence()  # 写入失败（设备未打开、传输断开），剩余内容不再发送
+            return
+        self._sequence_ready = time.monotonic() + delay
+        if chars:
+            self._paste_sent += chars
+            self._paste_remaining -= chars
+            if not self._paste_remaining:
+                self._finish_paste()
+        if self._sequence:
+            self._sequence_timer.start(round(delay * 1000))
+
+    def _clear_sequence(self) -> None:
+        self._sequence.clear()
+        self._sequence_timer.stop()
+        if self._paste_remaining:
+            self._paste_remaining = 0
+            self._finish_paste()
+
+    def _finish_paste(self) -> None:
+        self.text_sent.emit(self._paste_sent)
+        self._paste_sent = 0
+
+    def has_pending_reports(self) -> bool:
+        """是否还有排队未发送的报告"""
+        return bool(self._sequence)
+
     def _send_report(self, report: bytes) -> bool:
         """发送HID报告"""
         try:
             if self.hid_keyboard:
                 self.hid_keyboard.write(report)
                 self.hid_keyboard.flush()
-                self.logger.debug(f"HID报告已发送: {report.hex()}")
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("HID报告已发送: %s", report.hex())
                 return True
         except Exception as e:
             self.logger.error(f"发送HID报告失败: {e}")
+            if getattr(e, 'errno', None) == 108:  # Cannot send after transport endpoint shutdown
+                self.transport_lost.emit()
         return False
 
     def handle_key_event(self, event: QKeyEvent, is_press: bool) -> None:
         """处理键盘事件并发送HID报告"""
+        self.handle_key(event.key(), event.text(), is_press, event.isAutoRepeat())
+
+    def handle_key(self, key: int, text: str, is_press: bool, auto_repeat: bool = False) -> None:
+        """处理从Qt事件中取出的键值和文本（输入线程的入口）"""
         if not self.hid_keyboard:
             return
+        if auto_repeat:
+            # 本地自动重复（按下/松开成对到达）：键仍留在 pressed_keys 中，不发送报告
+            self.repeats_suppressed += 1
+            return
         try:
-            key = event.key()
             if key in self.current_mappings['modifiers']:
                 self._handle_modifier_key(key, is_press)
             else:
-                self._handle_regular_key(event, is_press)
+                self._handle_regular_key(key, text, is_press)
+                if self.repeat_mode == REPEAT_HOST:
+                    self._update_repeat(key, is_press)
             self.send_hid_report()
         except Exception as e:
             self.logger.error(f"处理键盘事件时出错: {e}")
             self._reset_hid_device()
+        self.key_status_changed.emit(self.get_key_status())
 
     def _handle_modifier_key(self, key: int, is_press: bool) -> None:
         """处理修饰键"""
@@ -97,41 +215,61 @@ class KeyboardHandler(QObject):
         else:
             self.current_modifiers &= ~self.current_mappings['modifiers'][key]
 
-    def _handle_regular_key(self, event: QKeyEvent, is_press: bool) -> None:
-        """处理普通键"""
-        key = event.key()
-        text = event.text()
+    def _handle_regular_key(self, key: int, text: str, is_press: bool) -> None:
+        """处理普通键，同时更新报告的键码槽位"""
+        pressed_keys = self.pressed_keys
         if is_press:
             key_code = self._get_key_mapping(key) or self.current_mappings['shift_chars'].get(text)
-            if key_code:
-                self.pressed_keys[key] = key_code
-                self.logger.debug(f"Key {key} ({text}) pressed. Pressed keys: {list(self.pressed_keys.keys())}")
+            if not key_code or key in pressed_keys:
+                return
+            if not self._report.press(key_code):
+                self.logger.warning(f"已有6个按键按下，忽略按键 {key}")
+                return
+            pressed_keys[key] = key_code
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Key %s (%s) pressed. Pressed keys: %s", key, text, list(pressed_keys))
         else:
-            if key in self.pressed_keys:
-                del self.pressed_keys[key]
-                self.logger.debug(f"Key {key} ({text}) released. Remaining keys: {list(self.pressed_keys.keys())}")
+            key_code = pressed_keys.pop(key, None)
+            if key_code is not None:
+                self._report.release(key_code)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Key %s (%s) released. Remaining keys: %s", key, text, list(pressed_keys))
+
+    def _update_repeat(self, key: int, is_press: bool) -> None:
+        """主机端重复：只重复最后按下的键，松开它或按下其他键时重新计时"""
+        if is_press and key in self.pressed_keys:
+            self._repeat_key = key
+            self._repeat_timer.start(self.repeat_delay_ms)
+        elif not is_press and key == self._repeat_key:
+            self._stop_repeat()
+
+    def _stop_repeat(self) -> None:
+        self._repeat_key = None
+        self._repeat_timer.stop()
+
+    def _send_repeat(self) -> None:
+        key = self._repeat_key
+        if key not in self.pressed_keys or not self.hid_keyboard:
+            self._stop_repeat()
+            return
+        if self._repeat_timer.interval() != self.repeat_interval_ms:
+            self._repeat_timer.setInterval(self.repeat_interval_ms)
+        others = [code for pressed, code in self.pressed_keys.items() if pressed != key]
+        released = KeyboardReport.pack(self.current_modifiers, others)
+        pressed = KeyboardReport.pack(self.current_modifiers, self.pressed_keys.values())
+        self._queue_reports([(released, 0.0, 0), (pressed, 0.0, 0)])
 
     def send_hid_report(self) -> None:
         """发送HID报告"""
-        self.logger.debug(f"Sending HID report. Modifiers: {bin(self.current_modifiers)}, Keys: {list(self.pressed_keys.values())}")
-
         if not self.hid_keyboard:
             return
         try:
-            if len(self.pressed_keys) > 6:
-                self.logger.warning("检测到超过6个按键，执行重置")
-                self._reset_hid_device()
-                return
-
-            keys = list(self.pressed_keys.values())[:6]  # 获取当前按下的普通键的键码，最多6个
-            keys.extend([0] * (6 - len(keys)))  # 如果按键数量不足6个，则用0填充
-            report = struct.pack('BBBBBBBB', self.current_modifiers, 0, *keys)
-
-            if any(k > 0xFF for k in keys) or self.current_modifiers > 0xFF:
+            if self.current_modifiers > 0xFF:
                 self.logger.warning("检测到无效的键值，执行重置")
                 self._reset_hid_device()
                 return
-            self._send_report(report)
+            # 键码槽位已在按下/松开时更新，这里只写入修饰键字节
+            self._send_report(self._report.build(self.current_modifiers))
         except Exception as e:
             self.logger.error(f"发送HID报告失败: {e}")
             self._reset_hid_device()
@@ -237,10 +375,7 @@ class KeyboardHandler(QObject):
             return
 
         try:
-            keys = key_codes[:6]
-            keys.extend([0] * (6 - len(keys)))
-            report = struct.pack('BBBBBBBB', modifier, 0, *keys)
-            self._send_report(report)
+            self._send_report(KeyboardReport.pack(modifier, key_codes))
         except Exception as e:
             self.logger.error(f"发送原始HID报告失败: {e}")
 
@@ -249,30 +384,53 @@ class KeyboardHandler(QObject):
         try:
             report = self._create_char_report(char)
             if report:
-                self._send_report(report)
-                time.sleep(0.05)
-                self.release_keys()
+                self._queue_reports([(report, CHARACTER_HOLD_TIME, 0), (EMPTY_REPORT, 0.0, 0)])
         except Exception as e:
             self.logger.error(f"发送字符'{char}'失败: {e}")
 
     def _create_char_report(self, char: str) -> Optional[bytes]:
         """创建字符报告"""
         if char in self.current_mappings['shift_chars']:
-            return struct.pack('BBBBBBBB', 0x02, 0, 
-                             self.current_mappings['shift_chars'][char], 0, 0, 0, 0, 0)
+            modifier, key_code = 0x02, self.current_mappings['shift_chars'][char]
         elif char in self.current_mappings['chars']:
-            return struct.pack('BBBBBBBB', 0x00, 0, 
-                             self.current_mappings['chars'][char], 0, 0, 0, 0, 0)
-        return None
+            modifier, key_code = 0x00, self.current_mappings['chars'][char]
+        elif char.isupper() and char.lower() in self.current_mappings['chars']:
+            modifier, key_code = 0x02, self.current_mappings['chars'][char.lower()]
+        else:
+            return None
+        # 被控机Caps Lock打开时反转字母的Shift，避免输入大小写颠倒的文本
+        if self.caps_lock and char.isalpha():
+            modifier ^= 0x02
+        return KEYBOARD_REPORT.pack(modifier, 0, key_code, 0, 0, 0, 0, 0)  # 粘贴序列需要独立的bytes
+
+    def send_text(self, text: str) -> int:
+        """发送一段文本，返回排入发送队列的字符数
+
+        字符的按下/释放报告逐个由定时器按 paste_interval 发送，长文本粘贴期间
+        鼠标、键盘事件仍能及时发送；全部发送完（或写入失败）后发出 text_sent。
+        """
+        steps = []
+        for char in text:
+            report = self._create_char_report(char)
+            if report:
+                steps.append((report, self.paste_interval, 0))
+                steps.append((EMPTY_REPORT, self.paste_interval, 1))
+            else:
+                self.logger.warning(f"无法映射字符: {char!r}")
+        count = len(steps) // 2
+        if not count:
+            if not self._paste_remaining:
+                self.text_sent.emit(0)
+            return 0
+        self._paste_remaining += count
+        self._queue_reports(steps)
+        return count
 
     def release_keys(self) -> None:
         """释放所有按键"""
-        empty_report = struct.pack('BBBBBBBB', 0, 0, 0, 0, 0, 0, 0, 0)
-        self._send_report(empty_report)
+        self._send_report(EMPTY_REPORT)
 
     def _send_shortcut_sequence(self, modifier: int, key_codes: List[int]) -> None:
         """发送快捷键序列"""
-        self.send_hid_report_raw(modifier, key_codes)
-        time.sleep(0.1)
-        self.send_hid_report_raw(0, [])
-        time.sleep(0.2)
\ No newline at end of file
+        press_report = KeyboardReport.pack(modifier, key_codes)
+        self._queue_reports([(press_report, SHORTCUT_HOLD_TIME, 0), (EMPTY_REPORT, SHORTCUT_GAP_TIME, 0)])
@@ -0,0 +1,308 @@
+import sys
+import time
+import bisect
+import json
+import random
+import logging
+import statistics
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtMultimedia import QVideoFrame, QAbstractVideoBuffer
+
+from module.hid_reports import ABSOLUTE_REPORT, ABSOLUTE_MAX as HID_MAX
+from module.coordinate_mapping import CoordinateMapper, FULL_REGION
+from module.color_convert import planes
+
+# QVideoFrame 像素格式 -> module.color_convert 的格式名
+YUV_FORMATS = {QVideoFrame.Format_YUYV: 'yuyv', QVideoFrame.Format_UYVY: 'uyvy',
+               QVideoFrame.Format_NV12: 'nv12', QVideoFrame.Format_NV21: 'nv21'}
+
+logger = logging.getLogger(__name__)
+
+
+def frame_to_gray(frame: QVideoFrame, region: Optional[Tuple[int, int, int, int]] = None
+                  ) -> Optional[np.ndarray]:
+    """从QVideoFrame中取出亮度平面（拷贝），不支持的格式返回None
+
+    region=(x0, y0, x1, y1) 时只拷贝该区域（帧坐标）。
+    """
+    if not frame.map(QAbstractVideoBuffer.ReadOnly):
+        return None
+    try:
+        width, height = frame.width(), frame.height()
+        stride = frame.bytesPerLine()
+        bits = frame.bits()
+        bits.setsize(frame.mappedBytes())
+        data = np.frombuffer(bits, dtype=np.uint8)
+        pixel_format = frame.pixelFormat()
+        if pixel_format in YUV_FORMATS:
+            stride = frame.bytesPerLine(0) if frame.planeCount() > 1 else stride
+            luma = planes(data, YUV_FORMATS[pixel_format], width, height, stride)[0]
+        elif pixel_format in (QVideoFrame.Format_YUV420P, QVideoFrame.Format_YV12):
+            stride = frame.bytesPerLine(0) if frame.planeCount() > 1 else stride
+            luma = data[:stride * height].reshape(height, stride)[:, :width]
+        elif pixel_format in (QVideoFrame.Format_RGB32, QVideoFrame.Format_ARGB32, QVideoFrame.Format_BGR32):
+            luma = data[:stride * height].reshape(height, stride // 4, 4)[:, :width, 1]  # 绿色通道近似亮度
+        else:
+            return None
+        if region is not None:
+            x0, y0, x1, y1 = region
+            luma = luma[y0:y1, x0:x1]
+        return luma.copy()
+    finally:
+        frame.unmap()
+
+
+def count_changed(gray: np.ndarray, baseline: np.ndarray, pixel_threshold: int) -> int:
+    """区域内变化超过阈值的像素数（向量化）"""
+    diff = np.abs(gray.astype(np.int16) - baseline.astype(np.int16))
+    return int(np.count_nonzero(diff > pixel_threshold))
+
+
+def summarize(samples: List[float], timeouts: int) -> dict:
+    if not samples:
+        return {'count': 0, 'timeouts': timeouts}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+    return {
+        'count': len(samples),
+        'timeouts': timeouts,
+        'min_ms': round(ordered[0], 2),
+        'p50_ms': round(pct(50), 2),
+        'p90_ms': round(pct(90), 2),
+        'p95_ms': round(pct(95), 2),
+        'max_ms': round(ordered[-1], 2),
+        'mean_ms': round(statistics.fmean(samples), 2),
+        'stdev_ms': round(statistics.pstdev(samples), 2),
+        'samples_ms': [round(s, 2) for s in samples],
+    }
+
+
+class CornerCursorStimulus:
+    """把绝对鼠标在画面中心和两个角之间移动，检测角落区域出现光标
+
+    TARGETS/PARK 是画面中的比例位置；target_region 为当前配置的被控机目标区域（多显示器），
+    与鼠标映射使用同一个 CoordinateMapper 换算为HID坐标，保证光标落在被采集的显示器上。
+    """
+    TARGETS = [(0.05, 0.05), (0.90, 0.88)]
+    PARK = (0.5, 0.5)
+
+    def __init__(self, write_report: Callable[[bytes], object], roi_size: float = 0.04,
+                 target_region: Sequence[float] = FULL_REGION):
+        self.write_report = write_report
+        self.roi_size = roi_size
+        # 以HID坐标范围作为“取景器”，画面比例乘以 HID_MAX 即为映射前的坐标
+        self.mapper = CoordinateMapper()
+        self.mapper.update_viewport(HID_MAX, HID_MAX, 0, 0)
+        self.mapper.set_target_region(target_region)
+
+    def _move(self, fx, fy):
+        x, y = self.mapper.map(int(fx * HID_MAX), int(fy * HID_MAX))
+        self.write_report(ABSOLUTE_REPORT.pack(0, x, y, 0, 0))
+
+    def park(self, trial: int) -> None:
+        self._move(*self.PARK)
+
+    def roi(self, trial: int) -> Tuple[float, float, float, float]:
+        fx, fy = self.TARGETS[trial % len(self.TARGETS)]
+        return fx, fy, self.roi_size, self.roi_size * 1.5  # 光标热点在左上，区域向右下延伸
+
+    def fire(self, trial: int) -> None:
+        self._move(*self.TARGETS[trial % len(self.TARGETS)])
+
+
+class LatencyProbe(QObject):
+    """回环延迟自检：注入HID动作，在采集帧中检测对应的画面变化
+
+    测得的是从HID报告写出到包含变化的帧到达本程序的时间，
+    即 HID传输 + 被控机响应 + 显示输出 + 采集卡 + 解码 的总和。
+    """
+    finished = pyqtSignal(dict)
+    progress = pyqtSignal(int, int)  # 已完成次数, 总次数
+
+    def __init__(self, stimulus, trials: int = 20, settle_ms: float = 300,
+                 timeout_ms: float = 1500, pixel_threshold: int = 40, min_pixels: int = 12, parent=None):
+        super().__init__(parent)
+        self.stimulus = stimulus
+        self.trials = trials
+        self.settle = settle_ms / 1000.0
+        self.timeout = timeout_ms / 1000.0
+        self.pixel_threshold = pixel_threshold
+        self.min_pixels = min_pixels
+        self.running = False
+        # 采集停顿或断开时没有帧到达，由看门狗计为超时并推进
+        self._watchdog = QTimer(self)
+        self._watchdog.setSingleShot(True)
+        self._watchdog.timeout.connect(self._on_watchdog)
+        self._reset_state()
+
+    def _reset_state(self):
+        self.samples: List[float] = []
+        self.timeouts = 0
+        self._trial = 0
+        self._state = 'idle'
+        self._state_time = 0.0
+        self._baseline = None
+        self._fire_time = 0.0
+
+    def start(self) -> None:
+        self._reset_state()
+        self.running = True
+        self._park()
+
+    def stop(self) -> None:
+        self._watchdog.stop()
+        if self.running:
+            self.running = False
+            self.stimulus.park(0)
+            self.finished.emit(summarize(self.samples, self.timeouts))
+
+    def _park(self):
+        self.stimulus.park(self._trial)
+        self._state = 'settle'
+        self._state_time = time.perf_counter()
+        self._baseline = None
+        self._arm_watchdog(self._settle_time() + self.timeout)
+
+    def _settle_time(self) -> float:
+        # 等待时间至少为上次测得延迟的两倍，确保基线帧已反映光标归位
+        return max(self.settle, 2 * self.samples[-1] / 1000.0) if self.samples else self.settle
+
+    def _arm_watchdog(self, seconds: float) -> None:
+        self._watchdog.start(int(seconds * 1000) + 1)
+
+    def _on_watchdog(self) -> None:
+        if not self.running:
+            return
+        self.timeouts += 1
+        if self._state == 'settle':
+            # 基线帧都没有到达：采集已停止，不再继续
+            logger.warning("延迟自检期间没有收到采集帧，已停止")
+            return self.stop()
+        logger.warning(f"延迟自检第 {self._trial + 1} 次超时（没有新帧）")
+        self._next_trial()
+
+    def _roi_slice(self, gray):
+        height, width = gray.shape
+        fx, fy, fw, fh = self.stimulus.roi(self._trial)
+        x0, y0 = int(fx * width), int(fy * height)
+        x1, y1 = min(width, x0 + max(4, int(fw * width))), min(height, y0 + max(4, int(fh * height)))
+        return gray[y0:y1, x0:x1]
+
+    def on_video_frame(self, frame: QVideoFrame) -> None:
+        if not self.running:
+            return
+        gray = frame_to_gray(frame)
+        if gray is None:
+            logger.error("不支持的帧格式，无法进行延迟自检")
+            return self.stop()
+        self.feed_gray(gray, time.perf_counter())
+
+    def feed_gray(self, gray: np.ndarray, timestamp: float) -> None:
+        """处理一帧亮度图像（真实采集或模拟回环均由此进入）"""
+        if not self.running:
+            return
+        if self._state == 'settle':
+            if timestamp - self._state_time >= self._settle_time():
+                self._baseline = self._roi_slice(gray).copy()
+                self._fire_time = time.perf_counter()
+                self.stimulus.fire(self._trial)
+                self._state = 'waiting'
+                self._arm_watchdog(self.timeout)
+        elif self._state == 'waiting':
+            changed = count_changed(self._roi_slice(gray), self._baseline, self.pixel_threshold)
+            if changed >= self.min_pixels:
+                self.samples.append((timestamp - self._fire_time) * 1000)
+                self._next_trial()
+            elif timestamp - self._fire_time > self.timeout:
+                self.timeouts += 1
+                logger.warning(f"延迟自检第 {self._trial + 1} 次超时")
+                self._next_trial()
+
+    def _next_trial(self):
+        self._trial += 1
+        self.progress.emit(self._trial, self.trials)
+        if self._trial >= self.trials:
+            self.stop()
+        else:
+            self._park()
+
+
+class SimulatedLoopback(QObject):
+    """模拟回环：接收绝对鼠标报告，延迟后在合成帧中绘制光标
+
+    用于在没有被控机和采集卡时验证延迟自检本身。
+    """
+
+    def __init__(self, probe: LatencyProbe, delay_ms: float = 80.0, jitter_ms: float = 10.0,
+                 fps: float = 60.0, size: Tuple[int, int] = (320, 180), parent=None):
+        super().__init__(parent)
+        self.probe = probe
+        self.delay = delay_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.width, self.height = size
+        self._events = []  # (生效时间, x, y)
+        self._cursor = (self.width // 2, self.height // 2)
+        self._frame = np.full((self.height, self.width), 50, dtype=np.uint8)
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(1000 / fps))
+        self._timer.timeout.connect(self._emit_frame)
+
+    def write(self, report) -> int:
+        _buttons, x, y, _wheel, _pan = ABSOLUTE_REPORT.unpack(bytes(report[:ABSOLUTE_REPORT.size]))
+        due = time.perf_counter() + max(0.0, random.gauss(self.delay, self.jitter))
+        bisect.insort(self._events, (due, x * self.width // (HID_MAX + 1), y * self.height // (HID_MAX + 1)))
+        return len(report)
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _emit_frame(self):
+        now = time.perf_counter()
+        while self._events and self._events[0][0] <= now:
+            _, x, y = self._events.pop(0)
+            self._cursor = (x, y)
+        self._frame.fill(50)
+        x, y = self._cursor
+        self._frame[y:y + 10, x:x + 6] = 220
+        self.probe.feed_gray(self._frame, now)
+
+
+def main(argv=None):
+    """命令行：python -m module.latency_probe --simulate [--delay-ms 80]"""
+    import argparse
+    from PyQt5.QtCore import QCoreApplication
+    parser = argparse.ArgumentParser(description="KVM回环延迟自检（模拟回环）")
+    parser.add_argument('--simulate', action='store_true', required=True)
+    parser.add_argument('--delay-ms', type=float, default=80.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--trials', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication(sys.argv[:1])
+    loopback_holder = []
+    stimulus = CornerCursorStimulus(lambda report: loopback_holder[0].write(report))
+    probe = LatencyProbe(stimulus, trials=args.trials, settle_ms=150)
+    loopback = SimulatedLoopback(probe, args.delay_ms, args.jitter_ms, args.fps)
+    loopback_holder.append(loopback)
+
+    def done(result):
+        loopback.stop()
+        print(json.dumps(result, ensure_ascii=False, indent=1))
+        app.quit()
+    probe.finished.connect(done)
+    loopback.start()
+    probe.start()
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""虚拟U盘/光驱：在运行时向 module/usb_gadget.py 创建的大容量存储功能挂载、弹出镜像
+
+- 普通和稀疏的ISO/IMG直接写入 lun.0/file，由内核读取
+- 分块压缩镜像（.kvmz，见 module.disk_image）由本进程的NBD服务解压，
+  经 nbd-client 连接为 /dev/nbdN 后再挂载；读取统计（吞吐、缓存命中率）只对这条路径有效
+
+function_dir 可以指向普通目录（含 lun.0/file、ro、cdrom 文件）作为测试替身。
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from module.disk_image import open_image, is_chunked
+from module.nbd_server import NbdServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FUNCTION_DIR = '/sys/kernel/config/usb_gadget/g1/functions/mass_storage.usb0'
+NBD_CLIENT = 'nbd-client'
+NBD_DEVICES = 16
+IMAGE_FILTER = "磁盘镜像 (*.iso *.img *.kvmz);;所有文件 (*)"
+
+
+class MassStorageController(QObject):
+    """大容量存储LUN的镜像挂载控制"""
+    attached = pyqtSignal(str)  # 镜像路径
+    detached = pyqtSignal()
+
+    def __init__(self, function_dir: str = DEFAULT_FUNCTION_DIR, lun: int = 0,
+                 nbd_client: str = NBD_CLIENT, parent=None):
+        super().__init__(parent)
+        self.lun_dir = os.path.join(function_dir, f"lun.{lun}")
+        self.nbd_client = nbd_client
+        self.image_path: Optional[str] = None
+        self.image = None          # 经NBD提供时的镜像后端
+        self.nbd_device: Optional[str] = None
+        self._server: Optional[NbdServer] = None
+
+    def is_available(self) -> bool:
+        return os.path.isdir(self.lun_dir)
+
+    def is_attached(self) -> bool:
+        return self.image_path is not None
+
+    def _write_attr(self, name: str, value: str) -> None:
+        with open(os.path.join(self.lun_dir, name), 'w') as f:
+            f.write(value + '\n')
+
+    def attach(self, path: str, cdrom: Optional[bool] = None, via_nbd: Optional[bool] = None) -> None:
+        """挂载镜像（只读）；cdrom 默认按扩展名判断，via_nbd 默认只对分块压缩镜像启用"""
+        if not self.is_available():
+            raise OSError(f"大容量存储功能不存在: {self.lun_dir}（请用新版 usb_gadget.sh 重新配置）")
+        if self.is_attached():
+            self.detach()
+        if cdrom is None:
+            cdrom = path.lower().endswith('.iso')
+        if via_nbd is None:
+            via_nbd = is_chunked(path)
+        # ro/cdrom 只能在没有介质时修改
+        self._write_attr('ro', '1')
+        self._write_attr('cdrom', '1' if cdrom else '0')
+        backing = os.path.abspath(path)
+        if via_nbd:
+            backing = self._start_nbd(path)
+        try:
+            self._write_attr('file', backing)
+        except OSError:
+            self._stop_nbd()
+            raise
+        self.image_path = path
+        logger.info(f"已挂载镜像: {path}（{'光驱' if cdrom else 'U盘'}，{backing}）")
+        self.attached.emit(path)
+
+    def _read_attr(self, name: str) -> str:
+        with open(os.path.join(self.lun_dir, name)) as f:
+            return f.read().strip()
+
+    def detach(self, force: bool = False) -> None:
+        """弹出镜像；被控机锁定介质时优先使用 forced_eject
+
+        force=True 时按LUN的 file 属性判断是否有介质，其他进程挂载的镜像也弹出。
+        """
+        if not self.is_attached():
+            if not force or not self._read_attr('file'):
+                return
+            self.image_path = self._read_attr('file')
+        if os.path.exists(os.path.join(self.lun_dir, 'forced_eject')):
+            self._write_attr('forced_eject', '1')
+        else:
+            self._write_attr('file', '')
+        self._stop_nbd()
+        logger.info(f"已弹出镜像: {self.image_path}")
+        self.image_path = None
+        self.detached.emit()
+
+    def _start_nbd(self, path: str) -> str:
+        if not os.path.exists('/sys/block/nbd0'):
+            subprocess.run(['modprobe', 'nbd'], check=False)
+        device = _free_nbd_device()
+        if device is None:
+            raise OSError("没有空闲的NBD设备")
+        self.image = open_image(path)
+        socket_path = os.path.join(tempfile.gettempdir(), f"kvm-{os.path.basename(device)}.sock")
+        self._server = NbdServer(self.image, socket_path)
+        self._server.start()
+        try:
+            subprocess.run([self.nbd_client, '-unix', socket_path, device, '-N', self._server.export_name],
+                           check=True, timeout=10, capture_output=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            self._stop_nbd()
+            raise OSError(f"nbd-client 连接失败: {e}") from e
+        self.nbd_device = device
+        return device
+
+    def _stop_nbd(self) -> None:
+        if self.nbd_device:
+            subprocess.run([self.nbd_client, '-d', self.nbd_device], check=False, timeout=10,
+                           capture_output=True)
+            self.nbd_device = None
+        if self._server:
+            self._server.stop()
+            self._server = None
+        if self.image:
+            self.image.close()
+            self.image = None
+
+    def stats(self) -> Optional[Dict[str, float]]:
+        """读取统计；直接由内核读取的镜像返回None"""
+        return self.image.stats.snapshot() if self.image else None
+
+    def stats_text(self) -> str:
+        if not self.is_attached():
+            return "未挂载镜像"
+        stats = self.stats()
+        name = os.path.basename(self.image_path)
+        if stats is None:
+            return f"{name}: 由内核直接读取，无读取统计"
+        return (f"{name}: 已读取 {stats['bytes_read'] / 1e6:.1f}MB，平均 {stats['average_mb_s']:.1f}MB/s，"
+                f"最近 {stats['recent_mb_s']:.1f}MB/s，缓存命中率 {stats['cache_hit_rate']:.0%}")
+
+
+def _free_nbd_device() -> Optional[str]:
+    for index in range(NBD_DEVICES):
+        # 已连接的NBD设备有 pid 属性
+        if os.path.exists(f"/sys/block/nbd{index}") and not os.path.exists(f"/sys/block/nbd{index}/pid"):
+            return f"/dev/nbd{index}"
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="虚拟U盘/光驱镜像挂载")
+    parser.add_argument('--function-dir', default=DEFAULT_FUNCTION_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    attach = sub.add_parser('attach', help='挂载镜像并定期输出读取统计，Ctrl+C 弹出')
+    attach.add_argument('path')
+    media = attach.add_mutually_exclusive_group()
+    media.add_argument('--cdrom', dest='cdrom', action='store_true', default=None)
+    media.add_argument('--disk', dest='cdrom', action='store_false')
+    attach.add_argument('--via-nbd', action='store_true', default=None, help='未压缩镜像也经NBD提供（可统计吞吐）')
+    attach.add_argument('--interval', type=float, default=5.0, help='统计输出间隔（秒）')
+    sub.add_parser('detach', help='弹出当前介质')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    controller = MassStorageController(args.function_dir)
+    if args.command == 'detach':
+        controller.detach(force=True)
+        return 0
+    controller.attach(args.path, cdrom=args.cdrom, via_nbd=args.via_nbd)
+    try:
+        while True:
+            time.sleep(args.interval)
+            print(controller.stats_text(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.detach()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
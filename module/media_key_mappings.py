@@ -0,0 +1,80 @@
+from PyQt5.QtCore import Qt
+
+from module.hid_reports import SYSTEM_POWER_DOWN, SYSTEM_SLEEP, SYSTEM_WAKE_UP
+
+# 报告类型
+CONSUMER = 'consumer'  # Consumer Page（0x0C）用途
+SYSTEM = 'system'      # Generic Desktop System Control 位
+
+# 命名按键（菜单、自定义快捷键中使用的名称，不区分大小写）-> (报告类型, 用途或位)
+NAMED_KEYS = {
+    'VolumeUp': (CONSUMER, 0xE9),
+    'VolumeDown': (CONSUMER, 0xEA),
+    'Mute': (CONSUMER, 0xE2),
+    'PlayPause': (CONSUMER, 0xCD),
+    'MediaStop': (CONSUMER, 0xB7),
+    'NextTrack': (CONSUMER, 0xB5),
+    'PrevTrack': (CONSUMER, 0xB6),
+    'Eject': (CONSUMER, 0xB8),
+    'BrightnessUp': (CONSUMER, 0x6F),
+    'BrightnessDown': (CONSUMER, 0x70),
+    'Calculator': (CONSUMER, 0x192),
+    'Mail': (CONSUMER, 0x18A),
+    'Browser': (CONSUMER, 0x196),
+    'BrowserHome': (CONSUMER, 0x223),
+    'BrowserBack': (CONSUMER, 0x224),
+    'BrowserForward': (CONSUMER, 0x225),
+    'BrowserRefresh': (CONSUMER, 0x227),
+    'BrowserSearch': (CONSUMER, 0x221),
+    'Power': (SYSTEM, SYSTEM_POWER_DOWN),
+    'Sleep': (SYSTEM, SYSTEM_SLEEP),
+    'WakeUp': (SYSTEM, SYSTEM_WAKE_UP),
+}
+
+# 本地媒体键 -> 命名按键
+QT_MEDIA_KEYS = {
+    Qt.Key_VolumeUp: 'VolumeUp',
+    Qt.Key_VolumeDown: 'VolumeDown',
+    Qt.Key_VolumeMute: 'Mute',
+    Qt.Key_MediaPlay: 'PlayPause',
+    Qt.Key_MediaTogglePlayPause: 'PlayPause',
+    Qt.Key_MediaPause: 'PlayPause',
+    Qt.Key_MediaStop: 'MediaStop',
+    Qt.Key_MediaNext: 'NextTrack',
+    Qt.Key_MediaPrevious: 'PrevTrack',
+    Qt.Key_Eject: 'Eject',
+    Qt.Key_MonBrightnessUp: 'BrightnessUp',
+    Qt.Key_MonBrightnessDown: 'BrightnessDown',
+    Qt.Key_Calculator: 'Calculator',
+    Qt.Key_LaunchMail: 'Mail',
+    Qt.Key_Explorer: 'Browser',
+    Qt.Key_HomePage: 'BrowserHome',
+    Qt.Key_Back: 'BrowserBack',
+    Qt.Key_Forward: 'BrowserForward',
+    Qt.Key_Refresh: 'BrowserRefresh',
+    Qt.Key_Search: 'BrowserSearch',
+    Qt.Key_PowerOff: 'Power',
+    Qt.Key_PowerDown: 'Power',
+    Qt.Key_Sleep: 'Sleep',
+    Qt.Key_Suspend: 'Sleep',
+    Qt.Key_Standby: 'Sleep',
+    Qt.Key_WakeUp: 'WakeUp',
+}
+
+# "媒体/电源"菜单（None 为分隔线）
+MENU_KEYS = [
+    ('VolumeUp', "音量+"), ('VolumeDown', "音量-"), ('Mute', "静音"),
+    None,
+    ('PlayPause', "播放/暂停"), ('MediaStop', "停止"), ('PrevTrack', "上一曲"), ('NextTrack', "下一曲"),
+    None,
+    ('BrightnessUp', "亮度+"), ('BrightnessDown', "亮度-"),
+    None,
+    ('Sleep', "睡眠"), ('WakeUp', "唤醒"), ('Power', "关机"),
+]
+
+_LOOKUP = {name.lower(): name for name in NAMED_KEYS}
+
+
+def canonical_name(name: str):
+    """不区分大小写查找命名按键，未找到时返回None"""
+    return _LOOKUP.get(name.strip().lower())
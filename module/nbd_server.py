@@ -0,0 +1,194 @@
+"""最小的只读NBD服务端（固定newstyle握手）
+
+内核的 f_mass_storage 只能直接读取文件或块设备，压缩镜像需要先解压成块设备：
+本服务端在Unix套接字上提供镜像，nbd-client 把它连接为 /dev/nbdN，再交给大容量存储功能。
+只实现只读挂载需要的部分：EXPORT_NAME / INFO / GO / LIST / ABORT 选项，READ / FLUSH / DISC 命令。
+"""
+import os
+import zlib
+import socket
+import struct
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+NBDMAGIC = 0x4e42444d41474943
+IHAVEOPT = 0x49484156454F5054
+OPTION_REPLY_MAGIC = 0x3e889045565a9
+REQUEST_MAGIC = 0x25609513
+SIMPLE_REPLY_MAGIC = 0x67446698
+
+FLAG_FIXED_NEWSTYLE = 1 << 0
+FLAG_NO_ZEROES = 1 << 1
+FLAG_HAS_FLAGS = 1 << 0
+FLAG_READ_ONLY = 1 << 1
+FLAG_SEND_FLUSH = 1 << 2
+TRANSMISSION_FLAGS = FLAG_HAS_FLAGS | FLAG_READ_ONLY | FLAG_SEND_FLUSH
+
+OPT_EXPORT_NAME = 1
+OPT_ABORT = 2
+OPT_LIST = 3
+OPT_INFO = 6
+OPT_GO = 7
+REP_ACK = 1
+REP_SERVER = 2
+REP_INFO = 3
+REP_ERR_UNSUP = (1 << 31) + 1
+INFO_EXPORT = 0
+
+CMD_READ = 0
+CMD_WRITE = 1
+CMD_DISC = 2
+CMD_FLUSH = 3
+EPERM = 1
+EIO = 5
+EINVAL = 22
+
+REQUEST = struct.Struct('>IHHQQI')
+SIMPLE_REPLY = struct.Struct('>IIQ')
+OPTION_HEADER = struct.Struct('>QII')
+OPTION_REPLY = struct.Struct('>QIII')
+MAX_READ = 32 * 1024 * 1024
+
+
+class NbdServer:
+    """在Unix套接字上提供一个只读镜像（image 需有 size 和 read(offset, length)）"""
+
+    def __init__(self, image, socket_path: str, export_name: str = 'kvm'):
+        self.image = image
+        self.socket_path = socket_path
+        self.export_name = export_name
+        self._listener: Optional[socket.socket] = None
+        self._thread = None
+        self._connections = []
+        self._stopping = False
+
+    def start(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._listener.listen(2)
+        self._thread = threading.Thread(target=self._accept_loop, name="nbd-server", daemon=True)
+        self._thread.start()
+        logger.info(f"NBD服务已启动: {self.socket_path} ({self.image.size} 字节)")
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._listener:
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener.close()
+            self._listener = None
+        for conn in self._connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread:
+            self._thread.join(timeout=2)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept_loop(self) -> None:
+        while not self._stopping:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break
+            self._connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), name="nbd-connection", daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            if self._handshake(conn):
+                self._transmission(conn)
+        except (OSError, ConnectionError) as e:
+            if not self._stopping:
+                logger.warning(f"NBD连接中断: {e}")
+        finally:
+            conn.close()
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    # 握手阶段 -----------------------------------------------------------
+
+    def _handshake(self, conn: socket.socket) -> bool:
+        conn.sendall(struct.pack('>QQH', NBDMAGIC, IHAVEOPT, FLAG_FIXED_NEWSTYLE | FLAG_NO_ZEROES))
+        client_flags, = struct.unpack('>I', _recv_exact(conn, 4))
+        no_zeroes = bool(client_flags & FLAG_NO_ZEROES)
+        while True:
+            magic, option, length = OPTION_HEADER.unpack(_recv_exact(conn, OPTION_HEADER.size))
+            if magic != IHAVEOPT:
+                return False
+            if length:
+                _recv_exact(conn, length)  # 只有一个导出，忽略选项数据（导出名等）
+            if option == OPT_EXPORT_NAME:
+                conn.sendall(struct.pack('>QH', self.image.size, TRANSMISSION_FLAGS)
+                             + (b'' if no_zeroes else bytes(124)))
+                return True
+            if option == OPT_ABORT:
+                self._option_reply(conn, option, REP_ACK)
+                return False
+            if option == OPT_LIST:
+                name = self.export_name.encode()
+                self._option_reply(conn, option, REP_SERVER, struct.pack('>I', len(name)) + name)
+                self._option_reply(conn, option, REP_ACK)
+            elif option in (OPT_INFO, OPT_GO):
+                self._option_reply(conn, option, REP_INFO,
+                                   struct.pack('>HQH', INFO_EXPORT, self.image.size, TRANSMISSION_FLAGS))
+                self._option_reply(conn, option, REP_ACK)
+                if option == OPT_GO:
+                    return True
+            else:
+                self._option_reply(conn, option, REP_ERR_UNSUP)
+
+    @staticmethod
+    def _option_reply(conn, option: int, reply: int, data: bytes = b'') -> None:
+        conn.sendall(OPTION_REPLY.pack(OPTION_REPLY_MAGIC, option, reply, len(data)) + data)
+
+    # 传输阶段 -----------------------------------------------------------
+
+    def _transmission(self, conn: socket.socket) -> None:
+        image = self.image
+        while True:
+            magic, _flags, command, handle, offset, length = REQUEST.unpack(_recv_exact(conn, REQUEST.size))
+            if magic != REQUEST_MAGIC:
+                logger.error("NBD请求格式错误")
+                return
+            if command == CMD_READ:
+                if length > MAX_READ or offset + length > image.size:
+                    conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, EINVAL, handle))
+                    continue
+                try:
+                    data = image.read(offset, length)
+                except (OSError, ValueError, zlib.error) as e:
+                    logger.error(f"读取镜像失败: {e}")
+                    conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, EIO, handle))
+                    continue
+                conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, 0, handle) + data)
+            elif command == CMD_WRITE:
+                _recv_exact(conn, length)
+                conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, EPERM, handle))
+            elif command == CMD_FLUSH:
+                conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, 0, handle))
+            elif command == CMD_DISC:
+                return
+            else:
+                conn.sendall(SIMPLE_REPLY.pack(SIMPLE_REPLY_MAGIC, EINVAL, handle))
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = conn.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("对端已关闭连接")
+        received += count
+    return bytes(buffer)
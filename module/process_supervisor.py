@@ -0,0 +1,284 @@
+"""多进程模式：采集、输入、界面分别运行在独立进程中
+
+单进程时采集回调、HID报告发送和界面绘制共用一个解释器和GIL，任何一部分的长时间
+Python代码或GC停顿都会给其他部分带来抖动。多进程模式（--multiprocess 或环境变量
+KVM_MULTIPROCESS=1）下：
+- 采集进程：持有摄像头，把帧写入共享内存帧缓冲区（module.capture_process）
+- 输入进程：持有键盘、鼠标的 /dev/hidg* 描述符，从共享内存事件缓冲区读取输入事件
+  （module.input_process）
+- 界面进程：Qt界面、分析模块，以及本模块的 ProcessSupervisor
+
+子进程以 spawn 方式启动（不复制界面进程的Qt状态）；进程退出由 sentinel 描述符的
+QSocketNotifier 立即发现，按退避时间重启，短时间内崩溃过多时放弃并发出 gave_up。
+控制命令和低频通知走 multiprocessing.Pipe，高频数据走共享内存。
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import multiprocessing
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from PyQt5.QtCore import QCoreApplication, QObject, QSocketNotifier, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+enabled = '--multiprocess' in sys.argv or os.environ.get('KVM_MULTIPROCESS') == '1'
+
+SPAWN = multiprocessing.get_context('spawn')
+RESTART_DELAY_MS = 200       # 首次重启前的等待，之后每次加倍
+MAX_RESTART_DELAY_MS = 5000
+STABLE_UPTIME = 30.0         # 运行超过此时间（秒）后退避时间复位
+MAX_RESTARTS = 5             # RESTART_WINDOW 秒内最多重启次数
+RESTART_WINDOW = 60.0
+STOP_TIMEOUT = 2.0
+
+
+class ChildEndpoint(QObject):
+    """界面进程中代表一个子进程的对象：持有控制管道的父端，负责命令和通知的收发
+
+    子类提供 target（子进程入口，模块级函数）、child_args()、handle_message() 和 replay()。
+    """
+    name = ''
+    target = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._conn = None
+        self._child_conn = None
+        self._notifier: Optional[QSocketNotifier] = None
+        self._next_reply = 0
+        self._replies = set()
+
+    def is_connected(self) -> bool:
+        return self._conn is not None
+
+    def spawn_args(self) -> tuple:
+        """为新启动的子进程创建控制管道，返回子进程入口的参数"""
+        self._conn, self._child_conn = SPAWN.Pipe()
+        return (self._child_conn,) + self.child_args()
+
+    def child_args(self) -> tuple:
+        return ()
+
+    def on_started(self) -> None:
+        # 父进程中不再需要子进程端，关闭后子进程退出时才能读到EOF
+        self._child_conn.close()
+        self._child_conn = None
+        self._notifier = QSocketNotifier(self._conn.fileno(), QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._on_readable)
+        self.replay()
+
+    def on_exited(self) -> None:
+        if self._notifier:
+            self._notifier.setEnabled(False)
+            self._notifier.deleteLater()
+            self._notifier = None
+        for conn in (self._conn, self._child_conn):
+            if conn is not None:
+                conn.close()
+        self._conn = self._child_conn = None
+        self._replies.clear()
+
+    def shutdown(self) -> None:
+        """请求子进程退出（关闭管道，子进程读到EOF后退出事件循环）"""
+        if self._conn is not None:
+            self.on_exited()
+
+    def replay(self) -> None:
+        """子进程（重新）启动后恢复状态"""
+
+    def send(self, message: tuple, wait: bool = False) -> bool:
+        """发送命令；wait=True 时等待子进程执行完毕（期间到达的通知照常处理）"""
+        if self._conn is None:
+            return False
+        reply = None
+        if wait:
+            self._next_reply += 1
+            reply = self._next_reply
+        try:
+            self._conn.send(message + (reply,))
+            while reply is not None and reply not in self._replies:
+                if not self._conn.poll(STOP_TIMEOUT):
+                    logger.warning(f"{self.name} 进程在 {STOP_TIMEOUT:g} 秒内未响应")
+                    return False
+                self._receive()
+            self._replies.discard(reply)
+            return True
+        except (OSError, EOFError) as e:
+            logger.error(f"与 {self.name} 进程通信失败: {e}")
+            return False
+
+    def _on_readable(self, _fd) -> None:
+        try:
+            while self._conn is not None and self._conn.poll():
+                self._receive()
+        except (OSError, EOFError):
+            # 子进程已退出，由 ProcessSupervisor 通过 sentinel 处理
+            if self._notifier:
+                self._notifier.setEnabled(False)
+
+    def _receive(self) -> None:
+        message = self._conn.recv()
+        if message[0] == 'reply':
+            self._replies.add(message[1])
+        else:
+            self.handle_message(message)
+
+    def handle_message(self, message: tuple) -> None:
+        logger.warning(f"{self.name} 进程发来未知消息: {message[0]}")
+
+
+class ChildControl(QObject):
+    """子进程一侧的控制管道：执行命令 handler(命令, *参数)，需要时回复；读到EOF（界面进程退出）时结束事件循环"""
+
+    def __init__(self, conn, handler: Callable, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.handler = handler
+        self._notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._on_readable)
+
+    def send(self, *message) -> None:
+        try:
+            self.conn.send(message)
+        except OSError as e:
+            logger.error(f"向界面进程发送通知失败: {e}")
+
+    def _on_readable(self, _fd) -> None:
+        while True:
+            try:
+                if not self.conn.poll():
+                    return
+                message = self.conn.recv()
+            except (OSError, EOFError):
+                self._notifier.setEnabled(False)
+                QCoreApplication.quit()
+                return
+            command, args, reply = message[0], message[1:-1], message[-1]
+            try:
+                self.handler(command, *args)
+            except Exception as e:
+                logger.exception(f"执行命令 {command} 失败: {e}")
+            if reply is not None:
+                self.send('reply', reply)
+
+
+def child_main(factory: Callable, conn, *args) -> None:
+    """子进程入口的公共部分：factory(conn, *args) 创建进程对象，事件循环结束后调用其 close()"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 终端的Ctrl+C由界面进程处理，子进程随管道关闭退出
+    app = QCoreApplication([sys.argv[0]])
+    process = factory(conn, *args)
+    app.exec_()
+    process.close()
+
+
+class _Child:
+    def __init__(self, endpoint: ChildEndpoint):
+        self.endpoint = endpoint
+        self.process = None
+        self.notifier: Optional[QSocketNotifier] = None
+        self.started_at = 0.0
+        self.delay_ms = RESTART_DELAY_MS
+        self.restarts = deque()
+        self.failed = False
+
+
+class ProcessSupervisor(QObject):
+    """启动子进程并在崩溃后重启"""
+    started = pyqtSignal(str, int)   # (名称, pid)
+    crashed = pyqtSignal(str, int)   # (名称, 退出码)；之后会自动重启
+    gave_up = pyqtSignal(str)        # 短时间内崩溃过多，不再重启
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._children: Dict[str, _Child] = {}
+        self._stopping = False
+
+    def add(self, endpoint: ChildEndpoint) -> None:
+        self._children[endpoint.name] = _Child(endpoint)
+
+    def start(self) -> None:
+        self._stopping = False
+        for name in self._children:
+            self._spawn(name)
+
+    def is_running(self, name: str) -> bool:
+        child = self._children.get(name)
+        return bool(child and child.process and child.process.is_alive())
+
+    def _spawn(self, name: str) -> None:
+        child = self._children[name]
+        if self._stopping:
+            return
+        endpoint = child.endpoint
+        process = SPAWN.Process(target=endpoint.target, args=endpoint.spawn_args(),
+                                name=f"kvm-{name}", daemon=True)
+        try:
+            process.start()
+        except OSError as e:
+            logger.error(f"启动 {name} 进程失败: {e}")
+            endpoint.on_exited()
+            self._schedule_restart(name)
+            return
+        child.process = process
+        child.started_at = time.monotonic()
+        # 进程退出时 sentinel 变为可读
+        child.notifier = QSocketNotifier(process.sentinel, QSocketNotifier.Read, self)
+        child.notifier.activated.connect(lambda _fd, name=name: self._on_exit(name))
+        endpoint.on_started()
+        logger.info(f"{name} 进程已启动，pid {process.pid}")
+        self.started.emit(name, process.pid)
+
+    def _on_exit(self, name: str) -> None:
+        child = self._children[name]
+        child.notifier.setEnabled(False)
+        child.notifier.deleteLater()
+        child.notifier = None
+        child.process.join()  # sentinel 已可读，立即返回；回收后 exitcode 才有值（包括被信号结束时）
+        exitcode = child.process.exitcode
+        child.process = None
+        child.endpoint.on_exited()
+        if self._stopping:
+            return
+        logger.error(f"{name} 进程意外退出，退出码 {exitcode}")
+        self.crashed.emit(name, exitcode if exitcode is not None else -1)
+        if time.monotonic() - child.started_at > STABLE_UPTIME:
+            child.delay_ms = RESTART_DELAY_MS
+        self._schedule_restart(name)
+
+    def _schedule_restart(self, name: str) -> None:
+        child = self._children[name]
+        now = time.monotonic()
+        while child.restarts and now - child.restarts[0] > RESTART_WINDOW:
+            child.restarts.popleft()
+        if len(child.restarts) >= MAX_RESTARTS:
+            child.failed = True
+            logger.error(f"{name} 进程在 {RESTART_WINDOW:g} 秒内崩溃 {MAX_RESTARTS} 次，不再重启")
+            self.gave_up.emit(name)
+            return
+        child.restarts.append(now)
+        logger.info(f"{child.delay_ms}ms 后重启 {name} 进程")
+        QTimer.singleShot(child.delay_ms, lambda: self._spawn(name))
+        child.delay_ms = min(child.delay_ms * 2, MAX_RESTART_DELAY_MS)
+
+    def stop(self) -> None:
+        """通知所有子进程退出，超时后强制结束"""
+        self._stopping = True
+        for child in self._children.values():
+            child.endpoint.shutdown()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for name, child in self._children.items():
+            if child.process is None:
+                continue
+            child.process.join(max(0.0, deadline - time.monotonic()))
+            if child.process.is_alive():
+                logger.warning(f"{name} 进程未能按时退出，强制结束")
+                child.process.terminate()
+                child.process.join(STOP_TIMEOUT)
+            if child.notifier:
+                child.notifier.setEnabled(False)
+            child.endpoint.on_exited()
+            child.process = None
@@ -0,0 +1,563 @@
+"""截图库：按内容寻址存储截图，感知哈希去重，后台生成缩略图，SQLite索引
+
+目录结构（位于截图保存路径下）：
+    incoming/            采集中的截图（QCameraImageCapture 写入，入库后移走）
+    objects/ab/<sha256>  原图，文件名为内容的SHA-256
+    thumbs/ab/<sha256>   缩略图
+    index.sqlite3        截图、出现记录、标签
+
+- 每张截图计算64位差分哈希（dHash：缩小为9x8灰度，比较水平相邻像素，差值带死区）用于检索，
+  dHash 太粗，底色相同、只有文字不同的两个画面（如不同的BIOS错误）哈希可能完全一样，
+  哈希相近的候选再与其缩略图逐像素比较
+- 与同一被控机已有截图的汉明距离不超过 DEDUPE_DISTANCE 且缩略图一致时视为同一画面，
+  只记录一次出现（次数、最后出现时间），不保存新文件
+- 入库（读文件、解码、哈希、缩略图、写索引）在后台线程中进行，不阻塞界面
+- 相似查询：全部哈希常驻内存（numpy数组），异或后按字节查置位数表求汉明距离，
+  数万张截图的查询在毫秒级完成
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from module.text_screen_reader import POPCOUNT
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.sqlite3"
+INCOMING_DIR = "incoming"
+OBJECTS_DIR = "objects"
+THUMBS_DIR = "thumbs"
+HASH_W = 9                 # dHash 缩小后的宽度（8个水平差分）
+HASH_H = 8
+HASH_MARGIN = 2.0          # 相邻块亮度差超过此值才置位：平坦画面的差分为0，不由采集噪声决定
+HASH_VERSION = 1           # 哈希算法版本（PRAGMA user_version），变化后打开时按缩略图重新计算
+THUMB_SIZE = QSize(320, 180)
+THUMB_QUALITY = 90         # 缩略图用于比较画面，压缩噪声需明显低于 SAME_TOLERANCE
+DEDUPE_DISTANCE = 4        # 汉明距离不超过此值的截图才比较缩略图
+SAME_TOLERANCE = 40        # 缩略图任一像素亮度差超过此值即为不同画面（一个小字号字符的变化约为60）
+SEARCH_DISTANCE = 10       # 相似查询的默认最大汉明距离
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    thumb TEXT NOT NULL DEFAULT '',
+    target TEXT NOT NULL DEFAULT '',
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    seen INTEGER NOT NULL DEFAULT 1,
+    phash INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shots_target_time ON shots (target, first_seen);
+CREATE TABLE IF NOT EXISTS sightings (
+    shot_id INTEGER NOT NULL REFERENCES shots (id) ON DELETE CASCADE,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sightings_shot ON sightings (shot_id, time);
+CREATE TABLE IF NOT EXISTS tags (
+    shot_id INTEGER NOT NULL REFERENCES shots (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (shot_id, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+"""
+SHOT_COLUMNS = "id, digest, path, thumb, target, first_seen, last_seen, seen, phash, width, height"
+
+
+@dataclass(frozen=True)
+class Shot:
+    id: int
+    digest: str
+    path: str        # 原图的绝对路径
+    thumb: str       # 缩略图的绝对路径（生成失败时为空）
+    target: str      # 被控机配置名
+    first_seen: float
+    last_seen: float
+    seen: int        # 出现次数（包括被合并的重复截图）
+    phash: int
+    width: int
+    height: int
+
+    def __str__(self) -> str:
+        return f"#{self.id} {format_time(self.first_seen)}（{self.target or '-'}，出现 {self.seen} 次）"
+
+
+def format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _to_sql(value: int) -> int:
+    """SQLite 整数为有符号64位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def area_resize(gray: np.ndarray, width: int, height: int) -> np.ndarray:
+    """按面积平均缩小（浮点结果）"""
+    rows, cols = gray.shape
+    if rows < height or cols < width:
+        raise ValueError(f"图像太小: {cols}x{rows}")
+    row_edges = np.arange(height) * rows // height
+    col_edges = np.arange(width) * cols // width
+    sums = np.add.reduceat(np.add.reduceat(gray, row_edges, axis=0, dtype=np.uint32), col_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, rows)), np.diff(np.append(col_edges, cols)))
+    return sums / counts
+
+
+def dhash(gray: np.ndarray) -> int:
+    """灰度图的64位差分哈希：缩小为 9x8，比较每行水平相邻的像素（差值在 HASH_MARGIN 以内视为相等）"""
+    small = area_resize(gray, HASH_W, HASH_H)
+    bits = np.packbits(small[:, 1:] > small[:, :-1] + HASH_MARGIN)
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+def same_screen(thumb_gray: np.ndarray, gray: np.ndarray) -> bool:
+    """画面是否与缩略图相同；gray 可以是原尺寸，按面积平均缩小到缩略图尺寸后比较"""
+    if gray.shape != thumb_gray.shape:
+        gray = area_resize(gray, thumb_gray.shape[1], thumb_gray.shape[0])
+    diff = np.abs(thumb_gray.astype(np.int16) - gray)
+    return float(diff.max()) <= SAME_TOLERANCE
+
+
+def qimage_to_gray(image: QImage) -> np.ndarray:
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    rows = np.frombuffer(bits, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width()].copy()
+
+
+class HashIndex:
+    """内存中的哈希索引：截图ID、哈希、被控机编号三个并列数组，容量按倍数增长"""
+
+    def __init__(self, capacity: int = 1024):
+        self.count = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._targets = np.zeros(capacity, dtype=np.int32)
+        self._target_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_ids', '_hashes', '_targets'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def _target_code(self, target: str) -> int:
+        return self._target_codes.setdefault(target, len(self._target_codes))
+
+    def add(self, shot_id: int, phash: int, target: str) -> None:
+        self._grow(self.count + 1)
+        self._ids[self.count] = shot_id
+        self._hashes[self.count] = phash
+        self._targets[self.count] = self._target_code(target)
+        self.count += 1
+
+    def extend(self, rows: Sequence[Tuple[int, int, str]]) -> None:
+        """批量加载 (ID, 哈希（SQLite有符号值）, 被控机)"""
+        if not rows:
+            return
+        start = self.count
+        self._grow(start + len(rows))
+        end = start + len(rows)
+        self._ids[start:end] = [row[0] for row in rows]
+        self._hashes[start:end] = np.array([row[1] for row in rows], dtype=np.int64).view(np.uint64)
+        self._targets[start:end] = [self._target_code(row[2]) for row in rows]
+        self.count = end
+
+    def distances(self, phash: int) -> np.ndarray:
+        """与全部哈希的汉明距离"""
+        xor = self._hashes[:self.count] ^ np.uint64(phash)
+        return POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int32)
+
+    def search(self, phash: int, max_distance: int, target: Optional[str] = None) -> List[Tuple[int, int]]:
+        """返回 [(截图ID, 距离)]，按距离从小到大"""
+        if not self.count:
+            return []
+        distances = self.distances(phash)
+        mask = distances <= max_distance
+        if target is not None:
+            code = self._target_codes.get(target)
+            if code is None:
+                return []
+            mask &= self._targets[:self.count] == code
+        hits = np.flatnonzero(mask)
+        hits = hits[np.argsort(distances[hits], kind='stable')]
+        return [(int(self._ids[i]), int(distances[i])) for i in hits]
+
+
+class ScreenshotStore(QObject):
+    """截图库；入库在后台线程中进行，完成后发出 stored(截图, 是否为新画面)"""
+    stored = pyqtSignal(object, bool)
+    failed = pyqtSignal(str, str)  # (文件, 错误)
+    open_failed = pyqtSignal(str, str)  # (目录, 错误)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.RLock()  # 保护数据库连接和哈希索引（后台入库与界面查询）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-store")
+        self._db: Optional[sqlite3.Connection] = None
+        self.index = HashIndex()
+        self.root = ''
+        self._staging_root = ''
+        self._opening: Optional[Future] = None
+
+    # ---- 打开/关闭 ----
+
+    def open(self, root: str) -> None:
+        """打开（或切换到）指定目录下的截图库，等待已排队的入库完成"""
+        self.open_async(root).result()
+
+    def open_async(self, root: str) -> Future:
+        """在后台线程中打开截图库，排在已排队的入库之后；连接数据库、加载哈希索引和重新计算哈希都不阻塞界面。
+        incoming/ 立即创建，打开完成前采集的截图在打开后入库"""
+        os.makedirs(os.path.join(root, INCOMING_DIR), exist_ok=True)
+        self._staging_root = root
+
+        def job():
+            try:
+                self._open(root)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"打开截图库失败 {root}: {e}")
+                self.open_failed.emit(root, str(e))
+                raise
+        self._opening = self._executor.submit(job)
+        return self._opening
+
+    def _open(self, root: str) -> None:
+        with self._lock:
+            self._close_db()
+            self.root = root
+            self.index = HashIndex()
+            db = sqlite3.connect(os.path.join(root, INDEX_FILE), check_same_thread=False)
+            try:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA foreign_keys=ON")
+                db.executescript(SCHEMA)
+                if db.execute("PRAGMA user_version").fetchone()[0] < HASH_VERSION:
+                    self._rehash(db, root)
+                self.index.extend(db.execute("SELECT id, phash, target FROM shots ORDER BY id").fetchall())
+            except sqlite3.Error:
+                db.close()
+                raise
+            self._db = db
+        logger.info(f"截图库已打开: {root}（{len(self.index)} 张）")
+
+    @staticmethod
+    def _rehash(db: sqlite3.Connection, root: str) -> None:
+        """用缩略图重新计算全部哈希（哈希算法变化后，旧值无法与新截图比较）"""
+        rows = db.execute("SELECT id, thumb FROM shots WHERE thumb != ''").fetchall()
+        updates = []
+        for shot_id, thumb in rows:
+            image = QImage(os.path.join(root, thumb))
+            if not image.isNull():
+                updates.append((_to_sql(dhash(qimage_to_gray(image))), shot_id))
+        db.executemany("UPDATE shots SET phash = ? WHERE id = ?", updates)
+        db.execute(f"PRAGMA user_version = {HASH_VERSION}")
+        db.commit()
+        if rows:
+            logger.info(f"截图库哈希已更新: {len(updates)}/{len(rows)} 张")
+
+    def is_open(self) -> bool:
+        return self._db is not None
+
+    def is_opening(self) -> bool:
+        return self._opening is not None and not self._opening.done()
+
+    def drain(self) -> None:
+        """等待后台入库队列清空"""
+        self._executor.submit(lambda: None).result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._close_db()
+
+    def _close_db(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ---- 入库 ----
+
+    def staging_path(self, timestamp: Optional[str] = None) -> str:
+        """采集写入的临时路径"""
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        return os.path.join(self._staging_root, INCOMING_DIR, f"screenshot_{timestamp}.jpg")
+
+    def add_async(self, path: str, target: str = '', tags: Iterable[str] = (), move: bool = True) -> Future:
+        """在后台线程中入库，完成后发出 stored 或 failed"""
+        tags = tuple(tags)
+
+        def job():
+            try:
+                shot, is_new = self.add(path, target, tags, move=move)
+            except Exception as e:
+                logger.error(f"截图入库失败 {path}: {e}")
+                self.failed.emit(path, str(e))
+                raise
+            self.stored.emit(shot, is_new)
+            return shot, is_new
+        return self._executor.submit(job)
+
+    def add(self, path: str, target: str = '', tags: Iterable[str] = (), taken: Optional[float] = None,
+            move: bool = True) -> Tuple[Shot, bool]:
+        """入库一张截图（同步）；返回 (截图, 是否为新画面)。重复画面只记录出现，move=True 时删除源文件"""
+        if self._db is None:
+            raise OSError("截图库未打开")
+        taken = taken if taken is not None else os.path.getmtime(path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        # 按缩略图尺寸解码（JPEG在解码时按DCT缩小，比解码原图再缩放快得多）
+        reader = QImageReader(path)
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(THUMB_SIZE, Qt.KeepAspectRatio))
+        thumb = reader.read()
+        if thumb.isNull():
+            raise OSError(f"无法读取图片: {path}（{reader.errorString()}）")
+        if not size.isValid():
+            size = thumb.size()
+        gray = qimage_to_gray(thumb)
+        phash = dhash(gray)
+
+        with self._lock:
+            existing = self._shot_where("digest = ?", (digest,))
+            if existing is None:
+                existing = self._find_same(phash, gray, target)
+            if existing is not None:
+                self._record_sighting(existing.id, taken)
+                self._add_tags(existing.id, tags)
+                self._db.commit()
+                if move and os.path.abspath(path) != existing.path:
+                    os.remove(path)
+                shot = self.get(existing.id)
+                logger.info(f"截图与 {shot} 相同，已合并")
+                return shot, False
+
+        relative = self._object_path(OBJECTS_DIR, digest, os.path.splitext(path)[1] or '.jpg')
+        absolute = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(absolute), exist_ok=True)
+        (shutil.move if move else shutil.copy2)(path, absolute)
+        thumb_relative = self._object_path(THUMBS_DIR, digest, '.jpg')
+        thumb_absolute = os.path.join(self.root, thumb_relative)
+        os.makedirs(os.path.dirname(thumb_absolute), exist_ok=True)
+        if not thumb.save(thumb_absolute, 'JPEG', THUMB_QUALITY):
+            logger.warning(f"缩略图保存失败: {thumb_absolute}")
+            thumb_relative = ''
+
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO shots (digest, path, thumb, target, first_seen, last_seen, seen, phash, width, height)"
+                " VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?)",
+                (digest, relative, thumb_relative, target, taken, taken, _to_sql(phash), size.width(), size.height()))
+            shot_id = cursor.lastrowid
+            self._db.execute("INSERT INTO sightings (shot_id, time) VALUES (?, ?)", (shot_id, taken))
+            self._add_tags(shot_id, tags)
+            self._db.commit()
+            self.index.add(shot_id, phash, target)
+            shot = self.get(shot_id)
+        logger.info(f"截图已入库: {shot}")
+        return shot, True
+
+    def _find_same(self, phash: int, gray: np.ndarray, target: Optional[str]) -> Optional[Shot]:
+        """哈希相近且缩略图一致的最早截图"""
+        resized = {}  # 缩略图尺寸 -> 缩小后的画面（候选缩略图通常同尺寸，只缩小一次）
+        for shot_id, _ in sorted(self.index.search(phash, DEDUPE_DISTANCE, target)):
+            shot = self.get(shot_id)
+            thumb = QImage(shot.thumb) if shot.thumb else QImage()
+            if thumb.isNull():
+                continue
+            thumb_gray = qimage_to_gray(thumb)
+            if thumb_gray.shape not in resized:
+                resized[thumb_gray.shape] = gray if gray.shape == thumb_gray.shape else \
+                    area_resize(gray, thumb_gray.shape[1], thumb_gray.shape[0])
+            if same_screen(thumb_gray, resized[thumb_gray.shape]):
+                return shot
+        return None
+
+    @staticmethod
+    def _object_path(directory: str, digest: str, suffix: str) -> str:
+        return os.path.join(directory, digest[:2], digest + suffix.lower())
+
+    def _record_sighting(self, shot_id: int, taken: float) -> None:
+        self._db.execute("UPDATE shots SET seen = seen + 1, last_seen = MAX(last_seen, ?),"
+                         " first_seen = MIN(first_seen, ?) WHERE id = ?", (taken, taken, shot_id))
+        self._db.execute("INSERT INTO sightings (shot_id, time) VALUES (?, ?)", (shot_id, taken))
+
+    def _add_tags(self, shot_id: int, tags: Iterable[str]) -> None:
+        self._db.executemany("INSERT OR IGNORE INTO tags (shot_id, tag) VALUES (?, ?)",
+                             [(shot_id, tag.strip()) for tag in tags if tag.strip()])
+
+    # ---- 查询 ----
+
+    def _row_to_shot(self, row) -> Shot:
+        root = self.root
+        return Shot(row[0], row[1], os.path.join(root, row[2]), os.path.join(root, row[3]) if row[3] else '',
+                    row[4], row[5], row[6], row[7], row[8] & 0xFFFFFFFFFFFFFFFF, row[9], row[10])
+
+    def _shot_where(self, condition: str, args: tuple) -> Optional[Shot]:
+        row = self._db.execute(f"SELECT {SHOT_COLUMNS} FROM shots WHERE {condition}", args).fetchone()
+        return self._row_to_shot(row) if row else None
+
+    def get(self, shot_id: int) -> Optional[Shot]:
+        with self._lock:
+            return self._shot_where("id = ?", (shot_id,))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def find_similar(self, phash: int, max_distance: int = SEARCH_DISTANCE, target: Optional[str] = None,
+                     limit: int = 50) -> List[Tuple[Shot, int]]:
+        """相似截图 [(截图, 汉明距离)]，按首次出现时间排序（最早的在前）"""
+        with self._lock:
+            hits = self.index.search(phash, max_distance, target)[:limit]
+            shots = [(self.get(shot_id), distance) for shot_id, distance in hits]
+        shots.sort(key=lambda item: item[0].first_seen)
+        return shots
+
+    def find_similar_gray(self, gray: np.ndarray, **kwargs) -> List[Tuple[Shot, int]]:
+        """按画面（灰度数组，如当前采集帧）查找相似截图"""
+        return self.find_similar(dhash(gray), **kwargs)
+
+    def find_same_gray(self, gray: np.ndarray, target: Optional[str] = None) -> Optional[Shot]:
+        """与画面相同的截图（"这个画面最早什么时候出现"），没有时返回None"""
+        with self._lock:
+            return self._find_same(dhash(gray), gray, target)
+
+    def sightings(self, shot_id: int) -> List[float]:
+        with self._lock:
+            rows = self._db.execute("SELECT time FROM sightings WHERE shot_id = ? ORDER BY time", (shot_id,))
+            return [row[0] for row in rows]
+
+    def add_tags(self, shot_id: int, tags: Iterable[str]) -> None:
+        with self._lock:
+            self._add_tags(shot_id, tags)
+            self._db.commit()
+
+    def tags(self, shot_id: int) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT tag FROM tags WHERE shot_id = ? ORDER BY tag", (shot_id,))]
+
+    def find_by_tag(self, tag: str) -> List[Shot]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join('s.' + c.strip() for c in SHOT_COLUMNS.split(','))} FROM shots s"
+                " JOIN tags t ON t.shot_id = s.id WHERE t.tag = ? ORDER BY s.first_seen", (tag,)).fetchall()
+            return [self._row_to_shot(row) for row in rows]
+
+    def recent(self, target: Optional[str] = None, limit: int = 50) -> List[Shot]:
+        with self._lock:
+            if target is None:
+                rows = self._db.execute(
+                    f"SELECT {SHOT_COLUMNS} FROM shots ORDER BY last_seen DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._db.execute(
+                    f"SELECT {SHOT_COLUMNS} FROM shots WHERE target = ? ORDER BY last_seen DESC LIMIT ?",
+                    (target, limit)).fetchall()
+            return [self._row_to_shot(row) for row in rows]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="截图库")
+    parser.add_argument('root', help='截图保存路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('import', help='导入截图文件或目录（旧版平铺目录中的截图）')
+    add.add_argument('paths', nargs='+')
+    add.add_argument('--target', default='')
+    add.add_argument('--tag', action='append', default=[])
+    add.add_argument('--move', action='store_true', help='入库后删除源文件')
+    find = sub.add_parser('find', help='查找与图片相似的截图（最早出现的在前）')
+    find.add_argument('image')
+    find.add_argument('--distance', type=int, default=SEARCH_DISTANCE)
+    find.add_argument('--target')
+    tag = sub.add_parser('tag', help='给截图添加标签')
+    tag.add_argument('id', type=int)
+    tag.add_argument('tags', nargs='+')
+    bench = sub.add_parser('bench', help='测量相似查询耗时（随机哈希，不写入截图库）')
+    bench.add_argument('--count', type=int, default=50000)
+    bench.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'bench':
+        rng = np.random.default_rng(0)
+        index = HashIndex()
+        hashes = rng.integers(0, 1 << 63, size=args.count, dtype=np.int64)
+        index.extend([(i, int(value), 'default') for i, value in enumerate(hashes)])
+        timings = []
+        for query in rng.integers(0, 1 << 63, size=args.queries, dtype=np.int64):
+            start = time.perf_counter()
+            index.search(int(query), SEARCH_DISTANCE)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{args.count} 个哈希：中位数 {timings[len(timings) // 2] * 1000:.2f}ms，最大 {timings[-1] * 1000:.2f}ms")
+        return 0
+
+    store = ScreenshotStore()
+    store.open(args.root)
+    try:
+        if args.command == 'import':
+            files = []
+            for path in args.paths:
+                if os.path.isdir(path):
+                    files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.lower().endswith(('.jpg', '.jpeg', '.png')))
+                else:
+                    files.append(path)
+            new = 0
+            for path in files:
+                try:
+                    _, is_new = store.add(path, args.target, args.tag, move=args.move)
+                    new += is_new
+                except (OSError, ValueError) as e:
+                    print(f"{path}: {e}", file=sys.stderr)
+            print(f"导入 {len(files)} 张，新画面 {new} 张，截图库共 {len(store)} 张")
+        elif args.command == 'find':
+            from module.text_screen_reader import load_gray_image
+            start = time.perf_counter()
+            matches = store.find_similar_gray(load_gray_image(args.image), max_distance=args.distance,
+                                              target=args.target)
+            elapsed = (time.perf_counter() - start) * 1000
+            for shot, distance in matches:
+                print(f"{shot}  距离 {distance}  {shot.path}")
+            print(f"# {len(matches)} 张相似截图，查询 {elapsed:.2f}ms（共 {len(store)} 张）", file=sys.stderr)
+        elif args.command == 'tag':
+            if store.get(args.id) is None:
+                print(f"截图 #{args.id} 不存在", file=sys.stderr)
+                return 1
+            store.add_tags(args.id, args.tags)
+            print(', '.join(store.tags(args.id)))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""滚轮引擎：累积小数滚动量，支持水平滚动（AC Pan）和高分辨率滚轮
+
+触控板的像素级滚动会产生远小于一格（120）的 angleDelta，直接取整会全部丢失；
+这里按比例累积，余数留到下一次。同一轮事件循环内到达的多个滚轮事件合并为
+尽量少的报告（每个报告的滚轮/水平滚轮字段范围为 -127~127）。
+"""
+from typing import Callable, Optional
+
+from PyQt5.QtCore import QObject, QTimer
+
+from module.usb_gadget import wheel_multiplier_from_env
+
+ANGLE_PER_NOTCH = 120       # Qt angleDelta 一格的值（1/8度）
+REPORT_LIMIT = 127
+
+
+class ScrollEngine(QObject):
+    """send(wheel, pan) 发送一个滚轮报告
+
+    sensitivity：每格滚轮发送的滚动单位数
+    resolution_multiplier：与描述符中 Resolution Multiplier 一致的倍数（高分辨率滚轮），
+    普通滚轮为1；大于1时每个单位只相当于 1/multiplier 格，滚动更平滑。
+    未指定时读取环境变量 KVM_WHEEL_RESOLUTION_MULTIPLIER。
+    """
+
+    def __init__(self, send: Callable[[int, int], object], sensitivity: float = 2.0,
+                 resolution_multiplier: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        self.send = send
+        self.sensitivity = sensitivity
+        if resolution_multiplier is None:
+            resolution_multiplier = wheel_multiplier_from_env()
+        self.resolution_multiplier = max(1, int(resolution_multiplier))
+        self._wheel = 0.0
+        self._pan = 0.0
+        self._pending = False
+        self.reports_sent = 0
+
+    @property
+    def units_per_angle(self) -> float:
+        return self.sensitivity * self.resolution_multiplier / ANGLE_PER_NOTCH
+
+    def add(self, angle_x: int, angle_y: int) -> None:
+        """累积一个滚轮事件的 angleDelta（Qt：x为正表示向左，HID AC Pan为正表示向右）"""
+        scale = self.units_per_angle
+        self._wheel = _accumulate(self._wheel, angle_y * scale)
+        self._pan = _accumulate(self._pan, -angle_x * scale)
+        if not self._pending:
+            self._pending = True
+            QTimer.singleShot(0, self.flush)
+
+    def flush(self) -> int:
+        """发送累积的整数部分，余数保留；返回发送的报告数"""
+        self._pending = False
+        wheel = int(self._wheel)
+        pan = int(self._pan)
+        self._wheel -= wheel
+        self._pan -= pan
+        count = 0
+        while wheel or pan:
+            step_wheel = max(-REPORT_LIMIT, min(REPORT_LIMIT, wheel))
+            step_pan = max(-REPORT_LIMIT, min(REPORT_LIMIT, pan))
+            self.send(step_wheel, step_pan)
+            wheel -= step_wheel
+            pan -= step_pan
+            count += 1
+        self.reports_sent += count
+        return count
+
+    def reset(self) -> None:
+        self._wheel = 0.0
+        self._pan = 0.0
+
+
+def _accumulate(current: float, delta: float) -> float:
+    # 方向反转时丢弃旧方向的余数，避免反向滚动第一下没有反应
+    if current * delta < 0:
+        current = 0.0
+    return current + delta
@@ -0,0 +1,202 @@
+"""进程间共享内存环形缓冲区（多进程模式，见 module.process_supervisor）
+
+- FrameRing：采集进程写入视频帧，界面进程读取最新的一帧。每个槽位带序号（seqlock）：
+  写入时序号为奇数，写完变为偶数；读取前后序号不同说明读到一半被覆盖，丢弃重读
+- EventRing：界面进程写入输入事件，输入进程读取。单生产者单消费者，
+  写指针只由生产者修改、读指针只由消费者修改，不需要锁；固定长度记录，满时丢弃并计数
+
+两者都由创建方（界面进程）负责 unlink，子进程按名称 attach，子进程重启后重新 attach 同一块内存
+（子进程以 spawn 方式启动，与界面进程共用 resource_tracker，子进程退出不会删除共享内存）。
+"""
+import struct
+import logging
+from multiprocessing import shared_memory
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MAGIC = b'KVMFRM01'
+EVENT_MAGIC = b'KVMEVT01'
+# 缓冲区头：魔数、槽位数/容量、槽位数据大小/记录大小、已发布的帧序号/写指针、读指针
+RING_HEADER = struct.Struct('<8sIIQQ')
+HEAD_OFFSET = 16  # 已发布的帧序号/写指针在缓冲区头中的偏移
+TAIL_OFFSET = 24  # 读指针
+COUNTER = struct.Struct('<Q')
+# 帧槽位头：序号、采集时间戳（微秒）、宽、高、行字节数、像素格式（QVideoFrame.PixelFormat）、数据长度
+FRAME_SLOT = struct.Struct('<QqIIIII')
+DEFAULT_FRAME_SLOTS = 3
+DEFAULT_FRAME_BYTES = 1920 * 1080 * 4
+EVENT_RECORD_SIZE = 32
+DEFAULT_EVENT_CAPACITY = 4096
+
+
+class FrameRing:
+    """单写者、多读者的视频帧环形缓冲区，读者总是取最新一帧"""
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        self.buf = memory.buf
+        magic, self.slots, self.slot_bytes, _, _ = RING_HEADER.unpack_from(self.buf, 0)
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"共享内存 {memory.name} 不是帧缓冲区")
+        self._slot_stride = FRAME_SLOT.size + self.slot_bytes
+        self._written = self.published()
+
+    @classmethod
+    def create(cls, slots: int = DEFAULT_FRAME_SLOTS, slot_bytes: int = DEFAULT_FRAME_BYTES,
+               name: Optional[str] = None) -> 'FrameRing':
+        size = RING_HEADER.size + slots * (FRAME_SLOT.size + slot_bytes)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        RING_HEADER.pack_into(memory.buf, 0, FRAME_MAGIC, slots, slot_bytes, 0, 0)
+        for slot in range(slots):
+            FRAME_SLOT.pack_into(memory.buf, RING_HEADER.size + slot * (FRAME_SLOT.size + slot_bytes),
+                                 0, 0, 0, 0, 0, 0, 0)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'FrameRing':
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def published(self) -> int:
+        """已发布的帧数（最新帧的序号）"""
+        return COUNTER.unpack_from(self.buf, HEAD_OFFSET)[0]
+
+    def _slot_offset(self, sequence: int) -> int:
+        return RING_HEADER.size + (sequence - 1) % self.slots * self._slot_stride
+
+    def write(self, data, width: int, height: int, stride: int, pixel_format: int,
+              timestamp_us: int = -1) -> int:
+        """写入一帧并发布，返回帧序号；帧比槽位大时丢弃并返回0"""
+        length = len(data)
+        if length > self.slot_bytes:
+            logger.warning(f"帧大小 {length} 超过共享内存槽位 {self.slot_bytes}，已丢弃")
+            return 0
+        sequence = self._written + 1
+        offset = self._slot_offset(sequence)
+        buf = self.buf
+        FRAME_SLOT.pack_into(buf, offset, sequence * 2 - 1, timestamp_us, width, height, stride,
+                             pixel_format, length)  # 奇数：正在写入
+        start = offset + FRAME_SLOT.size
+        buf[start:start + length] = data
+        COUNTER.pack_into(buf, offset, sequence * 2)
+        COUNTER.pack_into(buf, HEAD_OFFSET, sequence)
+        self._written = sequence
+        return sequence
+
+    def read_latest(self, out: Optional[np.ndarray] = None, after: int = 0
+                    ) -> Optional[Tuple[int, Tuple[int, int, int, int, int], np.ndarray]]:
+        """读取最新一帧：(序号, (时间戳, 宽, 高, 行字节数, 像素格式), 数据)
+
+        out 足够大时复用该数组（避免每帧分配）；没有比 after 更新的帧或读取时被覆盖时返回None。
+        """
+        sequence = self.published()
+        if sequence <= after:
+            return None
+        offset = self._slot_offset(sequence)
+        buf = self.buf
+        stamp, timestamp_us, width, height, stride, pixel_format, length = FRAME_SLOT.unpack_from(buf, offset)
+        if stamp != sequence * 2:
+            return None  # 已被更新的帧覆盖或正在写入
+        if out is None or out.size < length:
+            out = np.empty(length, dtype=np.uint8)
+        start = offset + FRAME_SLOT.size
+        view = out[:length]
+        view[:] = np.frombuffer(buf, dtype=np.uint8, count=length, offset=start)
+        if COUNTER.unpack_from(buf, offset)[0] != stamp:
+            return None
+        return sequence, (timestamp_us, width, height, stride, pixel_format), view
+
+    def close(self) -> None:
+        self.buf = None
+        self.memory.close()
+        if self.owner:
+            try:
+                self.memory.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class EventRing:
+    """单生产者单消费者的定长记录环形缓冲区"""
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        self.buf = memory.buf
+        magic, self.capacity, self.record_size, _, _ = RING_HEADER.unpack_from(self.buf, 0)
+        if magic != EVENT_MAGIC:
+            raise ValueError(f"共享内存 {memory.name} 不是事件缓冲区")
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_EVENT_CAPACITY, record_size: int = EVENT_RECORD_SIZE,
+               name: Optional[str] = None) -> 'EventRing':
+        memory = shared_memory.SharedMemory(name=name, create=True, size=RING_HEADER.size + capacity * record_size)
+        RING_HEADER.pack_into(memory.buf, 0, EVENT_MAGIC, capacity, record_size, 0, 0)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'EventRing':
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def _pointers(self) -> Tuple[int, int]:
+        return COUNTER.unpack_from(self.buf, HEAD_OFFSET)[0], COUNTER.unpack_from(self.buf, TAIL_OFFSET)[0]
+
+    def push(self, record: bytes) -> bool:
+        """生产者：追加一条记录，缓冲区满时丢弃并返回False"""
+        head, tail = self._pointers()
+        if head - tail >= self.capacity:
+            self.dropped += 1
+            return False
+        offset = RING_HEADER.size + head % self.capacity * self.record_size
+        self.buf[offset:offset + len(record)] = record
+        COUNTER.pack_into(self.buf, HEAD_OFFSET, head + 1)  # 写指针在记录写完后才前移
+        return True
+
+    def drain(self) -> Iterator[bytes]:
+        """消费者：取出当前所有记录"""
+        head, tail = self._pointers()
+        buf = self.buf
+        size = self.record_size
+        while tail < head:
+            offset = RING_HEADER.size + tail % self.capacity * size
+            yield bytes(buf[offset:offset + size])
+            tail += 1
+            COUNTER.pack_into(buf, TAIL_OFFSET, tail)
+
+    def pending(self) -> int:
+        head, tail = self._pointers()
+        return head - tail
+
+    def produced(self) -> int:
+        """已写入的记录总数（写指针）"""
+        return self._pointers()[0]
+
+    def consumed(self) -> int:
+        """已取出的记录总数（读指针）"""
+        return self._pointers()[1]
+
+    def reset(self) -> None:
+        """丢弃未读记录（消费者重启时由生产者调用）"""
+        head, _ = self._pointers()
+        COUNTER.pack_into(self.buf, TAIL_OFFSET, head)
+
+    def close(self) -> None:
+        self.buf = None
+        self.memory.close()
+        if self.owner:
+            try:
+                self.memory.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,84 @@
+"""启动耗时统计：各启动阶段时间点 + 类似 -X importtime 的模块导入耗时
+
+启用方式：python KVM.py --startup-timing 或设置环境变量 KVM_STARTUP_TIMING=1。
+未启用时 mark() 只记录一个时间戳，不安装导入钩子。
+"""
+import os
+import sys
+import time
+import logging
+from importlib.abc import MetaPathFinder, Loader
+
+logger = logging.getLogger(__name__)
+
+T0 = time.perf_counter()  # 本模块应尽早导入，作为启动起点
+enabled = '--startup-timing' in sys.argv or os.environ.get('KVM_STARTUP_TIMING') == '1'
+_marks = []          # (阶段名, 相对起点秒)
+_imports = []        # (模块名, 自身耗时, 累计耗时)
+_stack = []          # 正在导入的模块的子模块累计耗时
+
+
+class _TimedLoader(Loader):
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            _imports.append((self._name, elapsed - children, elapsed))
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+if enabled:
+    sys.meta_path.insert(0, _ImportTimer())
+
+
+def mark(phase: str) -> float:
+    """记录一个启动阶段完成的时间点，返回距起点的秒数"""
+    elapsed = time.perf_counter() - T0
+    _marks.append((phase, elapsed))
+    return elapsed
+
+
+def report(top: int = 15) -> str:
+    lines = ["启动耗时:"]
+    previous = 0.0
+    for phase, elapsed in _marks:
+        lines.append(f"  {phase:<24} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f})")
+        previous = elapsed
+    if _imports:
+        lines.append(f"最慢的模块导入（自身/累计，共 {len(_imports)} 个）:")
+        for name, self_time, cumulative in sorted(_imports, key=lambda i: i[1], reverse=True)[:top]:
+            lines.append(f"  {self_time * 1000:8.1f} | {cumulative * 1000:8.1f} ms  {name}")
+    return "\n".join(lines)
+
+
+def log_report() -> None:
+    if enabled:
+        logger.info(report())
@@ -0,0 +1,410 @@
+"""文本模式屏幕识别：从采集画面中读出BIOS、GRUB、文本控制台的内容
+
+固定字体的文本屏幕不需要通用OCR：
+- 自动检测字符网格（80x25、128x48 等）：行/列方向的边缘投影按候选周期折叠，
+  字符之间的空白行/列在正确的周期下形成明显的谷
+- 每个字符格按 8x16 个采样点二值化（前景为少数像素，反色高亮同样识别），
+  打包为16字节的字形码；整屏的采样、二值化、打包全部向量化
+- 字形码 -> 字符 的缓存由 learn() 从已知文本的画面学习，可保存为JSON；
+  未学过的字形按汉明距离匹配最近的已学字形（容忍采集噪声），结果也缓存
+- 只有字形码变化的字符格才重新查表
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+CELL_W = 8                 # 每个字符格的采样列数
+CELL_H = 16                # 每个字符格的采样行数
+CODE_BYTES = CELL_W * CELL_H // 8
+BLANK_CODE = bytes(CODE_BYTES)
+UNKNOWN_CHAR = '\ufffd'  # 未学过的字形
+MIN_CONTRAST = 48          # 字符格内亮度差低于此值视为空白
+MAX_DISTANCE = 10          # 近似匹配允许的最大汉明距离（位）
+MAX_ALIASES = 65536        # 近似匹配结果缓存的上限
+MIN_GRID_SCORE = 0.6       # 行方向折叠谷深低于此值时认为不是文本屏幕
+GRID_CANDIDATES = ((80, 25), (80, 30), (80, 43), (80, 50), (100, 37), (128, 48), (160, 64))
+GLYPH_FILE = os.path.join(os.path.expanduser("~"), ".cache", "kvm", "glyphs.json")
+
+# 字节 -> 置位数
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+@dataclass(frozen=True)
+class TextGrid:
+    """字符网格：列数、行数和文本区域（像素）"""
+    cols: int
+    rows: int
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @classmethod
+    def full_frame(cls, cols: int, rows: int, frame_width: int, frame_height: int) -> 'TextGrid':
+        return cls(cols, rows, 0, 0, frame_width, frame_height)
+
+    def __str__(self) -> str:
+        return f"{self.cols}x{self.rows}@{self.x},{self.y}+{self.width}x{self.height}"
+
+
+def _fold_score(profile: np.ndarray, cells: int, bins: int) -> float:
+    """把投影按 cells 个周期折叠为 bins 个相位；返回 1 - 最浅相位/平均（谷越深越接近1）"""
+    length = len(profile)
+    phase = (np.arange(length) * (cells * bins) // length) % bins
+    counts = np.bincount(phase, minlength=bins)
+    valid = counts > 0  # 画面行数少于采样行数时部分相位为空
+    folded = np.bincount(phase, weights=profile, minlength=bins)[valid] / counts[valid]
+    mean = folded.mean()
+    return float(1.0 - folded.min() / mean) if mean > 0 else 0.0
+
+
+def detect_grid(gray: np.ndarray, candidates: Sequence[Tuple[int, int]] = GRID_CANDIDATES
+                ) -> Optional[TextGrid]:
+    """在整帧中检测字符网格，画面不像文本屏幕时返回None"""
+    height, width = gray.shape
+    signed = gray.astype(np.int16)
+    row_profile = np.abs(np.diff(signed, axis=1)).sum(axis=1).astype(np.float64)
+    col_profile = np.abs(np.diff(signed, axis=0)).sum(axis=0).astype(np.float64)
+    row_profile = row_profile[:height]
+    col_profile = np.append(col_profile, 0.0)[:width]
+    best, best_score = None, 0.0
+    row_scores: Dict[int, float] = {}
+    for cols, rows in candidates:
+        if rows not in row_scores:
+            row_scores[rows] = _fold_score(row_profile, rows, CELL_H)
+        if row_scores[rows] < MIN_GRID_SCORE:
+            continue
+        score = row_scores[rows] + _fold_score(col_profile, cols, CELL_W)
+        if score > best_score:
+            best, best_score = (cols, rows), score
+    if best is None:
+        return None
+    logger.debug(f"检测到字符网格 {best[0]}x{best[1]}，得分 {best_score:.2f}")
+    return TextGrid.full_frame(best[0], best[1], width, height)
+
+
+class GlyphCache:
+    """字形码 -> 字符；学过的字形可保存，近似匹配的结果只在内存中缓存"""
+
+    def __init__(self, path: Optional[str] = GLYPH_FILE, max_distance: int = MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._learned: Dict[bytes, str] = {BLANK_CODE: ' '}
+        self._aliases: Dict[bytes, str] = {}
+        self._matrix = np.zeros((0, CODE_BYTES), dtype=np.uint8)  # 已学字形码，供近似匹配
+        self._chars: List[str] = []
+        self.misses = 0
+        if path:
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._learned)
+
+    def lookup(self, code: bytes) -> str:
+        char = self._learned.get(code)
+        if char is None:
+            char = self._aliases.get(code)
+        if char is None:
+            char = self._nearest(code)
+        return char
+
+    def _nearest(self, code: bytes) -> str:
+        self.misses += 1
+        if not len(self._chars):
+            return UNKNOWN_CHAR
+        distances = POPCOUNT[self._matrix ^ np.frombuffer(code, dtype=np.uint8)].sum(axis=1, dtype=np.int32)
+        index = int(distances.argmin())
+        if distances[index] > self.max_distance:
+            return UNKNOWN_CHAR  # 不缓存：学习新字形后可以识别
+        if len(self._aliases) >= MAX_ALIASES:
+            self._aliases.clear()
+        char = self._aliases[code] = self._chars[index]
+        return char
+
+    def learn(self, code: bytes, char: str) -> bool:
+        """登记一个字形，返回是否为新字形（空白格不登记）"""
+        if code == BLANK_CODE or self._learned.get(code) == char:
+            return False
+        self._learned[code] = char
+        self._aliases.clear()
+        self._rebuild()
+        return True
+
+    def _rebuild(self) -> None:
+        codes = [code for code in self._learned if code != BLANK_CODE]
+        self._matrix = np.frombuffer(b''.join(codes), dtype=np.uint8).reshape(len(codes), CODE_BYTES)
+        self._chars = [self._learned[code] for code in codes]
+
+    def load(self, path: str) -> None:
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"字形缓存读取失败: {e}")
+            return
+        if data.get('cell') != [CELL_W, CELL_H]:
+            logger.warning(f"字形缓存的采样尺寸不一致，忽略: {path}")
+            return
+        for code, char in data.get('glyphs', {}).items():
+            self._learned[bytes.fromhex(code)] = char
+        self._rebuild()
+        logger.info(f"已加载 {len(self._chars)} 个字形: {path}")
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        data = {'cell': [CELL_W, CELL_H],
+                'glyphs': {code.hex(): char for code, char in self._learned.items() if code != BLANK_CODE}}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=0)
+        os.replace(tmp_path, path)
+
+
+class TextScreenReader:
+    """按字符网格把灰度帧解码为文本行；grid 为None时在第一帧自动检测"""
+
+    def __init__(self, glyphs: Optional[GlyphCache] = None, grid: Optional[TextGrid] = None):
+        self.glyphs = glyphs if glyphs is not None else GlyphCache()
+        self.grid = grid
+        self._fixed_grid = grid is not None
+        self._shape = None
+        self._ys = self._xs = None
+        self._codes: Optional[np.ndarray] = None   # 上一帧的字形码 (rows, cols, CODE_BYTES)
+        self._chars: List[List[str]] = []
+        self.changed_rows: List[int] = []
+        self.changed_cells = 0
+
+    def _prepare(self, gray: np.ndarray) -> bool:
+        if self._shape == gray.shape and self.grid is not None:
+            return True
+        if not self._fixed_grid:
+            self.grid = detect_grid(gray)
+        if self.grid is None:
+            # 不保留上次的尺寸和文本：尺寸不变时下一帧同样重新检测
+            self._shape = None
+            self._codes = None
+            self._chars = []
+            return False
+        grid = self.grid
+        # 采样点取每个子格的中心，预计算后每帧只做两次花式索引
+        self._ys = grid.y + ((np.arange(grid.rows * CELL_H) * 2 + 1) * grid.height // (grid.rows * CELL_H * 2))
+        self._xs = grid.x + ((np.arange(grid.cols * CELL_W) * 2 + 1) * grid.width // (grid.cols * CELL_W * 2))
+        self._shape = gray.shape
+        self.invalidate()
+        return True
+
+    def invalidate(self) -> None:
+        """下一帧重新解码所有字符格（学习新字形、更换网格后）"""
+        self._codes = None
+        if self.grid is not None:
+            self._chars = [[' '] * self.grid.cols for _ in range(self.grid.rows)]
+
+    def reset(self) -> None:
+        """丢弃自动检测的网格，下一帧重新检测（指定的网格保留）"""
+        if not self._fixed_grid:
+            self.grid = None
+        self._shape = None
+
+    def set_grid(self, grid: Optional[TextGrid]) -> None:
+        self.grid = grid
+        self._fixed_grid = grid is not None
+        self._shape = None
+
+    def encode(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """整帧字形码 (rows, cols, CODE_BYTES)，未检测到网格时返回None"""
+        if not self._prepare(gray):
+            return None
+        grid = self.grid
+        samples = gray.take(self._ys, axis=0).take(self._xs, axis=1)
+        # (rows, cols, 128)：reshape 产生连续副本，后续按字符格的归约都在最后一维上
+        cells = samples.reshape(grid.rows, CELL_H, grid.cols, CELL_W).swapaxes(1, 2).reshape(
+            grid.rows, grid.cols, CELL_W * CELL_H)
+        low = cells.min(axis=2)
+        high = cells.max(axis=2)
+        threshold = ((low.astype(np.uint16) + high) >> 1).astype(np.uint8)
+        codes = np.packbits(cells > threshold[:, :, None], axis=-1)
+        # 前景是少数像素：亮底暗字（反色高亮）时取反
+        inverted = POPCOUNT[codes].sum(axis=2, dtype=np.uint16) > CELL_W * CELL_H // 2
+        codes[inverted] ^= 0xFF
+        codes[(high - low) < MIN_CONTRAST] = 0
+        return codes
+
+    def read(self, gray: np.ndarray) -> Optional[List[str]]:
+        """解码一帧，只对变化的字符格查表；返回各行文本（行尾空白去除）"""
+        codes = self.encode(gray)
+        if codes is None:
+            return None
+        cols = self.grid.cols
+        if self._codes is None:
+            changed = np.arange(self.grid.rows * cols)
+        else:
+            changed = np.flatnonzero((codes != self._codes).any(axis=2))
+        self._codes = codes
+        buffer = codes.tobytes()
+        chars = self._chars
+        lookup = self.glyphs.lookup
+        rows = set()
+        for index in changed.tolist():
+            row, col = divmod(index, cols)
+            start = index * CODE_BYTES
+            chars[row][col] = lookup(buffer[start:start + CODE_BYTES])
+            rows.add(row)
+        self.changed_rows = sorted(rows)
+        self.changed_cells = len(changed)
+        return self.lines()
+
+    def lines(self) -> List[str]:
+        return [''.join(row).rstrip() for row in self._chars]
+
+    def text(self) -> str:
+        return '\n'.join(self.lines()).rstrip('\n')
+
+    def learn(self, gray: np.ndarray, lines: Sequence[str]) -> int:
+        """用已知的屏幕文本学习字形（行、列与网格对应，不足处视为空白），返回新字形数"""
+        codes = self.encode(gray)
+        if codes is None:
+            return 0
+        added = 0
+        for row in range(min(len(lines), self.grid.rows)):
+            line = lines[row].ljust(self.grid.cols)
+            for col in range(self.grid.cols):
+                if line[col] not in (' ', UNKNOWN_CHAR) and self.glyphs.learn(codes[row, col].tobytes(), line[col]):
+                    added += 1
+        if added:
+            self.invalidate()
+        return added
+
+    def unknown_cells(self) -> int:
+        return sum(row.count(UNKNOWN_CHAR) for row in self._chars)
+
+
+class TextScreenMonitor(QObject):
+    """跟随视频帧解码文本屏幕，按时间间隔节流；行内容变化时发出信号"""
+    lines_changed = pyqtSignal(list)  # [(行号, 文本)]
+
+    def __init__(self, reader: Optional[TextScreenReader] = None, interval_ms: float = 200, parent=None):
+        super().__init__(parent)
+        self.reader = reader if reader is not None else TextScreenReader()
+        self.interval = interval_ms / 1000.0
+        self.enabled = False
+        self.last_gray: Optional[np.ndarray] = None
+        self._last_time = 0.0
+        self._snapshots: List[Callable[[np.ndarray, Optional[List[str]]], None]] = []
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.reader.reset()
+
+    def snapshot(self, callback: Callable[[np.ndarray, Optional[List[str]]], None]) -> None:
+        """在下一帧解码后调用 callback(灰度帧, 文本行)"""
+        self._snapshots.append(callback)
+
+    def on_video_frame(self, frame) -> None:
+        if not self._snapshots:
+            if not self.enabled:
+                return
+            now = time.monotonic()
+            if now - self._last_time < self.interval:
+                return
+            self._last_time = now
+        from module.latency_probe import frame_to_gray
+        gray = frame_to_gray(frame)
+        if gray is None:
+            return
+        self.last_gray = gray
+        lines = self.reader.read(gray)
+        if lines is not None and self.reader.changed_rows:
+            self.lines_changed.emit([(row, lines[row]) for row in self.reader.changed_rows])
+        callbacks, self._snapshots = self._snapshots, []
+        for callback in callbacks:
+            callback(gray, lines)
+
+
+def load_gray_image(path: str) -> np.ndarray:
+    """读取截图为灰度数组（命令行和离线调试使用）"""
+    from PyQt5.QtGui import QImage
+    image = QImage(path)
+    if image.isNull():
+        raise OSError(f"无法读取图片: {path}")
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    rows = np.frombuffer(bits, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width()].copy()
+
+
+def _parse_grid(text: Optional[str], gray: np.ndarray) -> Optional[TextGrid]:
+    if not text:
+        return None
+    cols, rows = (int(value) for value in text.lower().split('x'))
+    return TextGrid.full_frame(cols, rows, gray.shape[1], gray.shape[0])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="文本模式屏幕识别")
+    parser.add_argument('--glyphs', default=GLYPH_FILE, help='字形缓存文件')
+    parser.add_argument('--grid', help='字符网格，如 80x25（默认自动检测）')
+    sub = parser.add_subparsers(dest='command', required=True)
+    read = sub.add_parser('read', help='识别截图中的文本')
+    read.add_argument('image')
+    learn = sub.add_parser('learn', help='用截图和对应的文本文件学习字形')
+    learn.add_argument('image')
+    learn.add_argument('text')
+    bench = sub.add_parser('bench', help='测量单帧解码耗时')
+    bench.add_argument('image')
+    bench.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    gray = load_gray_image(args.image)
+    reader = TextScreenReader(GlyphCache(args.glyphs), _parse_grid(args.grid, gray))
+    if args.command == 'learn':
+        with open(args.text, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        added = reader.learn(gray, lines)
+        reader.glyphs.save()
+        print(f"网格 {reader.grid}，新增 {added} 个字形，共 {len(reader.glyphs) - 1} 个")
+        return 0
+    lines = reader.read(gray)
+    if lines is None:
+        print("未检测到字符网格", file=sys.stderr)
+        return 1
+    if args.command == 'read':
+        print('\n'.join(lines).rstrip('\n'))
+        print(f"# 网格 {reader.grid}，未识别 {reader.unknown_cells()} 格", file=sys.stderr)
+        return 0
+    # 交替原图和平移一个字符格的图：每帧几乎所有字符格都变化（最坏情况），再解码一次相同的帧（只编码不查表）
+    other = np.roll(gray, reader.grid.width // reader.grid.cols, axis=1)
+    timings = {'unchanged': [], 'all_changed': []}
+    for index in range(args.frames):
+        frame = gray if index % 2 == 0 else other
+        start = time.perf_counter()
+        reader.read(frame)
+        timings['all_changed'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        reader.read(frame)
+        timings['unchanged'].append(time.perf_counter() - start)
+    for name, values in timings.items():
+        values.sort()
+        print(f"{name}: 中位数 {values[len(values) // 2] * 1000:.2f}ms，"
+              f"最大 {values[-1] * 1000:.2f}ms（网格 {reader.grid}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
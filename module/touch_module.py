@@ -0,0 +1,137 @@
+"""多点触控：把本地触摸事件（或程序生成的手势）转换为触控屏HID报告
+
+触点按Qt的触摸点ID分配到0~9号槽位；一个触摸事件中的所有更新合并为一个报告
+（并行模式，报告中包含全部活动触点）。GUI线程用 input_worker.touch_tuples 取出触点，
+处理器与键盘、鼠标一起在输入线程中运行（多进程模式下与媒体键一样留在界面进程），
+坐标映射直接使用 MouseHandler.mapper：取景器尺寸、黑边和多显示器目标区域只随鼠标更新一次。
+"""
+from PyQt5.QtCore import QObject, QEvent, pyqtSignal
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from module.hid_reports import TouchReport, TOUCH_MAX_CONTACTS
+from module.coordinate_mapping import CoordinateMapper
+from module.input_worker import TOUCH_MOVE, TOUCH_UP, TOUCH_FRAME, TOUCH_CANCEL
+
+logger = logging.getLogger(__name__)
+
+TOUCH_EVENTS = (QEvent.TouchBegin, QEvent.TouchUpdate, QEvent.TouchEnd, QEvent.TouchCancel)
+
+
+class _Contact:
+    __slots__ = ('x', 'y', 'tip', 'reported')
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+        self.tip = True
+        self.reported = False  # 被控机是否已经收到过该触点（按下后立即抬起也要先报告一次接触）
+
+
+class TouchHandler(QObject):
+    transport_lost = pyqtSignal()  # USB主机断开（ESHUTDOWN）时发出
+
+    def __init__(self, hid_touch, mapper: CoordinateMapper, parent=None):
+        super().__init__(parent)
+        self.hid_touch = hid_touch
+        self.mapper = mapper  # MouseHandler.mapper，由鼠标处理器在同一线程中更新
+        self._report = TouchReport()
+        self._slots: List[Optional[_Contact]] = [None] * TOUCH_MAX_CONTACTS
+        self._slot_of: Dict[int, int] = {}  # 触点标识（Qt触摸点ID或手势中的ID）-> 槽位
+        self.reports_sent = 0
+
+    def is_available(self) -> bool:
+        return self.hid_touch is not None
+
+    def handle_event(self, event: tuple) -> None:
+        """处理触控事件元组（见 module.input_worker.touch_tuples）"""
+        kind = event[0]
+        if kind == TOUCH_MOVE:
+            self.contact_move(event[1], event[2], event[3])
+        elif kind == TOUCH_UP:
+            self.contact_up(event[1])
+        elif kind == TOUCH_FRAME:
+            self.flush()
+        elif kind == TOUCH_CANCEL:
+            self.release_all()
+
+    def contact_move(self, ident: int, x: int, y: int) -> None:
+        """按下或移动一个触点（窗口坐标）；落在黑边中的位置被夹到有效区域边缘，flush() 时发送"""
+        hid_x, hid_y = self._map(x, y)
+        slot = self._slot_of.get(ident)
+        if slot is None:
+            slot = self._free_slot()
+            if slot is None:
+                return  # 超过10个触点时忽略
+            self._slot_of[ident] = slot
+            self._slots[slot] = _Contact(hid_x, hid_y)
+        else:
+            contact = self._slots[slot]
+            contact.x = hid_x
+            contact.y = hid_y
+
+    def contact_up(self, ident: int) -> None:
+        slot = self._slot_of.pop(ident, None)
+        if slot is None:
+            return
+        contact = self._slots[slot]
+        if not contact.reported:
+            self.flush()
+        contact.tip = False
+
+    def play_frame(self, contacts: Iterable[Tuple[int, int, int]]) -> None:
+        """手势的一帧：(触点标识, x, y) 为当前所有接触中的触点，上一帧存在而本帧缺少的触点抬起"""
+        current = set()
+        for ident, x, y in contacts:
+            current.add(ident)
+            self.contact_move(ident, x, y)
+        for ident in [ident for ident in self._slot_of if ident not in current]:
+            self.contact_up(ident)
+        self.flush()
+
+    def release_all(self) -> None:
+        for ident in list(self._slot_of):
+            self.contact_up(ident)
+        self.flush()
+
+    def reset(self) -> None:
+        """丢弃本地状态并发送空报告（设备重新打开后使用）"""
+        self._slots = [None] * TOUCH_MAX_CONTACTS
+        self._slot_of.clear()
+        self._write(self._report.build(()))
+
+    def _free_slot(self) -> Optional[int]:
+        for slot, contact in enumerate(self._slots):
+            if contact is None:
+                return slot
+        return None
+
+    def _map(self, x: int, y: int) -> Tuple[int, int]:
+        mapper = self.mapper
+        x = min(max(x, mapper.x0), mapper.x0 + mapper.width - 1)
+        y = min(max(y, mapper.y0), mapper.y0 + mapper.height - 1)
+        return mapper.map(x, y)
+
+    def flush(self) -> None:
+        """把所有槽位的当前状态合并为一个报告；抬起的触点报告一次后释放槽位"""
+        slots = self._slots
+        contacts = []
+        for slot, contact in enumerate(slots):
+            if contact is not None:
+                contacts.append((slot, contact.tip, contact.x, contact.y))
+                contact.reported = True
+                if not contact.tip:
+                    slots[slot] = None
+        if contacts:
+            self._write(self._report.build(contacts))
+
+    def _write(self, report) -> None:
+        if not self.hid_touch:
+            return
+        try:
+            self.hid_touch.write(report)
+            self.reports_sent += 1
+        except OSError as e:
+            logger.error(f"发送触控报告失败: {e}")
+            if e.errno == 108:  # Cannot send after transport endpoint shutdown
+                self.transport_lost.emit()
@@ -0,0 +1,708 @@
+"""USB gadget 配置（configfs）：声明式HID描述符、运行时重新配置、端点映射
+
+- 报告描述符由下面的条目函数组合而成（keyboard_descriptor 等），报告长度从描述符计算
+- GadgetManager 把 GadgetConfig 写入 configfs；reconfigure() 解绑UDC、更新功能、重新绑定
+- 绑定后把 功能名 -> /dev/hidgN 的端点映射写入 ENDPOINT_MAP_PATH，
+  MainWindow._init_hid_devices 据此打开设备，不再写死设备路径
+
+本模块只依赖标准库（以root身份在开机时运行）：
+    python3 -m module.usb_gadget setup|reconfigure|teardown|show
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from module.hid_reports import (CONSUMER_REPORT_ID, SYSTEM_REPORT_ID, TOUCH_REPORT_ID, TOUCH_FEATURE_REPORT_ID,
+                                TOUCH_MAX_CONTACTS, ABSOLUTE_MAX)
+
+logger = logging.getLogger(__name__)
+
+CONFIGFS_ROOT = '/sys/kernel/config/usb_gadget'
+UDC_CLASS_DIR = '/sys/class/udc'
+ENDPOINT_MAP_PATH = os.environ.get('KVM_ENDPOINT_MAP', '/run/kvm/endpoints.json')
+# 没有端点映射文件时（旧版 usb_gadget.sh 配置的设备）使用的路径
+DEFAULT_DEVICE_PATHS = {'keyboard': '/dev/hidg0', 'mouse_relative': '/dev/hidg1', 'mouse_absolute': '/dev/hidg2'}
+DEVICE_NODE_TIMEOUT = 1.0
+# 高分辨率滚轮倍数；主窗口的滚轮引擎读取同一个环境变量，保证倍数和描述符一致
+WHEEL_MULTIPLIER_ENV = 'KVM_WHEEL_RESOLUTION_MULTIPLIER'
+
+# ---------------------------------------------------------------------------
+# HID报告描述符条目（HID 1.11 第6.2.2节的短条目）
+
+MAIN, GLOBAL, LOCAL = 0, 1, 2
+
+# 主条目标志
+DATA_ARRAY_ABS = 0x00
+CONST_ARRAY_ABS = 0x01
+DATA_VAR_ABS = 0x02
+CONST_VAR_ABS = 0x03
+DATA_VAR_REL = 0x06
+
+# 集合类型
+PHYSICAL = 0x00
+APPLICATION = 0x01
+LOGICAL = 0x02
+
+# 用途页
+GENERIC_DESKTOP = 0x01
+KEYBOARD_PAGE = 0x07
+LED_PAGE = 0x08
+BUTTON_PAGE = 0x09
+CONSUMER_PAGE = 0x0C
+DIGITIZER_PAGE = 0x0D
+
+# 常用用途
+USAGE_MOUSE = 0x02
+USAGE_KEYBOARD = 0x06
+USAGE_X = 0x30
+USAGE_Y = 0x31
+USAGE_WHEEL = 0x38
+USAGE_RESOLUTION_MULTIPLIER = 0x48
+USAGE_GENERIC_INDICATOR = 0x4B
+USAGE_SYSTEM_CONTROL = 0x80
+USAGE_SYSTEM_POWER_DOWN = 0x81
+USAGE_SYSTEM_WAKE_UP = 0x83
+USAGE_CONSUMER_CONTROL = 0x01
+USAGE_AC_PAN = 0x0238
+USAGE_TOUCH_SCREEN = 0x04
+USAGE_FINGER = 0x22
+USAGE_TIP_SWITCH = 0x42
+USAGE_CONFIDENCE = 0x47
+USAGE_CONTACT_IDENTIFIER = 0x51
+USAGE_CONTACT_COUNT = 0x54
+USAGE_CONTACT_COUNT_MAXIMUM = 0x55
+CONSUMER_USAGE_MAX = 0x03FF
+
+
+def _item(tag: int, item_type: int, data: Optional[int] = None, signed: bool = False) -> bytes:
+    """编码一个短条目，数据取能容纳数值的最短长度（1/2/4字节）"""
+    if data is None:
+        return bytes([tag << 4 | item_type << 2])
+    if signed:
+        size = 1 if -0x80 <= data <= 0x7F else 2 if -0x8000 <= data <= 0x7FFF else 4
+    else:
+        size = 1 if data <= 0xFF else 2 if data <= 0xFFFF else 4
+    code = 3 if size == 4 else size
+    return bytes([tag << 4 | item_type << 2 | code]) + data.to_bytes(size, 'little', signed=signed)
+
+
+def usage_page(page: int) -> bytes: return _item(0x0, GLOBAL, page)
+def logical_minimum(value: int) -> bytes: return _item(0x1, GLOBAL, value, signed=True)
+def logical_maximum(value: int) -> bytes: return _item(0x2, GLOBAL, value, signed=True)
+def physical_minimum(value: int) -> bytes: return _item(0x3, GLOBAL, value, signed=True)
+def physical_maximum(value: int) -> bytes: return _item(0x4, GLOBAL, value, signed=True)
+def unit_exponent(exponent: int) -> bytes: return _item(0x5, GLOBAL, exponent & 0x0F)
+def unit(value: int) -> bytes: return _item(0x6, GLOBAL, value)
+def report_size(bits: int) -> bytes: return _item(0x7, GLOBAL, bits)
+def report_id(value: int) -> bytes: return _item(0x8, GLOBAL, value)
+def report_count(count: int) -> bytes: return _item(0x9, GLOBAL, count)
+def push() -> bytes: return _item(0xA, GLOBAL)
+def pop() -> bytes: return _item(0xB, GLOBAL)
+def usage(value: int) -> bytes: return _item(0x0, LOCAL, value)
+def usage_minimum(value: int) -> bytes: return _item(0x1, LOCAL, value)
+def usage_maximum(value: int) -> bytes: return _item(0x2, LOCAL, value)
+def input_(flags: int) -> bytes: return _item(0x8, MAIN, flags)
+def output(flags: int) -> bytes: return _item(0x9, MAIN, flags)
+def feature(flags: int) -> bytes: return _item(0xB, MAIN, flags)
+def collection(kind: int) -> bytes: return _item(0xA, MAIN, kind)
+def end_collection() -> bytes: return _item(0xC, MAIN)
+
+
+Items = Sequence[Union[bytes, Sequence[bytes]]]
+
+
+def build_descriptor(*items: Union[bytes, Items]) -> bytes:
+    """把条目（或条目列表）拼接为描述符"""
+    parts = []
+    for item in items:
+        parts.append(item if isinstance(item, bytes) else build_descriptor(*item))
+    return b''.join(parts)
+
+
+def report_lengths(descriptor: bytes) -> Tuple[int, int]:
+    """计算最长的输入/输出报告字节数（使用Report ID时包含ID字节）"""
+    bits: Dict[Tuple[int, int], int] = {}
+    size = count = rid = 0
+    stack = []
+    index = 0
+    while index < len(descriptor):
+        prefix = descriptor[index]
+        length = (0, 1, 2, 4)[prefix & 0x03]
+        value = int.from_bytes(descriptor[index + 1:index + 1 + length], 'little')
+        tag, item_type = prefix >> 4, prefix >> 2 & 0x03
+        if item_type == GLOBAL:
+            if tag == 0x7:
+                size = value
+            elif tag == 0x8:
+                rid = value
+            elif tag == 0x9:
+                count = value
+            elif tag == 0xA:
+                stack.append((size, count, rid))
+            elif tag == 0xB:
+                size, count, rid = stack.pop()
+        elif item_type == MAIN and tag in (0x8, 0x9):
+            bits[(tag, rid)] = bits.get((tag, rid), 0) + size * count
+        index += 1 + length
+
+    def longest(kind: int) -> int:
+        return max([(total + 7) // 8 + (1 if rid else 0)
+                    for (tag, rid), total in bits.items() if tag == kind] or [0])
+    return longest(0x8), longest(0x9)
+
+
+# ---------------------------------------------------------------------------
+# 描述符声明
+
+def buttons(count: int) -> List[bytes]:
+    return [usage_page(BUTTON_PAGE), usage_minimum(1), usage_maximum(count),
+            logical_minimum(0), logical_maximum(1),
+            report_count(count), report_size(1), input_(DATA_VAR_ABS)]
+
+
+def wheel_and_pan(multiplier: int = 1) -> List[bytes]:
+    """滚轮和水平滚轮（AC Pan）；multiplier > 1 时用 Resolution Multiplier 包装（高分辨率滚轮）"""
+    if multiplier <= 1:
+        return [usage(USAGE_WHEEL), logical_minimum(-127), logical_maximum(127),
+                report_size(8), report_count(1), input_(DATA_VAR_REL),
+                usage_page(CONSUMER_PAGE), usage(USAGE_AC_PAN), logical_minimum(-127), logical_maximum(127),
+                report_size(8), report_count(1), input_(DATA_VAR_REL)]
+    return [collection(LOGICAL),
+            usage(USAGE_RESOLUTION_MULTIPLIER), logical_minimum(0), logical_maximum(1),
+            physical_minimum(1), physical_maximum(multiplier), report_size(2), report_count(1),
+            push(), feature(DATA_VAR_ABS),
+            usage(USAGE_WHEEL), logical_minimum(-127), logical_maximum(127),
+            physical_minimum(0), physical_maximum(0), report_size(8), input_(DATA_VAR_REL),
+            end_collection(),
+            collection(LOGICAL),
+            usage(USAGE_RESOLUTION_MULTIPLIER), pop(), feature(DATA_VAR_ABS),
+            physical_minimum(0), physical_maximum(0), report_size(4), feature(CONST_VAR_ABS),
+            usage_page(CONSUMER_PAGE), usage(USAGE_AC_PAN), logical_minimum(-127), logical_maximum(127),
+            report_size(8), input_(DATA_VAR_REL),
+            end_collection()]
+
+
+def keyboard_descriptor() -> bytes:
+    """8字节键盘报告（修饰键、保留、6个键码）；1字节输出报告：Num/Caps/Scroll Lock、通用指示灯各1位，4位填充"""
+    return build_descriptor(
+        usage_page(GENERIC_DESKTOP), usage(USAGE_KEYBOARD), collection(APPLICATION),
+        usage_page(LED_PAGE), usage_minimum(1), usage_maximum(3),
+        logical_minimum(0), logical_maximum(1), report_size(1), report_count(3), output(DATA_VAR_ABS),
+        usage(USAGE_GENERIC_INDICATOR), report_count(1), output(DATA_VAR_ABS),
+        report_count(4), output(CONST_ARRAY_ABS),
+        usage_page(KEYBOARD_PAGE), usage_minimum(0xE0), usage_maximum(0xE7),
+        report_count(8), input_(DATA_VAR_ABS),
+        report_size(8), report_count(1), input_(CONST_ARRAY_ABS),
+        usage_minimum(0x00), usage_maximum(0x91), logical_maximum(255),
+        report_count(6), input_(DATA_ARRAY_ABS),
+        end_collection())
+
+
+def relative_mouse_descriptor(wheel_multiplier: int = 1) -> bytes:
+    """相对鼠标：8个按钮、X/Y（-127~127）、滚轮、水平滚轮"""
+    return build_descriptor(
+        usage_page(GENERIC_DESKTOP), usage(USAGE_MOUSE), collection(APPLICATION),
+        buttons(8),
+        usage_page(GENERIC_DESKTOP), usage(USAGE_X), usage(USAGE_Y),
+        logical_minimum(-127), logical_maximum(127), report_size(8), report_count(2), input_(DATA_VAR_REL),
+        wheel_and_pan(wheel_multiplier),
+        end_collection())
+
+
+def absolute_mouse_descriptor(wheel_multiplier: int = 1) -> bytes:
+    """绝对鼠标：8个按钮、X/Y（0~32767）、滚轮、水平滚轮"""
+    return build_descriptor(
+        usage_page(GENERIC_DESKTOP), usage(USAGE_MOUSE), collection(APPLICATION),
+        buttons(8),
+        usage_page(GENERIC_DESKTOP), usage(USAGE_X), usage(USAGE_Y),
+        logical_minimum(0), logical_maximum(32767), report_size(16), report_count(2), input_(DATA_VAR_ABS),
+        wheel_and_pan(wheel_multiplier),
+        end_collection())
+
+
+def consumer_descriptor() -> bytes:
+    """媒体键（Consumer Control，报告1：一个16位用途）和电源键（System Control，报告2：关机/睡眠/唤醒位）"""
+    return build_descriptor(
+        usage_page(CONSUMER_PAGE), usage(USAGE_CONSUMER_CONTROL), collection(APPLICATION),
+        report_id(CONSUMER_REPORT_ID), logical_minimum(0), logical_maximum(CONSUMER_USAGE_MAX),
+        usage_minimum(0), usage_maximum(CONSUMER_USAGE_MAX), report_size(16), report_count(1),
+        input_(DATA_ARRAY_ABS),
+        end_collection(),
+        usage_page(GENERIC_DESKTOP), usage(USAGE_SYSTEM_CONTROL), collection(APPLICATION),
+        report_id(SYSTEM_REPORT_ID), usage_minimum(USAGE_SYSTEM_POWER_DOWN), usage_maximum(USAGE_SYSTEM_WAKE_UP),
+        logical_minimum(0), logical_maximum(1), report_size(1), report_count(3), input_(DATA_VAR_ABS),
+        report_count(5), input_(CONST_ARRAY_ABS),
+        end_collection())
+
+
+def touch_descriptor(width_mm: int = 344, height_mm: int = 194) -> bytes:
+    """多点触控屏（并行模式）：报告1为10个触点（状态位、触点ID、X/Y 0~32767）加有效触点数，
+    特征报告2为最大触点数；物理尺寸只影响被控机的手势阈值，默认按15.6英寸16:9屏声明"""
+    contact = [
+        usage(USAGE_FINGER), collection(LOGICAL),
+        usage(USAGE_TIP_SWITCH), usage(USAGE_CONFIDENCE), logical_minimum(0), logical_maximum(1),
+        report_size(1), report_count(2), input_(DATA_VAR_ABS),
+        report_count(6), input_(CONST_ARRAY_ABS),
+        usage(USAGE_CONTACT_IDENTIFIER), logical_maximum(TOUCH_MAX_CONTACTS - 1),
+        report_size(8), report_count(1), input_(DATA_VAR_ABS),
+        push(), usage_page(GENERIC_DESKTOP), unit_exponent(-3), unit(0x11),  # 厘米 x 10^-3 -> 0.01mm
+        usage(USAGE_X), logical_maximum(ABSOLUTE_MAX), physical_maximum(width_mm * 100),
+        report_size(16), input_(DATA_VAR_ABS),
+        usage(USAGE_Y), physical_maximum(height_mm * 100), input_(DATA_VAR_ABS),
+        pop(),
+        end_collection(),
+    ]
+    return build_descriptor(
+        usage_page(DIGITIZER_PAGE), usage(USAGE_TOUCH_SCREEN), collection(APPLICATION),
+        report_id(TOUCH_REPORT_ID),
+        [contact] * TOUCH_MAX_CONTACTS,
+        usage(USAGE_CONTACT_COUNT), logical_minimum(0), logical_maximum(TOUCH_MAX_CONTACTS),
+        report_size(8), report_count(1), input_(DATA_VAR_ABS),
+        report_id(TOUCH_FEATURE_REPORT_ID),
+        usage(USAGE_CONTACT_COUNT_MAXIMUM), feature(DATA_VAR_ABS),
+        end_collection())
+
+
+# ---------------------------------------------------------------------------
+# gadget 配置
+
+@dataclass
+class HidFunction:
+    """一个HID功能（configfs中的 functions/hid.<name>，也是端点映射中的键）"""
+    name: str
+    descriptor: bytes
+    protocol: int = 0
+    subclass: int = 0
+    interval_ms: Optional[float] = 1.0  # 中断端点轮询间隔；内核不支持 interval 属性时保持默认
+
+    @property
+    def report_length(self) -> int:
+        return max(report_lengths(self.descriptor))
+
+    @property
+    def directory(self) -> str:
+        return f"functions/hid.{self.name}"
+
+
+@dataclass
+class MassStorageFunction:
+    """大容量存储功能，LUN 初始没有介质（见 module.mass_storage）"""
+    name: str = 'usb0'
+    removable: bool = True
+    read_only: bool = True
+
+    @property
+    def directory(self) -> str:
+        return f"functions/mass_storage.{self.name}"
+
+
+@dataclass
+class GadgetConfig:
+    name: str = 'g1'
+    vendor_id: int = 0x1d6b    # Linux Foundation
+    product_id: int = 0x0104   # Multifunction Composite Gadget
+    bcd_device: int = 0x0100
+    bcd_usb: int = 0x0200
+    serial: str = '6b65796d696d6570690'
+    manufacturer: str = 'tinypilot'
+    product: str = 'Multifunction USB Device'
+    configuration: str = 'Config 1: ECM network'
+    max_power: int = 250
+    remote_wakeup: bool = True  # 允许被控机睡眠后由gadget唤醒（唤醒键）
+    wheel_resolution_multiplier: int = 1
+    functions: List[Union[HidFunction, MassStorageFunction]] = field(default_factory=list)
+
+
+def default_config(wheel_multiplier: int = 1, mass_storage: bool = True,
+                   interval_ms: Optional[float] = 1.0, consumer: bool = True,
+                   touch: bool = False) -> GadgetConfig:
+    """键盘 + 相对鼠标 + 绝对鼠标（+ 媒体/电源键 + 多点触控屏 + 大容量存储）"""
+    functions = [
+        HidFunction('keyboard', keyboard_descriptor(), protocol=1, subclass=1, interval_ms=interval_ms),
+        HidFunction('mouse_relative', relative_mouse_descriptor(wheel_multiplier), interval_ms=interval_ms),
+        HidFunction('mouse_absolute', absolute_mouse_descriptor(wheel_multiplier), interval_ms=interval_ms),
+    ]
+    if consumer:
+        functions.append(HidFunction('consumer', consumer_descriptor(), interval_ms=interval_ms))
+    if touch:
+        functions.append(HidFunction('touch', touch_descriptor(), interval_ms=interval_ms))
+    if mass_storage:
+        functions.append(MassStorageFunction())
+    return GadgetConfig(wheel_resolution_multiplier=wheel_multiplier, functions=functions)
+
+
+def interval_value(interval_ms: float, high_speed: bool) -> int:
+    """bInterval：高速端点为 2^(bInterval-1) 个125us微帧，全速端点为毫秒数
+
+    f_hid 把 interval 属性原样写入全速和高速两套端点描述符，而链路速度要到主机枚举时才确定，
+    这里只能按UDC的最高速度选择一种单位。高速UDC经全速集线器/切换器连接时，主机按毫秒解释
+    同一个值（1ms -> bInterval 4 -> 全速下4ms），setup() 会在日志中给出这种情况下的实际间隔。
+    """
+    if high_speed:
+        return max(1, min(16, 1 + round(math.log2(max(interval_ms * 8, 1)))))
+    return max(1, min(255, round(interval_ms)))
+
+
+def polling_interval_ms(value: int, high_speed: bool) -> float:
+    """interval_value 的逆运算：链路速度下 bInterval 对应的轮询间隔（毫秒）"""
+    return 2 ** (value - 1) * 0.125 if high_speed else float(value)
+
+
+class GadgetManager:
+    """把 GadgetConfig 写入 configfs 并绑定到UDC"""
+
+    def __init__(self, config: GadgetConfig, root: str = CONFIGFS_ROOT,
+                 endpoint_map_path: str = ENDPOINT_MAP_PATH):
+        self.config = config
+        self.gadget_dir = os.path.join(root, config.name)
+        self.endpoint_map_path = endpoint_map_path
+
+    @property
+    def config_dir(self) -> str:
+        return os.path.join(self.gadget_dir, 'configs', 'c.1')
+
+    def _path(self, *parts: str) -> str:
+        return os.path.join(self.gadget_dir, *parts)
+
+    def _write(self, relative: str, value: Union[str, int, bytes]) -> None:
+        path = self._path(relative)
+        if isinstance(value, bytes):
+            with open(path, 'wb') as f:
+                f.write(value)
+        else:
+            with open(path, 'w') as f:
+                f.write(f"{value}\n")
+
+    def _read(self, relative: str) -> str:
+        try:
+            with open(self._path(relative)) as f:
+                return f.read().strip()
+        except OSError:
+            return ''
+
+    # 绑定 ---------------------------------------------------------------
+
+    def bound_udc(self) -> str:
+        return self._read('UDC')
+
+    def unbind(self) -> None:
+        if self.bound_udc():
+            self._write('UDC', '')
+
+    def bind(self, udc: Optional[str] = None) -> str:
+        udc = udc or available_udc()
+        if not udc:
+            raise OSError(f"没有可用的UDC（{UDC_CLASS_DIR} 为空）")
+        self._write('UDC', udc)
+        return udc
+
+    # 配置 ---------------------------------------------------------------
+
+    def setup(self, udc: Optional[str] = None) -> Dict:
+        """创建或更新gadget并绑定（已绑定时先解绑），返回端点映射"""
+        start = time.perf_counter()
+        self.unbind()
+        udc = udc or available_udc()
+        high_speed = is_high_speed(udc)
+        self._apply(high_speed)
+        self._log_full_speed_interval(high_speed)
+        udc = self.bind(udc)
+        endpoint_map = self._publish_endpoint_map(udc)
+        logger.info(f"USB gadget 已配置并绑定到 {udc}，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return endpoint_map
+
+    def reconfigure(self, config: GadgetConfig, udc: Optional[str] = None) -> Dict:
+        """运行时替换配置（描述符、轮询间隔、功能增减）：解绑、更新、重新绑定"""
+        udc = udc or self.bound_udc() or None
+        self.config = config
+        return self.setup(udc)
+
+    def _apply(self, high_speed: bool) -> None:
+        config = self.config
+        os.makedirs(self.gadget_dir, exist_ok=True)
+        self._write('idVendor', f"0x{config.vendor_id:04x}")
+        self._write('idProduct', f"0x{config.product_id:04x}")
+        self._write('bcdDevice', f"0x{config.bcd_device:04x}")
+        self._write('bcdUSB', f"0x{config.bcd_usb:04x}")
+        os.makedirs(self._path('strings', '0x409'), exist_ok=True)
+        self._write('strings/0x409/serialnumber', config.serial)
+        self._write('strings/0x409/manufacturer', config.manufacturer)
+        self._write('strings/0x409/product', config.product)
+        os.makedirs(os.path.join(self.config_dir, 'strings', '0x409'), exist_ok=True)
+        self._write('configs/c.1/MaxPower', config.max_power)
+        self._write('configs/c.1/bmAttributes', f"0x{0xA0 if config.remote_wakeup else 0x80:02x}")
+        self._write('configs/c.1/strings/0x409/configuration', config.configuration)
+
+        wanted = {function.directory for function in config.functions}
+        self._remove_stale_functions(wanted)
+        changes = {}
+        for function in config.functions:
+            os.makedirs(self._path(function.directory), exist_ok=True)
+            if isinstance(function, HidFunction):
+                changes[function.directory] = self._changed_hid_attributes(function, high_speed)
+        if any(changes.values()):
+            # f_hid 在功能链接到配置中时拒绝修改属性（EBUSY）：先取消全部链接，写完后按顺序重新链接
+            self._unlink_functions()
+        for function in config.functions:
+            if isinstance(function, HidFunction):
+                for relative, value in changes[function.directory].items():
+                    self._write(relative, value)
+            else:
+                self._write(f"{function.directory}/lun.0/removable", int(function.removable))
+                if not self._read(f"{function.directory}/lun.0/file"):
+                    self._write(f"{function.directory}/lun.0/ro", int(function.read_only))
+            link = os.path.join(self.config_dir, os.path.basename(function.directory))
+            if not os.path.islink(link):
+                os.symlink(self._path(function.directory), link)
+
+    def _log_full_speed_interval(self, high_speed: bool) -> None:
+        """按高速单位写入的 bInterval 在全速链路上被当作毫秒数，间隔变长时提示"""
+        if not high_speed:
+            return
+        for requested in sorted({f.interval_ms for f in self.config.functions
+                                 if isinstance(f, HidFunction) and f.interval_ms is not None}):
+            value = interval_value(requested, True)
+            full_speed = polling_interval_ms(value, False)
+            if full_speed > requested:
+                logger.info(f"HID轮询间隔 {requested:g}ms 按高速写入 bInterval={value}；"
+                            f"若被控机以全速枚举，实际间隔为 {full_speed:g}ms")
+
+    def _changed_hid_attributes(self, function: HidFunction, high_speed: bool) -> Dict[str, Union[int, bytes]]:
+        """HID功能中与目标值不同的属性（相对路径 -> 值）"""
+        directory = function.directory
+        wanted = {
+            f"{directory}/protocol": function.protocol,
+            f"{directory}/subclass": function.subclass,
+            f"{directory}/report_length": function.report_length,
+            f"{directory}/report_desc": function.descriptor,
+        }
+        if function.interval_ms is not None:
+            if os.path.exists(self._path(directory, 'interval')):
+                wanted[f"{directory}/interval"] = interval_value(function.interval_ms, high_speed)
+            else:
+                logger.debug(f"内核不支持 {directory}/interval，保持默认轮询间隔")
+        changed = {}
+        for relative, value in wanted.items():
+            if isinstance(value, bytes):
+                try:
+                    with open(self._path(relative), 'rb') as f:
+                        current_matches = f.read() == value
+                except OSError:
+                    current_matches = False
+            else:
+                current_matches = self._read(relative) == str(value)
+            if not current_matches:
+                changed[relative] = value
+        return changed
+
+    def _unlink_functions(self) -> None:
+        """删除配置中的全部功能链接（功能目录保留）"""
+        if not os.path.isdir(self.config_dir):
+            return
+        for name in os.listdir(self.config_dir):
+            link = os.path.join(self.config_dir, name)
+            if os.path.islink(link):
+                os.unlink(link)
+
+    def _remove_stale_functions(self, wanted) -> None:
+        """删除配置中不再需要的功能（先删除配置中的链接）"""
+        functions_dir = self._path('functions')
+        if not os.path.isdir(functions_dir):
+            return
+        for name in os.listdir(functions_dir):
+            directory = f"functions/{name}"
+            if directory in wanted:
+                continue
+            link = os.path.join(self.config_dir, name)
+            if os.path.islink(link):
+                os.unlink(link)
+            os.rmdir(self._path(directory))
+            logger.info(f"已删除功能: {name}")
+
+    def teardown(self) -> None:
+        """解绑并删除整个gadget（configfs要求按创建的相反顺序删除）"""
+        if not os.path.isdir(self.gadget_dir):
+            return
+        self.unbind()
+        self._unlink_functions()
+        os.rmdir(os.path.join(self.config_dir, 'strings', '0x409'))
+        os.rmdir(self.config_dir)
+        for name in os.listdir(self._path('functions')):
+            os.rmdir(self._path('functions', name))
+        os.rmdir(self._path('strings', '0x409'))
+        os.rmdir(self.gadget_dir)
+        if os.path.exists(self.endpoint_map_path):
+            os.unlink(self.endpoint_map_path)
+
+    # 端点映射 -------------------------------------------------------------
+
+    def _device_node(self, function: HidFunction) -> str:
+        """由功能的 dev（主:次设备号）找到 /dev/hidgN"""
+        dev = self._read(f"{function.directory}/dev")
+        if dev:
+            try:
+                with open(f"/sys/dev/char/{dev}/uevent") as f:
+                    for line in f:
+                        if line.startswith('DEVNAME='):
+                            return '/dev/' + line.strip().split('=', 1)[1]
+            except OSError:
+                pass
+            return f"/dev/hidg{dev.split(':')[1]}"
+        return DEFAULT_DEVICE_PATHS.get(function.name, '')
+
+    def endpoint_map(self, udc: str = '') -> Dict:
+        devices = {}
+        report_length = {}
+        mass_storage = ''
+        for function in self.config.functions:
+            if isinstance(function, HidFunction):
+                devices[function.name] = self._device_node(function)
+                report_length[function.name] = function.report_length
+            else:
+                mass_storage = self._path(function.directory)
+        return {
+            'udc': udc,
+            'devices': devices,
+            'report_lengths': report_length,
+            'mass_storage': mass_storage,
+            'wheel_resolution_multiplier': self.config.wheel_resolution_multiplier,
+        }
+
+    def _publish_endpoint_map(self, udc: str) -> Dict:
+        endpoint_map = self.endpoint_map(udc)
+        _wait_for_devices(endpoint_map['devices'].values())
+        os.makedirs(os.path.dirname(self.endpoint_map_path), exist_ok=True)
+        tmp_path = self.endpoint_map_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(endpoint_map, f, indent=1)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.endpoint_map_path)
+        return endpoint_map
+
+
+def available_udc() -> str:
+    try:
+        names = sorted(os.listdir(UDC_CLASS_DIR))
+    except OSError:
+        return ''
+    return names[0] if names else ''
+
+
+def is_high_speed(udc: Optional[str]) -> bool:
+    if not udc:
+        return True
+    try:
+        with open(os.path.join(UDC_CLASS_DIR, udc, 'maximum_speed')) as f:
+            return f.read().strip() in ('high-speed', 'super-speed', 'super-speed-plus')
+    except OSError:
+        return True
+
+
+def request_remote_wakeup(udc: str) -> bool:
+    """请求唤醒已挂起的主机（UDC的 srp 属性），不支持时返回False"""
+    path = os.path.join(UDC_CLASS_DIR, udc, 'srp') if udc else ''
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        with open(path, 'w') as f:
+            f.write('1\n')
+        return True
+    except OSError as e:
+        logger.warning(f"远程唤醒失败: {e}")
+        return False
+
+
+def _wait_for_devices(paths) -> None:
+    """等待设备节点出现并开放读写权限（与原脚本的 chmod 一致）"""
+    deadline = time.monotonic() + DEVICE_NODE_TIMEOUT
+    for path in paths:
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        try:
+            os.chmod(path, 0o666)
+        except OSError as e:
+            logger.warning(f"无法设置 {path} 的权限: {e}")
+
+
+def wheel_multiplier_from_env() -> int:
+    """读取环境变量中的高分辨率滚轮倍数；值无效时记录警告并使用1（普通滚轮）"""
+    value = os.environ.get(WHEEL_MULTIPLIER_ENV, '1')
+    try:
+        multiplier = int(value)
+    except ValueError:
+        logger.warning(f"{WHEEL_MULTIPLIER_ENV} 的值 {value!r} 无效，使用默认值 1")
+        return 1
+    if multiplier < 1:
+        logger.warning(f"{WHEEL_MULTIPLIER_ENV} 的值 {value!r} 小于1，使用默认值 1")
+        return 1
+    return multiplier
+
+
+def load_endpoint_map(path: str = ENDPOINT_MAP_PATH) -> Dict:
+    """读取端点映射；不存在或损坏时返回默认设备路径"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            endpoint_map = json.load(f)
+    except FileNotFoundError:
+        endpoint_map = {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"端点映射读取失败，使用默认设备路径: {e}")
+        endpoint_map = {}
+    devices = dict(DEFAULT_DEVICE_PATHS)
+    devices.update(endpoint_map.get('devices', {}))
+    endpoint_map['devices'] = devices
+    return endpoint_map
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="USB gadget 配置")
+    parser.add_argument('command', choices=('setup', 'reconfigure', 'teardown', 'show'))
+    parser.add_argument('--udc', help='UDC名称（默认第一个）')
+    parser.add_argument('--wheel-multiplier', type=int,
+                        default=wheel_multiplier_from_env(),
+                        help='高分辨率滚轮倍数，1为普通滚轮')
+    parser.add_argument('--interval-ms', type=float, default=float(os.environ.get('KVM_HID_INTERVAL_MS', '1')),
+                        help='HID中断端点轮询间隔（毫秒）')
+    parser.add_argument('--no-mass-storage', action='store_true',
+                        default=os.environ.get('KVM_MASS_STORAGE', '1') == '0')
+    parser.add_argument('--no-consumer', action='store_true',
+                        default=os.environ.get('KVM_CONSUMER_CONTROL', '1') == '0',
+                        help='不创建媒体/电源键功能')
+    parser.add_argument('--touch', action='store_true',
+                        default=os.environ.get('KVM_TOUCH', '0') == '1',
+                        help='创建多点触控屏功能（平板、触屏优先的被控机）')
+    parser.add_argument('--endpoint-map', default=ENDPOINT_MAP_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = default_config(args.wheel_multiplier, not args.no_mass_storage, args.interval_ms,
+                            consumer=not args.no_consumer, touch=args.touch)
+    manager = GadgetManager(config, endpoint_map_path=args.endpoint_map)
+    if args.command == 'show':
+        for function in config.functions:
+            if isinstance(function, HidFunction):
+                print(f"{function.name}: report_length={function.report_length} "
+                      f"descriptor={function.descriptor.hex()}")
+        print(json.dumps(load_endpoint_map(args.endpoint_map), indent=1))
+        return 0
+    if args.command == 'teardown':
+        manager.teardown()
+        return 0
+    subprocess.run(['modprobe', 'libcomposite'], check=False)
+    if args.command == 'reconfigure':
+        endpoint_map = manager.reconfigure(config, args.udc)
+    else:
+        endpoint_map = manager.setup(args.udc)
+    print(json.dumps(endpoint_map, indent=1))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
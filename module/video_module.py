@@ -1,34 +1,61 @@
 import os
 from datetime import datetime
-from PyQt5.QtCore import QTimer, QSettings
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QMessageBox, QFileDialog
 from PyQt5.QtMultimedia import QCamera, QCameraInfo, QCameraViewfinderSettings, QCameraImageCapture
-from PyQt5.QtMultimediaWidgets import QCameraViewfinder
 import logging
+from module.frame_timing import FrameTimingMonitor
 
 class VideoHandler:
-    def __init__(self, main_window, central_widget):
+    def __init__(self, main_window, central_widget, config_store=None):
         self.main_window = main_window
         self.central_widget = central_widget
         self.camera = None
         self.camera_started = False
         self.image_capture = None
-        self.online_webcams = QCameraInfo.availableCameras()
+        self.online_webcams = []  # 由refresh_input_devices枚举（启动时只枚举一次）
         self.camera_config = {
             'device_No': 0,
             'resolution_X': 1280,
             'resolution_Y': 720,
-            'device_name': []
+            'device_name': ''
         }
-        self.settings = QSettings("YourCompany", "YourApp")
-        self.save_path = self.settings.value("save_path", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Screenshots"))
+        self.full_frame_rate = 30
+        self.active_mode = None  # 正在采集的 (宽, 高, 帧率)，自适应采集可能低于camera_config
+        # 帧时序统计（采集时间戳、解码、呈现、丢帧、有效帧率）
+        self.frame_monitor = FrameTimingMonitor(main_window, central_widget, target_fps=30)
+        self.config_store = config_store
+        self.save_path = (config_store and config_store.config.save_path) or \
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "Screenshots")
+        # 截图库：采集写入 incoming/，保存后在后台去重、生成缩略图并写入索引。
+        # 首次使用时创建并在后台打开（get_screenshot_store），numpy和SQLite索引不在启动路径上
+        self.screenshot_store = None
+        self.on_screenshot_store_created = None  # 回调(截图库)，在创建后、打开前连接信号
+        self.remote_capture = None  # 多进程模式下由采集进程采集（set_remote_capture）
+
+    def set_remote_capture(self, remote):
+        """多进程模式：摄像头在采集进程中打开，本进程只显示共享内存中的帧"""
+        self.remote_capture = remote
+        remote.frame_ready.connect(self.frame_monitor.feed)
+        remote.view.installEventFilter(self.frame_monitor)  # 呈现时间按覆盖画面的绘制计算
+        remote.failed.connect(self.alert)
 
     def refresh_input_devices(self):
         self.online_webcams = QCameraInfo.availableCameras()
+        # 设备列表可能重新排序，按设备路径修正当前设备序号
+        for index, camera in enumerate(self.online_webcams):
+            if camera.deviceName() == self.camera_config['device_name']:
+                self.camera_config['device_No'] = index
+                break
         return self.online_webcams
 
+    def is_current_device_present(self):
+        device_name = self.camera_config['device_name']
+        return any(camera.deviceName() == device_name for camera in self.online_webcams)
+
     def select_camera(self, index):
         self.camera_config['device_No'] = index
+        self.camera_config['device_name'] = self.online_webcams[index].deviceName()
         try:
             self.set_webcam(True)
             return True
@@ -37,6 +64,8 @@ class VideoHandler:
             return False
 
     def set_webcam(self, s):
+        if self.remote_capture:
+            return self._set_remote_webcam(s)
         if s:
             try:
                 if self.camera:
@@ -51,8 +80,11 @@ class VideoHandler:
                 
                 view_finder_settings = QCameraViewfinderSettings()
                 view_finder_settings.setResolution(self.camera_config['resolution_X'], self.camera_config['resolution_Y'])
-                view_finder_settings.setMinimumFrameRate(30)
+                view_finder_settings.setMinimumFrameRate(self.full_frame_rate)
                 self.camera.setViewfinderSettings(view_finder_settings)
+                self.active_mode = (self.camera_config['resolution_X'], self.camera_config['resolution_Y'],
+                                    self.full_frame_rate)
+                self.frame_monitor.attach(self.camera, view_finder_settings.minimumFrameRate())
                 
                 self.image_capture = QCameraImageCapture(self.camera)
                 self.image_capture.setCaptureDestination(QCameraImageCapture.CaptureToFile)
@@ -76,22 +108,38 @@ class VideoHandler:
                 self.camera = None
             if self.image_capture:
                 self.image_capture = None
+            self.active_mode = None
             logging.info("摄像头已停止")
             self.camera_started = False
             return True
         
+    def _set_remote_webcam(self, s):
+        if s:
+            mode = (self.camera_config['resolution_X'], self.camera_config['resolution_Y'], self.full_frame_rate)
+            self.remote_capture.open_camera(self.camera_config['device_name'], *mode)
+            self.active_mode = mode
+            self.frame_monitor.reset()
+            self.frame_monitor.set_target_fps(self.full_frame_rate)
+            logging.info("已请求采集进程启动摄像头")
+        else:
+            self.remote_capture.close_camera()
+            self.active_mode = None
+            logging.info("摄像头已停止")
+        self.camera_started = bool(s)
+        return True
+
     def is_camera_started(self):
         return self.camera_started
 
 
     def take_screenshot(self):
+        if self.remote_capture:
+            return self._take_remote_screenshot()
         if not self.camera or not self.image_capture:
             QMessageBox.warning(self.central_widget, "警告", "请先选择输入设备", QMessageBox.Ok)
             return "请先选择输入设备"
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_name = f"screenshot_{timestamp}.jpg"
-        capture_path = os.path.join(self.save_path, file_name)
+        capture_path = self.get_screenshot_store().staging_path(datetime.now().strftime("%Y%m%d_%H%M%S_%f"))
 
         try:
             self.image_capture.capture(capture_path)
@@ -100,21 +148,56 @@ class VideoHandler:
             logging.error(f"截图时出错: {e}")
             return f"截图失败: {str(e)}"
 
+    def _take_remote_screenshot(self):
+        image = self.remote_capture.latest_image() if self.camera_started else None
+        if image is None or image.isNull():
+            QMessageBox.warning(self.central_widget, "警告", "请先选择输入设备", QMessageBox.Ok)
+            return "请先选择输入设备"
+        capture_path = self.get_screenshot_store().staging_path(datetime.now().strftime("%Y%m%d_%H%M%S_%f"))
+        if not image.save(capture_path, "JPG", 95):
+            logging.error(f"截图保存失败: {capture_path}")
+            return f"截图失败: {capture_path}"
+        self.on_image_saved(0, capture_path)
+        return f"正在保存图片: {capture_path}"
+
     def set_save_path(self):
         new_path = QFileDialog.getExistingDirectory(self.main_window, "选择保存路径", self.save_path)
         if new_path:
             self.save_path = new_path
-            self.settings.setValue("save_path", self.save_path)
+            if self.config_store:
+                self.config_store.update(save_path=self.save_path)
             
-            if not os.access(self.save_path, os.W_OK):
+            if not os.access(self.save_path, os.W_OK) or \
+                    (self.screenshot_store is not None and not self._open_screenshot_store()):
                 logging.warning(f"无法写入选择的路径: {self.save_path}")
                 return f"无法写入选择的路径: {self.save_path}\n请选择其他路径或检查权限。"
             return f"文件保存路径已更新: {self.save_path}"
         return None
 
+    def get_screenshot_store(self):
+        """截图库（首次调用时创建并在后台打开）"""
+        if self.screenshot_store is None:
+            from module.screenshot_store import ScreenshotStore
+            self.screenshot_store = ScreenshotStore(self.main_window)
+            if self.on_screenshot_store_created:
+                self.on_screenshot_store_created(self.screenshot_store)
+            self._open_screenshot_store()
+        return self.screenshot_store
+
+    def _open_screenshot_store(self):
+        """在后台打开截图库；数据库错误由 screenshot_store.open_failed 通知"""
+        try:
+            self.screenshot_store.open_async(self.save_path)
+            return True
+        except OSError as e:
+            logging.error(f"打开截图库失败: {e}")
+            return False
+
     def on_image_saved(self, id, filename):
         logging.info(f"图像已保存，ID: {id}, 文件名: {filename}")
         if os.path.exists(filename):
+            target = self.config_store.config.active_profile if self.config_store else ''
+            self.get_screenshot_store().add_async(filename, target)  # 结果由 screenshot_store.stored 通知
             return f"截图已保存: {filename}"
         else:
             return "图片保存失败"
@@ -135,10 +218,46 @@ class VideoHandler:
     def update_resolution(self, width, height):
         self.camera_config['resolution_X'] = width
         self.camera_config['resolution_Y'] = height
-        if self.camera:
+        if self.camera or (self.remote_capture and self.camera_started):
             self.set_webcam(True)
 
 
+    def apply_capture_mode(self, width, height, fps):
+        """在运行中的摄像头上切换取景器设置（不卸载设备、不重建QCamera）"""
+        if self.active_mode == (width, height, fps):
+            return False
+        if self.remote_capture and self.camera_started:
+            self.remote_capture.set_mode(width, height, fps)
+            self.active_mode = (width, height, fps)
+            self.frame_monitor.set_target_fps(fps)
+            logging.info(f"采集模式: {width}x{height} @ {fps:g}fps")
+            return True
+        if not self.camera:
+            return False
+        view_finder_settings = QCameraViewfinderSettings()
+        view_finder_settings.setResolution(width, height)
+        view_finder_settings.setMinimumFrameRate(fps)
+        view_finder_settings.setMaximumFrameRate(fps)
+        self.camera.setViewfinderSettings(view_finder_settings)
+        self.active_mode = (width, height, fps)
+        self.frame_monitor.set_target_fps(fps)
+        logging.info(f"采集模式: {width}x{height} @ {fps:g}fps")
+        return True
+
+    def export_frame_timing(self):
+        """导出帧时序统计到保存目录，返回状态栏摘要"""
+        summary = self.frame_monitor.summary_text()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.save_path, f"frame_timing_{timestamp}.json")
+        try:
+            os.makedirs(self.save_path, exist_ok=True)
+            self.frame_monitor.dump_json(path)
+        except OSError as e:
+            logging.error(f"导出帧时序失败: {e}")
+            return summary
+        logging.info(f"帧时序已导出: {path}")
+        return f"{summary} | 已导出: {path}"
+
     def get_camera_config(self):
         return self.camera_config
 
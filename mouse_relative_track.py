@@ -8,6 +8,7 @@ from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QPushButton, QVBo
 from PyQt5.QtCore import Qt, pyqtSignal, QObject, QPoint
 from PyQt5.QtGui import QKeySequence, QCursor
 from PyQt5.QtWidgets import QShortcut
+from module.scroll_engine import ScrollEngine
 
 MOUSE_RELATIVE_DEVICE = '/dev/hidg1'
 
@@ -54,6 +55,9 @@ class MouseCaptureWidget(QWidget):
         
         # 添加移动灵敏度设置
         self.sensitivity = 2.0  # 可以根据需要调整这个值
+        # 滚轮与KVM主程序使用同一个滚轮引擎（累积小数滚动量，支持水平滚动）
+        self.scroll_engine = ScrollEngine(
+            lambda wheel, pan: self.send_mouse_relative_report(self.buttons, 0, 0, wheel, pan), parent=self)
         
     def keyPressEvent(self, event):
         # 允许Ctrl+Q事件传递给父窗口
@@ -142,8 +146,8 @@ class MouseCaptureWidget(QWidget):
         if not self.running:
             return
             
-        wheel_delta = event.angleDelta().y() // 120
-        self.send_mouse_relative_report(self.buttons, 0, 0, wheel_delta)
+        angle = event.angleDelta()
+        self.scroll_engine.add(angle.x(), angle.y())
 
     def send_mouse_relative_report(self, buttons, dx, dy, wheel=0, pan=0):
         buttons = buttons & 0xFF
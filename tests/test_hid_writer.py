@@ -0,0 +1,22 @@
+import os
+
+from module.hid_writer import HidReportWriter
+
+REPORT = bytes([0x02, 0, 0x04, 0, 0, 0, 0, 0])
+
+
+def test_unpaced_burst_writes_every_report_and_taps():
+    read_fd, write_fd = os.pipe()
+    writer = HidReportWriter(write_fd, name='pipe')
+    try:
+        assert writer.write_burst([REPORT] * 4, interval=0) == 4
+        assert os.read(read_fd, 64) == REPORT * 4
+        tapped = []
+        writer.tap = tapped.append
+        writer.write_burst([REPORT, REPORT], interval=0)
+        assert tapped == [REPORT, REPORT]
+        assert os.read(read_fd, 64) == REPORT * 2
+        assert writer.get_stats()['reports_sent'] == 6
+    finally:
+        writer.close()
+        os.close(read_fd)
@@ -0,0 +1,83 @@
+import time
+
+from PyQt5.QtCore import Qt
+
+from module.hid_reports import KeyboardReport
+from module.keyboard_module import EMPTY_REPORT, KeyboardHandler
+
+
+class RecordingDevice:
+    def __init__(self):
+        self.reports = []
+
+    def write(self, report):
+        self.reports.append(bytes(report))
+        return len(report)
+
+    def flush(self):
+        pass
+
+
+def run_until_sent(qapp, handler, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while handler.has_pending_reports() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.001)
+    assert not handler.has_pending_reports()
+
+
+def test_send_text_returns_before_reports_are_written(qapp):
+    device = RecordingDevice()
+    handler = KeyboardHandler(device)
+    handler.set_paste_interval(0.005)
+    device.reports.clear()  # 初始化时的空报告
+    sent = []
+    handler.text_sent.connect(sent.append)
+
+    start = time.perf_counter()
+    assert handler.send_text('abc') == 3
+    assert time.perf_counter() - start < 0.005
+    assert device.reports == []
+
+    run_until_sent(qapp, handler)
+    assert len(device.reports) == 6
+    assert device.reports[1::2] == [EMPTY_REPORT] * 3
+    assert sent == [3]
+
+
+def test_shortcut_is_queued_behind_paste(qapp):
+    device = RecordingDevice()
+    handler = KeyboardHandler(device)
+    handler.set_paste_interval(0)
+    device.reports.clear()
+    handler.send_text('a')
+    handler.send_shortcut('Ctrl+Alt+Del')
+    run_until_sent(qapp, handler)
+    assert len(device.reports) == 4
+    assert device.reports[2][0] == 0x05  # Ctrl+Alt 在粘贴的字符释放之后按下
+    assert device.reports[3] == EMPTY_REPORT
+
+
+def test_keyboard_report_slots_keep_press_order():
+    report = KeyboardReport()
+    for code in (4, 5, 6):
+        assert report.press(code)
+    report.release(5)
+    assert bytes(report.build(0x02)) == bytes([0x02, 0, 4, 6, 0, 0, 0, 0])
+    for code in (7, 8, 9, 10):
+        assert report.press(code)
+    assert not report.press(11)
+    assert KeyboardReport.pack(0x01, [4, 5]) == bytes([0x01, 0, 4, 5, 0, 0, 0, 0])
+    assert bytes(report.build(0)) == bytes([0, 0, 4, 6, 7, 8, 9, 10])  # pack 不影响槽位
+
+
+def test_handler_reports_track_pressed_keys(qapp):
+    device = RecordingDevice()
+    handler = KeyboardHandler(device)
+    device.reports.clear()
+    handler.handle_key(Qt.Key_A, 'a', True)
+    handler.handle_key(Qt.Key_B, 'b', True)
+    handler.handle_key(Qt.Key_A, 'a', False)
+    assert device.reports[-1] == bytes([0, 0, 0x05, 0, 0, 0, 0, 0])
+    handler.handle_key(Qt.Key_B, 'b', False)
+    assert device.reports[-1] == EMPTY_REPORT
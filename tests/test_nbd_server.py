@@ -0,0 +1,201 @@
+import os
+import socket
+import struct
+
+import pytest
+
+from module import nbd_server as nbd
+from module.disk_image import RAW_FLAG, ChunkedImage, RawImage, compress_image, open_image
+
+CHUNK_SIZE = 64 * 1024
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        part = sock.recv(size - len(data))
+        assert part, "服务端提前关闭连接"
+        data += part
+    return data
+
+
+def send_option(sock, option, data=b''):
+    sock.sendall(nbd.OPTION_HEADER.pack(nbd.IHAVEOPT, option, len(data)) + data)
+
+
+def read_option_reply(sock):
+    magic, option, reply, length = nbd.OPTION_REPLY.unpack(recv_exact(sock, nbd.OPTION_REPLY.size))
+    assert magic == nbd.OPTION_REPLY_MAGIC
+    return option, reply, recv_exact(sock, length) if length else b''
+
+
+def start_handshake(sock, client_flags=nbd.FLAG_FIXED_NEWSTYLE | nbd.FLAG_NO_ZEROES):
+    magic, opt_magic, server_flags = struct.unpack('>QQH', recv_exact(sock, 18))
+    assert (magic, opt_magic) == (nbd.NBDMAGIC, nbd.IHAVEOPT)
+    assert server_flags == nbd.FLAG_FIXED_NEWSTYLE | nbd.FLAG_NO_ZEROES
+    sock.sendall(struct.pack('>I', client_flags))
+
+
+def go(sock):
+    """GO 选项完成握手，返回 (镜像大小, 传输标志)"""
+    send_option(sock, nbd.OPT_GO, struct.pack('>I', 3) + b'kvm' + struct.pack('>H', 0))
+    option, reply, data = read_option_reply(sock)
+    assert (option, reply) == (nbd.OPT_GO, nbd.REP_INFO)
+    info, size, flags = struct.unpack('>HQH', data)
+    assert info == nbd.INFO_EXPORT
+    assert read_option_reply(sock)[:2] == (nbd.OPT_GO, nbd.REP_ACK)
+    return size, flags
+
+
+def request(sock, command, handle, offset=0, length=0, payload=b''):
+    sock.sendall(nbd.REQUEST.pack(nbd.REQUEST_MAGIC, 0, command, handle, offset, length) + payload)
+    magic, error, reply_handle = nbd.SIMPLE_REPLY.unpack(recv_exact(sock, nbd.SIMPLE_REPLY.size))
+    assert magic == nbd.SIMPLE_REPLY_MAGIC
+    assert reply_handle == handle
+    return error
+
+
+def read(sock, handle, offset, length):
+    assert request(sock, nbd.CMD_READ, handle, offset, length) == 0
+    return recv_exact(sock, length)
+
+
+@pytest.fixture
+def image_data():
+    """3.5个块：可压缩块、全零块、不可压缩块（原样存储）、半个尾块"""
+    compressible = bytes(range(256)) * (CHUNK_SIZE // 256)
+    random_chunk = os.urandom(CHUNK_SIZE)
+    tail = b'tail' * (CHUNK_SIZE // 8)
+    return compressible + bytes(CHUNK_SIZE) + random_chunk + tail
+
+
+@pytest.fixture
+def image_files(tmp_path, image_data):
+    raw = tmp_path / 'disk.img'
+    raw.write_bytes(image_data)
+    chunked = tmp_path / 'disk.kvmz'
+    compress_image(str(raw), str(chunked), chunk_size=CHUNK_SIZE)
+    return str(raw), str(chunked)
+
+
+@pytest.fixture
+def served(tmp_path, image_files):
+    """在临时Unix套接字上提供分块压缩镜像，返回已连接的客户端套接字工厂"""
+    image = open_image(image_files[1], cache_chunks=2, readahead=1)
+    server = nbd.NbdServer(image, str(tmp_path / 'nbd.sock'))
+    server.start()
+    clients = []
+
+    def connect():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.connect(server.socket_path)
+        clients.append(sock)
+        return sock
+
+    yield image, connect
+    for sock in clients:
+        sock.close()
+    server.stop()
+    image.close()
+
+
+def test_open_image_picks_backend(image_files):
+    raw, chunked = (open_image(path) for path in image_files)
+    try:
+        assert isinstance(raw, RawImage) and isinstance(chunked, ChunkedImage)
+        assert raw.size == chunked.size
+        assert chunked.table[1] == (0, 0)  # 全零块不占空间
+        assert chunked.table[2][1] & RAW_FLAG  # 不可压缩块原样存储
+    finally:
+        raw.close()
+        chunked.close()
+
+
+def test_go_handshake_reports_size_and_read_only(served, image_data):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock)
+    size, flags = go(sock)
+    assert size == len(image_data)
+    assert flags == nbd.TRANSMISSION_FLAGS
+    assert flags & nbd.FLAG_READ_ONLY
+
+
+def test_list_and_unsupported_options_before_go(served):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock)
+    send_option(sock, nbd.OPT_LIST)
+    option, reply, data = read_option_reply(sock)
+    assert (option, reply) == (nbd.OPT_LIST, nbd.REP_SERVER)
+    assert data == struct.pack('>I', 3) + b'kvm'
+    assert read_option_reply(sock)[:2] == (nbd.OPT_LIST, nbd.REP_ACK)
+    send_option(sock, 99, b'ignored')
+    assert read_option_reply(sock)[:2] == (99, nbd.REP_ERR_UNSUP)
+    go(sock)
+    assert read(sock, 1, 0, 16) == bytes(range(16))
+
+
+def test_export_name_handshake_without_no_zeroes(served, image_data):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock, client_flags=nbd.FLAG_FIXED_NEWSTYLE)
+    send_option(sock, nbd.OPT_EXPORT_NAME, b'kvm')
+    size, flags = struct.unpack('>QH', recv_exact(sock, 10))
+    assert (size, flags) == (len(image_data), nbd.TRANSMISSION_FLAGS)
+    assert recv_exact(sock, 124) == bytes(124)
+    assert read(sock, 1, 0, 4) == image_data[:4]
+
+
+def test_abort_closes_connection(served):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock)
+    send_option(sock, nbd.OPT_ABORT)
+    assert read_option_reply(sock)[:2] == (nbd.OPT_ABORT, nbd.REP_ACK)
+    assert sock.recv(1) == b''
+
+
+@pytest.mark.parametrize('offset, length', [
+    (0, 4096),                                  # 第一个块内
+    (CHUNK_SIZE - 100, 200),                    # 跨越可压缩块和全零块
+    (CHUNK_SIZE + 10, 512),                     # 全零块
+    (2 * CHUNK_SIZE - 1, CHUNK_SIZE + 2),       # 跨越三个块（含不可压缩块）
+    (3 * CHUNK_SIZE + 100, 1000),               # 尾块
+    (0, 3 * CHUNK_SIZE + CHUNK_SIZE // 2),      # 整个镜像
+])
+def test_chunked_reads_match_source(served, image_data, offset, length):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock)
+    go(sock)
+    assert read(sock, 7, offset, length) == image_data[offset:offset + length]
+
+
+def test_sequential_reads_use_readahead_and_bounded_cache(served, image_data):
+    image, connect = served
+    sock = connect()
+    start_handshake(sock)
+    go(sock)
+    step = 16 * 1024
+    for handle, offset in enumerate(range(0, len(image_data), step)):
+        assert read(sock, handle, offset, step) == image_data[offset:offset + step]
+    assert image.stats.cache_hits > 0
+    assert len(image._cache) <= image.cache_chunks
+    assert image.stats.bytes_read == len(image_data)
+
+
+def test_invalid_reads_and_writes_are_rejected(served, image_data):
+    _, connect = served
+    sock = connect()
+    start_handshake(sock)
+    go(sock)
+    assert request(sock, nbd.CMD_READ, 1, len(image_data) - 10, 20) == nbd.EINVAL
+    assert request(sock, nbd.CMD_READ, 2, 0, nbd.MAX_READ + 1) == nbd.EINVAL
+    assert request(sock, nbd.CMD_WRITE, 3, 0, 4, b'abcd') == nbd.EPERM
+    assert request(sock, nbd.CMD_FLUSH, 4) == 0
+    # 被拒绝的写入之后连接仍然同步，可以继续读取
+    assert read(sock, 5, len(image_data) - 4, 4) == image_data[-4:]
+    sock.sendall(nbd.REQUEST.pack(nbd.REQUEST_MAGIC, 0, nbd.CMD_DISC, 6, 0, 0))
+    assert sock.recv(1) == b''
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+
+from module.screenshot_store import ScreenshotStore, dhash
+
+
+def bios_screen(width=1920, height=1080):
+    """大面积平坦底色、少量文字的画面（BIOS、控制台、错误页）"""
+    gray = np.full((height, width), 40, dtype=np.uint8)
+    gray[100:140, 200:900] = 200
+    gray[300:330, 200:600] = 180
+    return gray
+
+
+def with_noise(gray, amplitude=3, seed=1):
+    rng = np.random.default_rng(seed)
+    noisy = gray.astype(np.int16) + rng.integers(-amplitude, amplitude + 1, gray.shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def save_jpeg(gray, path):
+    height, width = gray.shape
+    image = QImage(gray.data, width, height, width, QImage.Format_Grayscale8)
+    assert image.save(str(path), 'JPEG', 95)
+    return str(path)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def test_dhash_ignores_capture_noise_on_flat_screen():
+    clean = bios_screen()
+    assert hamming(dhash(clean), dhash(with_noise(clean))) <= 2
+
+
+@pytest.fixture
+def store(qapp, tmp_path):
+    store = ScreenshotStore()
+    store.open(str(tmp_path / 'shots'))
+    yield store
+    store.close()
+
+
+def test_noisy_copy_is_merged(store, tmp_path):
+    clean = bios_screen()
+    first, is_new = store.add(save_jpeg(clean, tmp_path / 'clean.jpg'), target='pc1', taken=100.0)
+    assert is_new
+    noisy = with_noise(clean)
+    second, is_new = store.add(save_jpeg(noisy, tmp_path / 'noisy.jpg'), target='pc1', taken=200.0)
+    assert not is_new
+    assert second.id == first.id
+    assert second.seen == 2
+    assert store.find_same_gray(noisy, 'pc1').id == first.id
+    assert [shot.id for shot, _ in store.find_similar_gray(noisy, target='pc1')] == [first.id]
+
+
+def test_different_text_is_not_merged(store, tmp_path):
+    clean = bios_screen()
+    store.add(save_jpeg(clean, tmp_path / 'a.jpg'), target='pc1', taken=100.0)
+    other = clean.copy()
+    other[600:640, 200:700] = 220
+    _, is_new = store.add(save_jpeg(other, tmp_path / 'b.jpg'), target='pc1', taken=200.0)
+    assert is_new
+
+
+def test_capture_queued_while_opening_is_stored_after_open(qapp, tmp_path):
+    store = ScreenshotStore()
+    root = str(tmp_path / 'shots')
+    opening = store.open_async(root)
+    staged = save_jpeg(bios_screen(), store.staging_path('pending'))
+    shot, is_new = store.add_async(staged, target='pc1').result()
+    store.close()
+    assert opening.done() and is_new
+    assert shot.path.startswith(root)
+    assert not os.path.exists(staged)
@@ -0,0 +1,39 @@
+from module.hid_reports import TOUCH_CONTACT, TOUCH_TIP
+from module.input_worker import TOUCH_FRAME, TOUCH_MOVE, TOUCH_UP
+from module.mouse_module import MouseHandler
+from module.touch_module import TouchHandler
+
+
+class RecordingDevice:
+    def __init__(self):
+        self.reports = []
+
+    def write(self, report):
+        self.reports.append(bytes(report))
+        return len(report)
+
+    def flush(self):
+        pass
+
+
+def contacts(report):
+    """[(状态位, 触点ID, X, Y)]"""
+    return [TOUCH_CONTACT.unpack_from(report, 1 + i * TOUCH_CONTACT.size) for i in range(report[-1])]
+
+
+def test_touch_frame_is_one_report_mapped_through_mouse_mapper(qapp):
+    mouse = MouseHandler(None, None, None, 200, 100)
+    device = RecordingDevice()
+    touch = TouchHandler(device, mouse.mapper)
+    mouse.set_viewport(100, 100, 0, 0)  # 只更新鼠标的映射，触控随之使用新参数
+    for event in ((TOUCH_MOVE, 7, 0, 0), (TOUCH_MOVE, 8, 50, 50), (TOUCH_FRAME,)):
+        touch.handle_event(event)
+    assert len(device.reports) == 1
+    first, second = contacts(device.reports[0])
+    assert first[2:] == (0, 0)
+    assert second[2:] == mouse.mapper.map(50, 50)
+
+    touch.handle_event((TOUCH_UP, 7))
+    touch.handle_event((TOUCH_FRAME,))
+    released = contacts(device.reports[-1])
+    assert not released[0][0] & TOUCH_TIP and released[1][0] & TOUCH_TIP
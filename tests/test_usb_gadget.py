@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+
+import pytest
+
+from module import hid_reports
+from module import usb_gadget as gadget
+
+# 由 module/usb_gadget.py 取代之前 usb_gadget.sh 写入 report_desc 的字节（echo -ne 序列原样拼接），
+# 已连接过的被控机缓存了这些描述符，声明式写法必须逐字节一致
+LEGACY_KEYBOARD = bytes.fromhex(
+    '05010906a10105081901290315002501750195039102094b9501910295049101'
+    '050719e029e7950881027508950181011900299126ff0095068100c0')
+LEGACY_RELATIVE = bytes.fromhex(
+    '05010902a101050919012908150025019508750181020501093009311581257f'
+    '75089502810609381581257f750895018106050c0a38021581257f750895018106c0')
+LEGACY_ABSOLUTE = bytes.fromhex(
+    '05010902a10105091901290815002501950875018102050109300931150026ff'
+    '7f75109502810209381581257f750895018106050c0a38021581257f750895018106c0')
+# KVM_WHEEL_RESOLUTION_MULTIPLIER=4
+LEGACY_RELATIVE_X4 = bytes.fromhex(
+    '05010902a101050919012908150025019508750181020501093009311581257f'
+    '750895028106a1020948150025013501450475029501a4b10209381581257f35'
+    '00450075088106c0a1020948b4b102350045007504b103050c0a38021581257f'
+    '75088106c0c0')
+LEGACY_ABSOLUTE_X4 = bytes.fromhex(
+    '05010902a10105091901290815002501950875018102050109300931150026ff'
+    '7f751095028102a1020948150025013501450475029501a4b10209381581257f'
+    '3500450075088106c0a1020948b4b102350045007504b103050c0a38021581257f'
+    '75088106c0c0')
+
+
+def test_descriptors_match_legacy_script():
+    assert gadget.keyboard_descriptor() == LEGACY_KEYBOARD
+    assert gadget.relative_mouse_descriptor() == LEGACY_RELATIVE
+    assert gadget.absolute_mouse_descriptor() == LEGACY_ABSOLUTE
+    assert gadget.relative_mouse_descriptor(4) == LEGACY_RELATIVE_X4
+    assert gadget.absolute_mouse_descriptor(4) == LEGACY_ABSOLUTE_X4
+
+
+@pytest.mark.parametrize('descriptor, expected', [
+    (gadget.keyboard_descriptor(), (hid_reports.KEYBOARD_REPORT.size, 1)),
+    (gadget.relative_mouse_descriptor(), (hid_reports.RELATIVE_REPORT.size, 0)),
+    (gadget.relative_mouse_descriptor(4), (hid_reports.RELATIVE_REPORT.size, 0)),  # 特征报告不计入
+    (gadget.absolute_mouse_descriptor(), (hid_reports.ABSOLUTE_REPORT.size, 0)),
+    (gadget.absolute_mouse_descriptor(8), (hid_reports.ABSOLUTE_REPORT.size, 0)),
+    (gadget.consumer_descriptor(), (hid_reports.CONSUMER_REPORT.size, 0)),      # 取较长的报告1
+    (gadget.touch_descriptor(), (hid_reports.TOUCH_REPORT_SIZE, 0)),
+])
+def test_report_lengths_match_report_builders(descriptor, expected):
+    assert gadget.report_lengths(descriptor) == expected
+
+
+def test_report_lengths_count_id_byte_per_report():
+    descriptor = gadget.build_descriptor(
+        gadget.report_id(1), gadget.report_size(8), gadget.report_count(3), gadget.input_(gadget.DATA_VAR_ABS),
+        gadget.report_id(2), gadget.report_size(1), gadget.report_count(4), gadget.input_(gadget.DATA_VAR_ABS),
+        gadget.report_count(2), gadget.output(gadget.DATA_VAR_ABS),
+        gadget.push(), gadget.report_size(16), gadget.output(gadget.DATA_VAR_ABS), gadget.pop(),
+        gadget.report_count(1), gadget.output(gadget.DATA_VAR_ABS))
+    # 输入：报告1为ID+3字节；输出：报告2为 2+32+1 位 -> 5字节 + ID
+    assert gadget.report_lengths(descriptor) == (4, 6)
+
+
+@pytest.mark.parametrize('interval, high_speed, value', [
+    (1.0, True, 4),      # 8个微帧
+    (0.125, True, 1),
+    (0.5, True, 3),
+    (4.0, True, 6),
+    (10000.0, True, 16),
+    (1.0, False, 1),
+    (10.0, False, 10),
+    (0.1, False, 1),
+    (1000.0, False, 255),
+])
+def test_interval_value_units(interval, high_speed, value):
+    assert gadget.interval_value(interval, high_speed) == value
+
+
+def test_high_speed_interval_read_as_milliseconds_on_full_speed_link():
+    value = gadget.interval_value(1.0, True)
+    assert gadget.polling_interval_ms(value, True) == 1.0
+    assert gadget.polling_interval_ms(value, False) == 4.0
+
+
+def make_manager(tmp_path, **kwargs):
+    """以普通目录代替configfs：内核自动创建的 lun.0 预先建好"""
+    config = gadget.default_config(**kwargs)
+    manager = gadget.GadgetManager(config, root=str(tmp_path / 'configfs'),
+                                   endpoint_map_path=str(tmp_path / 'run' / 'endpoints.json'))
+    for function in config.functions:
+        if isinstance(function, gadget.MassStorageFunction):
+            os.makedirs(manager._path(function.directory, 'lun.0'))
+    return manager
+
+
+def configfs_rmdir(rmdir):
+    """configfs 删除功能目录时属性文件随之消失"""
+    def remove(path):
+        for name in os.listdir(path):
+            os.unlink(os.path.join(path, name))
+        rmdir(path)
+    return remove
+
+
+def test_full_speed_fallback_interval_is_logged(tmp_path, caplog):
+    manager = make_manager(tmp_path, interval_ms=1.0)
+    with caplog.at_level(logging.INFO, logger=gadget.__name__):
+        manager._log_full_speed_interval(high_speed=True)
+        manager._log_full_speed_interval(high_speed=False)
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 1
+    assert 'bInterval=4' in messages[0] and '4ms' in messages[0]
+
+
+def test_apply_writes_hid_attributes(tmp_path):
+    manager = make_manager(tmp_path, wheel_multiplier=2, consumer=True, touch=True)
+    manager._apply(high_speed=True)
+    for function in manager.config.functions:
+        link = os.path.join(manager.config_dir, os.path.basename(function.directory))
+        assert os.path.islink(link)
+        if isinstance(function, gadget.HidFunction):
+            with open(manager._path(function.directory, 'report_desc'), 'rb') as f:
+                assert f.read() == function.descriptor
+            assert manager._read(f"{function.directory}/report_length") == str(function.report_length)
+    assert manager._read('functions/hid.keyboard/protocol') == '1'
+    assert manager._read('configs/c.1/bmAttributes') == '0xa0'
+
+
+def test_apply_writes_interval_only_when_supported(tmp_path):
+    manager = make_manager(tmp_path, mass_storage=False)
+    manager._apply(high_speed=True)
+    assert not os.path.exists(manager._path('functions/hid.keyboard/interval'))
+    manager._write('functions/hid.keyboard/interval', 10)  # 内核提供 interval 属性
+    changes = manager._changed_hid_attributes(manager.config.functions[0], high_speed=True)
+    assert changes == {'functions/hid.keyboard/interval': 4}
+    changes = manager._changed_hid_attributes(manager.config.functions[0], high_speed=False)
+    assert changes == {'functions/hid.keyboard/interval': 1}
+
+
+def test_reapply_unchanged_config_keeps_links(tmp_path, monkeypatch):
+    monkeypatch.setattr(gadget.os, 'rmdir', configfs_rmdir(os.rmdir))
+    manager = make_manager(tmp_path)
+    manager._apply(high_speed=True)
+    assert all(not manager._changed_hid_attributes(f, True)
+               for f in manager.config.functions if isinstance(f, gadget.HidFunction))
+    manager.config = gadget.default_config(wheel_multiplier=4, consumer=False)
+    manager._apply(high_speed=True)
+    assert not os.path.exists(manager._path('functions/hid.consumer'))
+    with open(manager._path('functions/hid.mouse_relative/report_desc'), 'rb') as f:
+        assert f.read() == LEGACY_RELATIVE_X4
+    assert sorted(os.listdir(manager.config_dir)) == sorted(
+        ['strings', 'MaxPower', 'bmAttributes', 'hid.keyboard', 'hid.mouse_relative',
+         'hid.mouse_absolute', 'mass_storage.usb0'])
+
+
+def test_endpoint_map_lists_devices_and_report_lengths(tmp_path):
+    manager = make_manager(tmp_path, wheel_multiplier=4, touch=True)
+    endpoint_map = manager.endpoint_map('fe980000.usb')
+    assert endpoint_map['udc'] == 'fe980000.usb'
+    assert endpoint_map['report_lengths'] == {
+        'keyboard': 8, 'mouse_relative': 5, 'mouse_absolute': 7, 'consumer': 3,
+        'touch': hid_reports.TOUCH_REPORT_SIZE}
+    assert endpoint_map['wheel_resolution_multiplier'] == 4
+    for name, path in gadget.DEFAULT_DEVICE_PATHS.items():  # 没有 dev 属性时使用旧脚本的设备路径
+        assert endpoint_map['devices'][name] == path
+    assert endpoint_map['mass_storage'].endswith('functions/mass_storage.usb0')
+
+
+def test_load_endpoint_map_fills_default_devices(tmp_path):
+    path = tmp_path / 'endpoints.json'
+    path.write_text(json.dumps({'devices': {'keyboard': '/dev/hidg5'}, 'udc': 'x'}))
+    endpoint_map = gadget.load_endpoint_map(str(path))
+    assert endpoint_map['devices']['keyboard'] == '/dev/hidg5'
+    assert endpoint_map['devices']['mouse_absolute'] == '/dev/hidg2'
+    assert gadget.load_endpoint_map(str(tmp_path / 'missing.json'))['devices'] == gadget.DEFAULT_DEVICE_PATHS
+
+
+@pytest.mark.parametrize('value, expected, warned', [('4', 4, False), ('abc', 1, True), ('0', 1, True)])
+def test_wheel_multiplier_env_falls_back_to_one(monkeypatch, caplog, value, expected, warned):
+    monkeypatch.setenv(gadget.WHEEL_MULTIPLIER_ENV, value)
+    with caplog.at_level(logging.WARNING, logger=gadget.__name__):
+        assert gadget.wheel_multiplier_from_env() == expected
+    assert bool(caplog.records) == warned